@@ -24,4 +24,9 @@ export const medicationService = {
   delete: async (id) => {
     await axiosInstance.delete(`/api/medications/${id}/`);
   },
+
+  generateReminders: async (id) => {
+    const response = await axiosInstance.post(`/api/medications/${id}/generate_reminders/`);
+    return response.data;
+  },
 };
\ No newline at end of file
@@ -1,4 +1,4 @@
-import axiosInstance from './axios';
+import axiosInstance, { API_URL } from './axios';
 
 export const ocrService = {
   upload: async (file) => {
@@ -12,4 +12,33 @@ export const ocrService = {
     });
     return response.data;
   },
+
+  uploadAsync: async (file) => {
+    const formData = new FormData();
+    formData.append('image', file);
+
+    const response = await axiosInstance.post('/api/ocr/upload/?async=true', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return response.data;
+  },
+
+  // streamToken is the job-scoped token returned by uploadAsync, never the login token
+  streamProgress: (jobId, streamToken, onEvent) => {
+    const url = `${API_URL}/api/ocr/jobs/${jobId}/events/?token=${encodeURIComponent(streamToken)}`;
+    const source = new EventSource(url, { withCredentials: true });
+    const stages = ['uploaded', 'preprocessed', 'ocr_done', 'parsed', 'persisted', 'completed', 'failed', 'timeout'];
+
+    stages.forEach((stage) => {
+      source.addEventListener(stage, (e) => {
+        onEvent(JSON.parse(e.data));
+        if (['completed', 'failed', 'timeout'].includes(stage)) {
+          source.close();
+        }
+      });
+    });
+    return source;
+  },
 };
\ No newline at end of file
@@ -20,6 +20,21 @@ export const reminderService = {
     await axiosInstance.delete(`/api/reminders/${id}/`);
   },
 
+  bulkStatus: async (status, { ids, filter } = {}) => {
+    const response = await axiosInstance.post('/api/reminders/bulk_status/', { status, ids, filter });
+    return response.data;
+  },
+
+  getCalendarFeed: async () => {
+    const response = await axiosInstance.get('/api/reminders/calendar/');
+    return response.data;
+  },
+
+  rotateCalendarFeed: async () => {
+    const response = await axiosInstance.post('/api/reminders/calendar/');
+    return response.data;
+  },
+
   sendTest: async (id) => {
     const response = await axiosInstance.post(`/api/reminders/${id}/send_test/`);
     return response.data;
@@ -0,0 +1,218 @@
+"""
+CPU-aware concurrency control for tesseract.
+
+Tesseract's LSTM engine starts one OpenMP thread per core by default, so
+several workers running OCR at once oversubscribe the node. This module
+detects the CPUs actually available to the process (affinity and cgroup
+quota), sets ``OMP_THREAD_LIMIT`` for tesseract, and caps the number of OCR
+jobs running at once on the node with a file-lock semaphore shared by every
+worker process.
+
+OpenMP reads ``OMP_THREAD_LIMIT`` once, when the library is loaded. Setting
+it at runtime therefore only reaches tesseract subprocesses started later
+(the ``pytesseract`` path); the in-process ``tesserocr`` engines get it
+because ``ai.engine_pool`` calls ``configure_environment`` before importing
+``tesserocr``.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from medi_reminder import metrics
+from .ocr_config import get_cache_dir
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_FILENAME = 'ocr_concurrency.json'
+
+_configured_plan: Optional[Dict[str, int]] = None
+_local_semaphore: Optional[threading.BoundedSemaphore] = None
+_plan_lock = threading.Lock()
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """
+    Return the CPU quota imposed by the cgroup (v2 or v1), or None if unlimited.
+    """
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Return the number of CPUs this process can actually use.
+
+    Takes the smaller of the scheduler affinity mask and the cgroup CPU quota
+    (rounded up), so containers limited to e.g. 1.5 CPUs report 2 rather than
+    the host's core count.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_limit()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def calibration_path() -> Path:
+    return Path(getattr(settings, 'OCR_CONCURRENCY_FILE', '') or get_cache_dir() / CALIBRATION_FILENAME)
+
+
+def load_calibration() -> Optional[Dict[str, int]]:
+    """
+    Return the thread/job split saved by ``calibrate_ocr_concurrency`` for this CPU count, if any.
+    """
+    try:
+        data = json.loads(calibration_path().read_text())
+    except (OSError, ValueError):
+        return None
+
+    if data.get('cpus') != available_cpus():
+        logger.info('Ignoring OCR calibration made for %s CPUs', data.get('cpus'))
+        return None
+    return {'threads': int(data['threads']), 'jobs': int(data['jobs'])}
+
+
+def save_calibration(threads: int, jobs: int, images_per_second: float) -> Path:
+    path = calibration_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'cpus': available_cpus(),
+        'threads': threads,
+        'jobs': jobs,
+        'images_per_second': images_per_second,
+    }))
+    return path
+
+
+def get_plan() -> Dict[str, int]:
+    """
+    Return the OMP threads per tesseract run and parallel OCR jobs for this node.
+
+    Explicit settings win, then a saved calibration for this CPU count, then
+    the default of one thread per job and one job per available CPU, which
+    gives the best images/sec for page-sized inputs.
+    """
+    global _configured_plan
+    if _configured_plan is not None:
+        return _configured_plan
+
+    cpus = available_cpus()
+    plan = load_calibration() or {'threads': 1, 'jobs': cpus}
+
+    threads = getattr(settings, 'OCR_OMP_THREAD_LIMIT', 0)
+    jobs = getattr(settings, 'OCR_PARALLEL_JOBS', 0)
+    if threads:
+        plan['threads'] = threads
+        if not jobs:
+            plan['jobs'] = max(1, cpus // threads)
+    if jobs:
+        plan['jobs'] = jobs
+
+    _configured_plan = plan
+    logger.info('OCR concurrency for %s CPUs: %s thread(s) x %s job(s)', cpus, plan['threads'], plan['jobs'])
+    return plan
+
+
+def configure_environment(threads: Optional[int] = None) -> None:
+    """
+    Set ``OMP_THREAD_LIMIT`` for tesseract subprocesses started by this process.
+
+    Has no effect on an OpenMP runtime that is already loaded, such as the
+    one ``tesserocr`` brings in; see the module docstring.
+    """
+    os.environ['OMP_THREAD_LIMIT'] = str(threads or get_plan()['threads'])
+
+
+def _slot_dir() -> Path:
+    directory = get_cache_dir() / 'ocr_slots'
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+@contextmanager
+def ocr_slot(timeout: Optional[float] = None):
+    """
+    Hold one of the node's OCR job slots while running tesseract.
+
+    Slots are lock files shared by every process on the node, so the job cap
+    holds across gunicorn and Celery workers. Falls back to a per-process
+    semaphore where ``fcntl`` is unavailable.
+    """
+    global _local_semaphore
+    plan = get_plan()
+    configure_environment(plan['threads'])
+    timeout = timeout if timeout is not None else getattr(settings, 'OCR_SLOT_TIMEOUT', 120)
+    started = time.monotonic()
+
+    if fcntl is None:
+        with _plan_lock:
+            if _local_semaphore is None:
+                _local_semaphore = threading.BoundedSemaphore(plan['jobs'])
+        if not _local_semaphore.acquire(timeout=timeout):
+            raise TimeoutError('Timed out waiting for an OCR slot')
+        try:
+            yield
+        finally:
+            _local_semaphore.release()
+        return
+
+    directory = _slot_dir()
+    handle = None
+    while handle is None:
+        for slot in range(plan['jobs']):
+            candidate = open(directory / f"slot-{slot}.lock", 'w')
+            try:
+                fcntl.flock(candidate, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                handle = candidate
+                break
+            except OSError:
+                candidate.close()
+        if handle is None:
+            if time.monotonic() - started > timeout:
+                metrics.increment('ocr.concurrency.slot_timeouts')
+                raise TimeoutError('Timed out waiting for an OCR slot')
+            time.sleep(0.05)
+
+    waited = time.monotonic() - started
+    if waited > 0.05:
+        metrics.increment('ocr.concurrency.slot_waits')
+        logger.debug('Waited %.2fs for an OCR slot', waited)
+
+    try:
+        yield
+    finally:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
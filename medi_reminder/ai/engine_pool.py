@@ -0,0 +1,88 @@
+"""
+Per-language pool of warm tesseract engines.
+
+With the optional ``tesserocr`` bindings installed, each worker process keeps
+initialised engines per language set, so traineddata is loaded once per
+process instead of once per image. Without it, OCR falls back to the
+``pytesseract`` CLI wrapper, which reloads models on every call.
+
+The OMP thread limit is put in the environment before ``tesserocr`` is
+imported, since OpenMP only reads it when libtesseract is loaded.
+"""
+
+import logging
+import queue
+import threading
+from typing import Dict
+
+import pytesseract
+from PIL import Image
+
+from . import concurrency
+from .ocr_config import BASE_CONFIG
+
+concurrency.configure_environment()
+
+try:
+    import tesserocr
+except ImportError:  # pragma: no cover - tesserocr is optional
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+# Variables that can only be applied when an engine is initialised
+INIT_ONLY_VARIABLES = ('user_words_file', 'user_patterns_file')
+
+_pools: Dict[tuple, queue.LifoQueue] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_for(key: tuple) -> queue.LifoQueue:
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = queue.LifoQueue()
+        return _pools[key]
+
+
+def _create_engine(lang: str, init_variables: Dict[str, str]):
+    logger.info('Initialising tesseract engine for %s', lang)
+    return tesserocr.PyTessBaseAPI(
+        lang=lang,
+        psm=tesserocr.PSM.SINGLE_BLOCK,
+        oem=tesserocr.OEM.DEFAULT,
+        init=True,
+        variables=init_variables,
+    )
+
+
+def image_to_string(image: Image.Image, lang: str, variables: Dict[str, str]) -> str:
+    """
+    Run OCR on a preprocessed image with a warm engine for ``lang``.
+
+    Args:
+        image (Image.Image): Preprocessed image
+        lang (str): Tesseract language set, e.g. 'eng' or 'hin+eng'
+        variables (dict): Tesseract variables from ``ocr_config.build_engine_variables``
+    """
+    if tesserocr is None:
+        config = ' '.join([BASE_CONFIG] + [f"-c {name}={value}" for name, value in variables.items()])
+        return pytesseract.image_to_string(image, config=config, lang=lang)
+
+    init_variables = {name: value for name, value in variables.items() if name in INIT_ONLY_VARIABLES}
+    pool = _pool_for((lang, tuple(sorted(init_variables.items()))))
+    try:
+        engine = pool.get_nowait()
+    except queue.Empty:
+        engine = _create_engine(lang, init_variables)
+
+    try:
+        engine.SetVariable('tessedit_char_whitelist', variables.get('tessedit_char_whitelist', ''))
+        engine.SetImage(image.convert('L'))
+        text = engine.GetUTF8Text()
+    except Exception:
+        engine.End()
+        raise
+
+    engine.Clear()
+    pool.put(engine)
+    return text
@@ -54,4 +54,21 @@ class UnsupportedFileTypeError(Exception):
     def __str__(self):
         if self.allowed_types:
             return f"{self.message}. Allowed types: {', '.join(self.allowed_types)}"
-        return self.message
\ No newline at end of file
+        return self.message
+
+class ImageTooLargeError(Exception):
+    """
+    Raised when an image's declared dimensions or decode size exceed the OCR memory budget.
+    """
+    def __init__(self, message="Image is too large to process"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class MemoryBudgetExceededError(Exception):
+    """
+    Raised when an OCR worker is over its memory budget and refuses new work.
+    """
+    def __init__(self, message="OCR worker is over its memory budget"):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,83 @@
+"""
+Insights generated from a user's own data.
+
+``compliance_analysis`` summarises how many doses a user took over recent
+days, overall and per medication, from the daily adherence rollups (see
+``reminders.adherence``), so its cost grows with the number of days and
+medications rather than the number of doses.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from reminders import adherence
+from .models import AIInsight
+
+logger = logging.getLogger(__name__)
+
+COMPLIANCE_DAYS = 7
+
+# Adherence rates at or above GOOD_RATE are on track; below POOR_RATE need attention
+GOOD_RATE = 0.9
+POOR_RATE = 0.7
+
+
+def compliance_analysis(user, days: int = COMPLIANCE_DAYS) -> Optional[AIInsight]:
+    """
+    Create the user's ``compliance_analysis`` insight for the last ``days`` days.
+
+    The previous compliance insight is deactivated. Returns None when no
+    dose in the range has been taken or missed yet.
+    """
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    overall = adherence.summary(user, start, end)
+    if overall['rate'] is None:
+        return None
+
+    rate = overall['rate']
+    decided = overall['done'] + overall['missed']
+    if rate >= GOOD_RATE:
+        title = 'On track with your medication'
+    elif rate >= POOR_RATE:
+        title = 'Some doses missed'
+    else:
+        title = 'Many doses missed'
+    description = (
+        f"You took {overall['done']} of {decided} doses ({rate:.0%}) "
+        f"between {start:%d %b} and {end:%d %b}."
+    )
+
+    recommendations = []
+    for medication in adherence.by_medication(user, start, end):
+        if medication['rate'] is not None and medication['rate'] < GOOD_RATE:
+            taken = medication['done']
+            total = medication['done'] + medication['missed']
+            recommendations.append(
+                f"{medication['medication_name']}: {taken} of {total} doses taken; "
+                f"consider a reminder at a time that suits your routine."
+            )
+    weak_days = [
+        day['day'].strftime('%a %d %b') for day in adherence.by_day(user, start, end)
+        if day['rate'] is not None and day['rate'] < POOR_RATE
+    ]
+    if weak_days:
+        recommendations.append(f"Most doses were missed on {', '.join(weak_days[:3])}.")
+
+    with transaction.atomic():
+        AIInsight.objects.filter(user=user, insight_type='compliance_analysis', is_active=True).update(is_active=False)
+        insight = AIInsight.objects.create(
+            user=user,
+            insight_type='compliance_analysis',
+            title=title,
+            description=description,
+            recommendations=recommendations,
+            # More decided doses, more confidence
+            confidence_score=round(decided / (decided + 10), 2),
+        )
+    logger.info(f"Compliance insight for user {user.id}: {rate:.0%} over {days} days")
+    return insight
@@ -0,0 +1,117 @@
+"""
+Script-aware language routing for OCR.
+
+Instead of running every image through every installed language, each image
+is routed to the smallest traineddata set that covers it: a user's preferred
+language(s), e.g. 'eng' or 'hin+eng', are used as-is, otherwise a cheap OSD
+pass detects the script and maps it to its language(s). English is always kept alongside an
+Indic script because drug names on those prescriptions are written in Latin.
+"""
+
+import os
+import logging
+from functools import lru_cache
+from typing import Optional, Set, Tuple
+
+import pytesseract
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Tesseract OSD script name -> traineddata set to use for it
+SCRIPT_LANGUAGES = {
+    'Latin': 'eng',
+    'Devanagari': 'hin+eng',
+    'Bengali': 'ben+eng',
+    'Gujarati': 'guj+eng',
+    'Gurmukhi': 'pan+eng',
+    'Kannada': 'kan+eng',
+    'Malayalam': 'mal+eng',
+    'Oriya': 'ori+eng',
+    'Tamil': 'tam+eng',
+    'Telugu': 'tel+eng',
+    'Arabic': 'urd+eng',
+}
+
+LATIN_SCRIPT = 'Latin'
+
+# Below this OSD confidence the detected script is ignored
+MIN_SCRIPT_CONFIDENCE = 1.0
+
+# OSD only needs a coarse view of the page
+OSD_MAX_DIM = 1000
+
+
+def default_languages() -> str:
+    return os.getenv('TESSERACT_LANG', 'eng')
+
+
+@lru_cache(maxsize=1)
+def installed_languages() -> Set[str]:
+    """
+    Return the traineddata sets installed for tesseract (cached per process).
+    """
+    try:
+        return set(pytesseract.get_languages(config=''))
+    except Exception as exc:
+        logger.warning('Could not list tesseract languages: %s', exc)
+        return set()
+
+
+def _available(languages: str) -> Optional[str]:
+    """
+    Drop languages that are not installed; None if nothing usable remains.
+    """
+    installed = installed_languages()
+    if not installed:
+        return languages
+    usable = [lang for lang in languages.split('+') if lang in installed]
+    return '+'.join(usable) or None
+
+
+def detect_script(image: Image.Image) -> Tuple[Optional[str], float]:
+    """
+    Detect the dominant script of an image with tesseract's OSD pass.
+
+    Returns:
+        tuple: Script name (e.g. 'Latin', 'Devanagari') and its confidence,
+        or (None, 0.0) if OSD is unavailable or fails
+    """
+    if 'osd' not in installed_languages():
+        return None, 0.0
+
+    small = image.convert('L')
+    small.thumbnail((OSD_MAX_DIM, OSD_MAX_DIM))
+    try:
+        osd = pytesseract.image_to_osd(small, config='--psm 0', output_type=pytesseract.Output.DICT)
+    except Exception as exc:
+        logger.debug('OSD failed: %s', exc)
+        return None, 0.0
+    return osd.get('script'), float(osd.get('script_conf', 0.0))
+
+
+def select_languages(image: Image.Image, preferred: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Choose the traineddata set for an image.
+
+    Args:
+        image (Image.Image): Preprocessed image
+        preferred (str): The user's language preference, e.g. 'eng' or 'eng+hin'
+
+    Returns:
+        tuple: Tesseract ``lang`` string and the detected script (None if OSD was skipped)
+    """
+    if preferred:
+        languages = _available(preferred)
+        if languages:
+            return languages, LATIN_SCRIPT if languages == 'eng' else None
+
+    script, confidence = detect_script(image)
+    if script and confidence >= MIN_SCRIPT_CONFIDENCE and script in SCRIPT_LANGUAGES:
+        languages = _available(SCRIPT_LANGUAGES[script])
+        if languages:
+            logger.debug('Routed image with %s script (conf %.1f) to %s', script, confidence, languages)
+            return languages, script
+
+    fallback = _available(default_languages()) or 'eng'
+    return fallback, LATIN_SCRIPT if fallback == 'eng' else None
@@ -0,0 +1,117 @@
+"""
+Sample corpora for the OCR benchmark and calibration commands.
+"""
+
+import hashlib
+import random
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import CommandError
+from PIL import Image, ImageDraw, ImageFont
+
+from ai.ocr_config import load_lexicon
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Share of lexicon drug names kept out of the benchmarked lexicon and used for the synthetic corpus
+HELD_OUT_PERCENT = 20
+
+
+def load_corpus(directory):
+    """
+    Return ``(image_path, ground_truth)`` pairs for images with a same-named ``.txt`` file.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise CommandError(f'Corpus directory not found: {directory}')
+
+    samples = []
+    for image_path in sorted(directory.iterdir()):
+        truth_path = image_path.with_suffix('.txt')
+        if image_path.suffix.lower() in IMAGE_EXTENSIONS and truth_path.exists():
+            samples.append((image_path, truth_path.read_text(encoding='utf-8')))
+    return samples
+
+
+def drug_names(terms):
+    """
+    The lexicon terms that look like drug names rather than abbreviations or dosage words.
+    """
+    return [term for term in terms if term[0].isupper() and len(term) > 4]
+
+
+def held_out_split(terms, percent=HELD_OUT_PERCENT):
+    """
+    Split lexicon terms into ``(kept, held_out)``, deterministically by a hash of each term.
+    """
+    kept, held_out = [], []
+    for term in terms:
+        bucket = int(hashlib.sha1(term.lower().encode('utf-8')).hexdigest(), 16) % 100
+        (held_out if bucket < percent else kept).append(term)
+    return kept, held_out
+
+
+def write_lexicon(terms):
+    """
+    Write terms to a temporary lexicon file and return its path.
+    """
+    handle, path = tempfile.mkstemp(prefix='ocr_lexicon_', suffix='.txt')
+    with open(handle, 'w', encoding='utf-8') as lexicon:
+        lexicon.write('\n'.join(terms) + '\n')
+    return Path(path)
+
+
+def synthetic_corpus(count, drugs=None):
+    """
+    Render simple typed prescriptions (drug, dosage, frequency lines).
+
+    Drug names come from ``drugs``, by default the lexicon's. A benchmark of
+    the lexicon config must pass names the config was not built from, or it
+    only measures the lexicon recognising itself.
+
+    Returns:
+        tuple: Directory the images were written to, and ``(image_path, ground_truth)`` pairs
+    """
+    rng = random.Random(42)
+    drugs = drugs or drug_names(load_lexicon())
+    dosages = ['250mg', '500mg', '650mg', '10mg', '5ml', '1-0-1', '0-0-1']
+    frequencies = ['OD', 'BD', 'TDS', 'after food', 'at night', 'twice daily']
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:
+        font = ImageFont.load_default()
+
+    directory = Path(tempfile.mkdtemp(prefix='ocr_corpus_'))
+    samples = []
+    for index in range(count):
+        lines = ['Dr. Sharma', 'Rx']
+        for _ in range(rng.randint(2, 5)):
+            lines.append(f"Tab {rng.choice(drugs)} {rng.choice(dosages)} {rng.choice(frequencies)}")
+
+        image = Image.new('L', (1200, 80 + 50 * len(lines)), color=255)
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(lines):
+            draw.text((40, 40 + 50 * row), line, fill=0, font=font)
+
+        image_path = directory / f"sample_{index:03d}.png"
+        image.save(image_path)
+        samples.append((image_path, '\n'.join(lines)))
+
+    return directory, samples
+
+
+def corpus_from_options(options, drugs=None):
+    """
+    Build a corpus from the shared ``--corpus``/``--synthetic`` command options.
+    """
+    if options.get('corpus'):
+        samples = load_corpus(options['corpus'])
+    elif options.get('synthetic'):
+        _, samples = synthetic_corpus(options['synthetic'], drugs)
+    else:
+        raise CommandError('Provide --corpus DIR or --synthetic N')
+
+    if not samples:
+        raise CommandError('Corpus is empty')
+    return samples
@@ -0,0 +1,103 @@
+"""
+Measure OCR throughput for each OMP-thread/parallel-job split on this host.
+
+For every split whose threads x jobs fits the available CPUs (plus one
+oversubscribed baseline using tesseract's defaults), runs the corpus through
+a pool of ``jobs`` concurrent tesseract invocations with
+``OMP_THREAD_LIMIT=threads`` and reports images/sec. ``--save`` stores the
+fastest split, which the OCR concurrency controller then uses on this host.
+
+Usage:
+    python manage.py calibrate_ocr_concurrency --synthetic 24 --save
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from ai import concurrency
+from ai.ocr_config import build_tesseract_config
+from ai.ocr_service import _configure_tesseract_binary, _preprocess_image
+from ._corpus import corpus_from_options
+
+
+class Command(BaseCommand):
+    help = 'Measure OCR images/sec for each OMP thread / parallel job split and optionally save the best.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', type=str, help='Directory of images with ground-truth .txt files')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Render this many synthetic prescriptions instead of a corpus')
+        parser.add_argument('--rounds', type=int, default=2, help='Passes over the corpus per split')
+        parser.add_argument('--lang', type=str, default='eng', help='Tesseract language')
+        parser.add_argument('--save', action='store_true', help='Save the fastest split for this host')
+
+    def handle(self, *args, **options):
+        _configure_tesseract_binary()
+        try:
+            pytesseract.get_tesseract_version()
+        except Exception as exc:
+            raise CommandError(f'Tesseract is not available: {exc}')
+
+        images = []
+        for image_path, _ in corpus_from_options(options):
+            with Image.open(image_path) as img:
+                images.append(_preprocess_image(img))
+        images = images * options['rounds']
+
+        cpus = concurrency.available_cpus()
+        config = build_tesseract_config()
+        self.stdout.write(f"{cpus} CPU(s) available, {len(images)} OCR runs per split")
+
+        splits = self._splits(cpus)
+        results = []
+        previous_limit = os.environ.get('OMP_THREAD_LIMIT')
+        try:
+            for threads, jobs in splits:
+                rate = self._measure(images, config, options['lang'], threads, jobs)
+                label = 'default' if threads is None else str(threads)
+                self.stdout.write(f"  threads={label:>7} jobs={jobs:>3}: {rate:6.2f} images/sec")
+                if threads is not None:
+                    results.append((rate, threads, jobs))
+        finally:
+            if previous_limit is None:
+                os.environ.pop('OMP_THREAD_LIMIT', None)
+            else:
+                os.environ['OMP_THREAD_LIMIT'] = previous_limit
+
+        rate, threads, jobs = max(results)
+        self.stdout.write(self.style.SUCCESS(f"Best: {threads} thread(s) x {jobs} job(s) at {rate:.2f} images/sec"))
+
+        if options['save']:
+            path = concurrency.save_calibration(threads, jobs, rate)
+            self.stdout.write(f"Saved calibration to {path}")
+
+    def _splits(self, cpus):
+        """
+        Thread/job splits to try: powers of two threads with as many jobs as fit,
+        plus the unlimited-threads baseline with one job per CPU.
+        """
+        splits = []
+        threads = 1
+        while threads <= cpus:
+            splits.append((threads, max(1, cpus // threads)))
+            threads *= 2
+        if cpus > 1:
+            splits.append((1, cpus * 2))
+        splits.append((None, cpus))
+        return splits
+
+    def _measure(self, images, config, lang, threads, jobs):
+        if threads is None:
+            os.environ.pop('OMP_THREAD_LIMIT', None)
+        else:
+            os.environ['OMP_THREAD_LIMIT'] = str(threads)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(lambda image: pytesseract.image_to_string(image, config=config, lang=lang), images))
+        return len(images) / (time.perf_counter() - started)
@@ -0,0 +1,170 @@
+"""
+Memory budget for the OCR path.
+
+Checks an image's declared dimensions and estimated decode size before any
+pixel data is decoded, refuses new work when the process is already over its
+RSS budget, and tracks when a worker process should be recycled. Only a
+process that something will replace (the dedicated OCR Celery worker, see
+``medi_reminder/celery.py``) refuses further OCR work once due for
+recycling; web processes and shared workers keep serving.
+"""
+
+import os
+import logging
+from typing import Optional
+
+from django.conf import settings
+from PIL import Image
+
+from medi_reminder import metrics
+from .exceptions import ImageTooLargeError, MemoryBudgetExceededError
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_PIXELS = getattr(settings, 'OCR_MAX_IMAGE_PIXELS', 40_000_000)
+MAX_DECODE_BYTES = getattr(settings, 'OCR_MAX_DECODE_MB', 256) * 1024 * 1024
+WORKER_MAX_RSS_BYTES = getattr(settings, 'OCR_WORKER_MAX_RSS_MB', 1024) * 1024 * 1024
+WORKER_MAX_IMAGES = getattr(settings, 'OCR_WORKER_MAX_IMAGES', 200)
+
+# Make Pillow itself refuse bombs on any code path that opens images
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Bytes per pixel for common decoded modes; unknown modes assume the worst case
+_MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'LA': 2, 'I;16': 2, 'RGB': 3, 'YCbCr': 3, 'LAB': 3, 'HSV': 3,
+               'RGBA': 4, 'CMYK': 4, 'I': 4, 'F': 4}
+
+_images_processed = 0
+_recycle_requested = False
+# Set in worker processes whose process manager replaces them after each task
+_recycler_configured = False
+
+
+def estimate_decode_bytes(image: Image.Image) -> int:
+    """
+    Estimate peak memory for decoding and preprocessing an image.
+
+    Counts the decoded frame plus the grayscale copy made by ``convert('L')``.
+    """
+    width, height = image.size
+    pixels = width * height
+    return pixels * _MODE_BYTES.get(image.mode, 4) + pixels
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Return the resident set size of this process, or None if it cannot be read.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def check_image(image: Image.Image) -> None:
+    """
+    Validate an opened (but not yet decoded) image against the budget.
+
+    Raises:
+        ImageTooLargeError: If the declared dimensions or decode estimate exceed the limits
+    """
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        logger.warning('Rejected image of %sx%s pixels (limit %s)', width, height, MAX_IMAGE_PIXELS)
+        metrics.increment('ocr.memory_guard.rejected_pixels')
+        raise ImageTooLargeError(f"Image dimensions {width}x{height} exceed the {MAX_IMAGE_PIXELS} pixel limit")
+
+    estimate = estimate_decode_bytes(image)
+    if estimate > MAX_DECODE_BYTES:
+        logger.warning('Rejected image needing ~%s bytes to decode (limit %s)', estimate, MAX_DECODE_BYTES)
+        metrics.increment('ocr.memory_guard.rejected_decode_size')
+        raise ImageTooLargeError("Image would need too much memory to decode")
+
+
+def check_process(image: Optional[Image.Image] = None) -> None:
+    """
+    Refuse new OCR work when this process would go over its RSS budget.
+
+    Raises:
+        MemoryBudgetExceededError: If current RSS plus the image's decode estimate exceeds the limit
+    """
+    if _recycle_requested:
+        metrics.increment('ocr.memory_guard.recycle_refusals')
+        raise MemoryBudgetExceededError("OCR worker is due for recycling")
+
+    rss = current_rss_bytes()
+    if rss is None:
+        return
+
+    needed = rss + (estimate_decode_bytes(image) if image is not None else 0)
+    if needed > WORKER_MAX_RSS_BYTES:
+        logger.error('OCR worker %s over memory budget: rss=%s needed=%s limit=%s',
+                     os.getpid(), rss, needed, WORKER_MAX_RSS_BYTES)
+        metrics.increment('ocr.memory_guard.rss_refusals')
+        raise MemoryBudgetExceededError()
+
+
+def record_image_processed() -> bool:
+    """
+    Count an image processed by this process and report whether it should be recycled.
+
+    The dedicated OCR Celery worker is also recycled by Celery itself from the
+    same limits (see ``medi_reminder/celery.py``); callers pass a True result
+    to ``request_recycle``, which only flags processes with a recycler.
+    """
+    global _images_processed
+    _images_processed += 1
+    metrics.increment('ocr.images_processed')
+
+    rss = current_rss_bytes()
+    if _images_processed >= WORKER_MAX_IMAGES:
+        logger.info('OCR worker %s processed %s images, due for recycling', os.getpid(), _images_processed)
+        metrics.increment('ocr.memory_guard.recycle_image_count')
+        return True
+    if rss is not None and rss > WORKER_MAX_RSS_BYTES:
+        logger.warning('OCR worker %s rss=%s over %s, due for recycling', os.getpid(), rss, WORKER_MAX_RSS_BYTES)
+        metrics.increment('ocr.memory_guard.recycle_rss')
+        return True
+    return False
+
+
+def enable_recycling() -> None:
+    """
+    Declare that this process is replaced by its manager once flagged, e.g. a Celery worker with per-child limits.
+    """
+    global _recycler_configured
+    _recycler_configured = True
+
+
+def request_recycle() -> None:
+    """
+    Flag this process for recycling; ``check_process`` refuses new OCR work from then on.
+
+    Only done where ``enable_recycling`` was called: refused tasks are
+    retried and land on the fresh process Celery starts after the task.
+    Elsewhere nothing would replace the process, so it keeps serving and
+    the count starts over.
+    """
+    global _images_processed, _recycle_requested
+    if not _recycler_configured:
+        logger.info('OCR process %s is due for recycling but has no recycler, continuing', os.getpid())
+        _images_processed = 0
+        return
+    if not _recycle_requested:
+        logger.warning('OCR worker %s flagged for recycling, refusing further OCR work', os.getpid())
+    _recycle_requested = True
+
+
+def recycle_requested() -> bool:
+    """
+    Whether this process has been flagged for recycling.
+    """
+    return _recycle_requested
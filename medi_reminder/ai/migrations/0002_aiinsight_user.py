@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ai', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiinsight',
+            name='user',
+            field=models.ForeignKey(blank=True, help_text='User the insight is about; empty for general insights', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ai_insights', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
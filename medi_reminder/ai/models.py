@@ -6,6 +6,7 @@ Defines the structure for OCR results, medication recognition, and AI insights.
 """
 
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
 
 
@@ -74,6 +75,14 @@ class AIInsight(models.Model):
         ('general_recommendation', 'General Recommendation'),
     ]
     
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ai_insights',
+        help_text="User the insight is about; empty for general insights"
+    )
     insight_type = models.CharField(max_length=50, choices=INSIGHT_TYPES, help_text="Type of insight")
     title = models.CharField(max_length=255, help_text="Title of the insight")
     description = models.TextField(help_text="Detailed description of the insight")
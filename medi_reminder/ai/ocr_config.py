@@ -0,0 +1,160 @@
+"""
+Tesseract engine configuration for prescription OCR.
+
+Builds ``user-words`` and ``user-patterns`` files from the local medication
+lexicon and a dosage-aware pattern set, caches them on disk keyed by their
+content, and assembles the tesseract config string used by the OCR service.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# The engine/segmentation settings used before the lexicon was introduced
+BASE_CONFIG = "--oem 3 --psm 6"
+
+DEFAULT_LEXICON_PATH = Path(__file__).resolve().parent / 'data' / 'medication_lexicon.txt'
+
+# Characters that appear on prescriptions written in Latin script
+DEFAULT_CHAR_WHITELIST = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:;/-%+()#&"
+)
+
+# Dosage-aware patterns in tesseract user-patterns syntax (\d digit, \* repeat)
+DOSAGE_PATTERNS = [
+    r"\d\*mg",
+    r"\d\*.\d\*mg",
+    r"\d\*mcg",
+    r"\d\*ml",
+    r"\d\*.\d\*ml",
+    r"\d\*g",
+    r"\d\*IU",
+    r"\d\*units",
+    r"\d\*%",
+    r"\d\*.\d\*%",
+    r"\d-\d-\d",
+    r"\d\*x\d\*",
+    r"\d/\d",
+    r"\d\*/day",
+    r"\d\*hrs",
+]
+
+
+def _lexicon_path() -> Path:
+    return Path(getattr(settings, 'OCR_LEXICON_PATH', '') or DEFAULT_LEXICON_PATH)
+
+
+def get_cache_dir() -> Path:
+    """
+    Return the directory for generated OCR files (lexicon files, calibration results, slot locks).
+    """
+    return Path(getattr(settings, 'OCR_CACHE_DIR', '') or Path(tempfile.gettempdir()) / 'medi_reminder_ocr')
+
+
+def load_lexicon(path: Optional[Path] = None) -> List[str]:
+    """
+    Load medication terms from the lexicon file, skipping blanks and comments.
+    """
+    path = path or _lexicon_path()
+    with open(path, encoding='utf-8') as lexicon:
+        return [line.strip() for line in lexicon if line.strip() and not line.startswith('#')]
+
+
+def _user_words(terms: List[str]) -> List[str]:
+    """
+    Expand terms with the case variants seen on prescriptions (Title, lower, UPPER).
+    """
+    words = set()
+    for term in terms:
+        for word in term.split():
+            words.update({word, word.lower(), word.upper(), word.capitalize()})
+    return sorted(words)
+
+
+@lru_cache(maxsize=None)
+def _generate_files(lexicon_path: str, cache_dir: str) -> Tuple[str, str]:
+    """
+    Write the user-words and user-patterns files and return their paths.
+
+    File names carry a hash of their content, so an edited lexicon produces
+    new files while unchanged ones are reused across processes and restarts.
+    """
+    words_content = '\n'.join(_user_words(load_lexicon(Path(lexicon_path)))) + '\n'
+    patterns_content = '\n'.join(DOSAGE_PATTERNS) + '\n'
+    digest = hashlib.sha1((words_content + patterns_content).encode('utf-8')).hexdigest()[:12]
+
+    directory = Path(cache_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    words_path = directory / f"user-words-{digest}.txt"
+    patterns_path = directory / f"user-patterns-{digest}.txt"
+
+    for path, content in ((words_path, words_content), (patterns_path, patterns_content)):
+        if not path.exists():
+            # Write-then-rename so concurrent workers never read a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, path)
+            logger.info('Generated tesseract file %s', path)
+
+    return str(words_path), str(patterns_path)
+
+
+def get_lexicon_files(lexicon_path: Optional[Path] = None) -> Tuple[str, str]:
+    """
+    Return paths to the cached user-words and user-patterns files, generating them if needed.
+    """
+    return _generate_files(str(lexicon_path or _lexicon_path()), str(get_cache_dir()))
+
+
+def build_engine_variables(
+    use_lexicon: bool = True,
+    use_whitelist: bool = True,
+    lexicon_path: Optional[Path] = None
+) -> Dict[str, str]:
+    """
+    Build the tesseract variables for prescription OCR.
+
+    Args:
+        use_lexicon (bool): Add the medication user-words/user-patterns files
+        use_whitelist (bool): Restrict recognition to the configured character whitelist
+        lexicon_path (Path): Lexicon to build the files from instead of the configured one
+
+    Returns:
+        dict: Tesseract variable names mapped to values
+    """
+    variables = {}
+
+    if use_lexicon and getattr(settings, 'OCR_USE_LEXICON', True):
+        try:
+            variables['user_words_file'], variables['user_patterns_file'] = get_lexicon_files(lexicon_path)
+        except OSError as exc:
+            logger.warning('Medication lexicon unavailable, using default dictionary: %s', exc)
+
+    whitelist = getattr(settings, 'OCR_CHAR_WHITELIST', DEFAULT_CHAR_WHITELIST)
+    if use_whitelist and whitelist:
+        variables['tessedit_char_whitelist'] = whitelist
+
+    return variables
+
+
+def build_tesseract_config(
+    use_lexicon: bool = True,
+    use_whitelist: bool = True,
+    lexicon_path: Optional[Path] = None
+) -> str:
+    """
+    Build the tesseract CLI config string for prescription OCR.
+
+    Returns:
+        str: Config string for ``pytesseract.image_to_string``
+    """
+    variables = build_engine_variables(use_lexicon=use_lexicon, use_whitelist=use_whitelist, lexicon_path=lexicon_path)
+    return ' '.join([BASE_CONFIG] + [f"-c {name}={value}" for name, value in variables.items()])
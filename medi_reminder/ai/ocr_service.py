@@ -8,7 +8,11 @@ from django.conf import settings
 from PIL import Image, ImageFilter, ImageOps
 import pytesseract
 import re
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+
+from . import concurrency, engine_pool, language_routing, memory_guard
+from .ocr_config import build_engine_variables
+from .exceptions import ImageTooLargeError, MemoryBudgetExceededError
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +52,11 @@ def _configure_tesseract_binary() -> None:
 def _preprocess_image(image: Image.Image) -> Image.Image:
 
     max_dim = 1800
+
+    # Let JPEG decode at a reduced scale instead of materialising full resolution
+    if image.format == 'JPEG':
+        image.draft('L', (max_dim, max_dim))
+
     width, height = image.size
     scale = min(max_dim / max(width, height), 1.0)
     if scale < 1.0:
@@ -70,7 +79,11 @@ def _preprocess_image(image: Image.Image) -> Image.Image:
     return image
 
 
-def extract_text_from_image(image_path: str) -> str:
+def extract_text_from_image(
+    image_path: str,
+    progress_callback: Optional[Callable[[str], None]] = None,
+    languages: Optional[str] = None
+) -> str:
     try:
         _configure_tesseract_binary()
 
@@ -83,9 +96,14 @@ def extract_text_from_image(image_path: str) -> str:
             return ""
 
         with Image.open(image_path) as img:
+            # Header-only checks; nothing has been decoded yet
+            memory_guard.check_image(img)
+            memory_guard.check_process(img)
+
             processed = _preprocess_image(img)
+            if progress_callback:
+                progress_callback('preprocessed')
 
-            custom_oem_psm_config = "--oem 3 --psm 6"
             try:
                 # Sanity check to surface tesseract availability issues early
                 _ = pytesseract.get_tesseract_version()
@@ -93,17 +111,22 @@ def extract_text_from_image(image_path: str) -> str:
                 logger.warning('Tesseract not available or misconfigured: %s', version_err)
                 return ""
 
-            text = pytesseract.image_to_string(
-                processed,
-                config=custom_oem_psm_config,
-                lang=os.getenv('TESSERACT_LANG', 'eng')
-            )
+            with concurrency.ocr_slot():
+                lang, script = language_routing.select_languages(processed, preferred=languages)
+                # The character whitelist only covers Latin script
+                variables = build_engine_variables(use_whitelist=script == language_routing.LATIN_SCRIPT)
+                text = engine_pool.image_to_string(processed, lang=lang, variables=variables)
+
+            if memory_guard.record_image_processed():
+                memory_guard.request_recycle()
 
             if not text:
                 logger.info('Tesseract returned no text for image: %s', image_path)
                 return ""
 
             return text.strip()
+    except (ImageTooLargeError, MemoryBudgetExceededError, Image.DecompressionBombError, TimeoutError):
+        raise
     except Exception as exc:
         logger.exception('OCR extraction failed: %s', exc)
         return ""
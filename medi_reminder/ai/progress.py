@@ -0,0 +1,121 @@
+"""
+Progress tracking for OCR jobs.
+
+Each OCR job gets an id and an append-only list of stage events stored in the
+configured cache, so the worker running the job and the ASGI process streaming
+it to the browser do not have to be the same process (or even the same node).
+"""
+
+import time
+import uuid
+import logging
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in the order they are published
+STAGE_UPLOADED = 'uploaded'
+STAGE_PREPROCESSED = 'preprocessed'
+STAGE_OCR_DONE = 'ocr_done'
+STAGE_PARSED = 'parsed'
+STAGE_PERSISTED = 'persisted'
+
+# Terminal events; streams close after sending one of these
+STAGE_COMPLETED = 'completed'
+STAGE_FAILED = 'failed'
+
+STAGES = [STAGE_UPLOADED, STAGE_PREPROCESSED, STAGE_OCR_DONE, STAGE_PARSED, STAGE_PERSISTED]
+TERMINAL_STAGES = [STAGE_COMPLETED, STAGE_FAILED]
+
+JOB_TTL = getattr(settings, 'OCR_JOB_TTL', 60 * 60)
+
+# Lifetime of the job-scoped token used to open a progress stream
+STREAM_TOKEN_TTL = getattr(settings, 'OCR_STREAM_TOKEN_TTL', 15 * 60)
+STREAM_TOKEN_SALT = 'ai.progress.stream'
+
+
+def _owner_key(job_id: str) -> str:
+    return f"ocr-job:{job_id}:owner"
+
+
+def _events_key(job_id: str) -> str:
+    return f"ocr-job:{job_id}:events"
+
+
+def create_job(user_id: int) -> str:
+    """
+    Register a new OCR job owned by the given user and return its id.
+    """
+    job_id = uuid.uuid4().hex
+    cache.set_many({_owner_key(job_id): user_id, _events_key(job_id): []}, JOB_TTL)
+    return job_id
+
+
+def stream_token(job_id: str, user_id: int) -> str:
+    """
+    Return a signed, short-lived token that only opens the progress stream of ``job_id``.
+
+    Browser EventSource cannot send headers, so the stream is authenticated
+    from the URL; this token goes there instead of the user's API token.
+    """
+    return signing.dumps({'job': job_id, 'user': user_id}, salt=STREAM_TOKEN_SALT, compress=True)
+
+
+def check_stream_token(token: str, job_id: str) -> Optional[int]:
+    """
+    Return the user id of a valid stream token for ``job_id``, or None.
+    """
+    try:
+        payload = signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=STREAM_TOKEN_TTL)
+    except signing.BadSignature:
+        return None
+    if payload.get('job') != job_id:
+        return None
+    return payload.get('user')
+
+
+def publish(job_id: Optional[str], stage: str, **data) -> None:
+    """
+    Append a stage event to the job's event list.
+
+    A job has a single writer (the request or task running the pipeline),
+    so a read-modify-write on the list is safe. Publishing never raises:
+    progress reporting must not break the OCR pipeline itself.
+    """
+    if not job_id:
+        return
+
+    event = {'stage': stage, 'timestamp': time.time()}
+    if data:
+        event['data'] = data
+
+    try:
+        events = cache.get(_events_key(job_id)) or []
+        events.append(event)
+        cache.set(_events_key(job_id), events, JOB_TTL)
+    except Exception as exc:
+        logger.warning('Failed to publish OCR progress for job %s: %s', job_id, exc)
+
+
+def get_job_owner(job_id: str) -> Optional[int]:
+    """
+    Return the id of the user that owns the job, or None if it is unknown or expired.
+    """
+    return cache.get(_owner_key(job_id))
+
+
+def get_events(job_id: str, since: int = 0) -> List[Dict]:
+    """
+    Return the job's events starting at index ``since``.
+    """
+    events = cache.get(_events_key(job_id)) or []
+    return events[since:]
+
+
+aget_job_owner = sync_to_async(get_job_owner, thread_sensitive=False)
+aget_events = sync_to_async(get_events, thread_sensitive=False)
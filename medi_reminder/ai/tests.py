@@ -1,3 +1,312 @@
-from django.test import TestCase
+import contextlib
+import importlib
+import io
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import warnings
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from medi_reminder.celery import configure_ocr_worker
+from medi_reminder.testing import QueryBudgetTestCase
+from users.models import CustomUser
+from . import concurrency, engine_pool, language_routing, memory_guard, ocr_config, progress
+from .management.commands import _corpus
+from .exceptions import ImageTooLargeError, MemoryBudgetExceededError
+from .models import AIInsight, MedicationRecognition, OCRResult
+from .viewsets import AIInsightViewSet, MedicationRecognitionViewSet, OCRResultViewSet
+
+
+class AIQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='x')
+
+    def grow(self, rows):
+        for _ in range(rows):
+            ocr_result = OCRResult.objects.create(
+                image='ocr_images/label.png',
+                extracted_text='Aspirin 75mg', confidence_score=0.9, processing_time=0.1,
+            )
+            MedicationRecognition.objects.create(
+                ocr_result=ocr_result, medication_name='Aspirin', confidence_score=0.9
+            )
+            AIInsight.objects.create(
+                insight_type='general_recommendation', title='Keep going', description='', confidence_score=0.5
+            )
+
+    def test_ocr_results(self):
+        self.assertQueryBudget(OCRResultViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+    def test_medication_recognitions(self):
+        self.assertQueryBudget(MedicationRecognitionViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+    def test_unverified_recognitions(self):
+        self.assertQueryBudget(MedicationRecognitionViewSet.as_view({'get': 'unverified'}), 1, self.grow, self.user)
+
+    def test_insights(self):
+        self.assertQueryBudget(AIInsightViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProgressStreamAuthTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='stream', email='stream@example.com', password='x')
+        self.job_id = progress.create_job(self.user.id)
+        progress.publish(self.job_id, progress.STAGE_COMPLETED)
+
+    def stream(self, job_id, token):
+        return self.client.get(reverse('ocr_progress_stream', kwargs={'job_id': job_id}), {'token': token})
+
+    def test_stream_token_opens_its_job(self):
+        self.assertEqual(self.stream(self.job_id, progress.stream_token(self.job_id, self.user.id)).status_code, 200)
+
+    def test_stream_token_is_scoped_to_job(self):
+        other_job = progress.create_job(self.user.id)
+        self.assertEqual(self.stream(self.job_id, progress.stream_token(other_job, self.user.id)).status_code, 401)
+
+    def test_stream_token_expires(self):
+        token = progress.stream_token(self.job_id, self.user.id)
+        with mock.patch.object(progress, 'STREAM_TOKEN_TTL', -1):
+            self.assertEqual(self.stream(self.job_id, token).status_code, 401)
+
+    def test_api_token_not_accepted_in_url(self):
+        key = Token.objects.create(user=self.user).key
+        self.assertEqual(self.stream(self.job_id, key).status_code, 401)
+
+
+def png_header(width, height, color_type=2):
+    """
+    A PNG that declares ``width`` x ``height`` pixels but carries no pixel data.
+    """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IEND', b'')
+
+
+class MemoryGuardTests(SimpleTestCase):
+
+    def open_header(self, width, height, **kwargs):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            return Image.open(io.BytesIO(png_header(width, height, **kwargs)))
+
+    def test_rejects_oversized_dimensions_from_header(self):
+        image = self.open_header(7000, 7000)
+        with self.assertRaises(ImageTooLargeError):
+            memory_guard.check_image(image)
+
+    def test_rejects_oversized_decode_estimate(self):
+        # 4000x4000 RGBA fits the pixel limit but needs ~80MB to decode
+        image = self.open_header(4000, 4000, color_type=6)
+        with mock.patch.object(memory_guard, 'MAX_DECODE_BYTES', 64 * 1024 * 1024):
+            with self.assertRaises(ImageTooLargeError):
+                memory_guard.check_image(image)
+
+    def test_accepts_image_within_budget(self):
+        memory_guard.check_image(self.open_header(2000, 3000))
+
+    @mock.patch.object(memory_guard, '_recycler_configured', True)
+    @mock.patch.object(memory_guard, '_recycle_requested', False)
+    @mock.patch.object(memory_guard, '_images_processed', 0)
+    @mock.patch.object(memory_guard, 'WORKER_MAX_IMAGES', 2)
+    def test_recycled_process_refuses_work(self):
+        self.assertFalse(memory_guard.record_image_processed())
+        memory_guard.check_process()
+        self.assertTrue(memory_guard.record_image_processed())
+        memory_guard.request_recycle()
+        with self.assertRaises(MemoryBudgetExceededError):
+            memory_guard.check_process()
+
+    @mock.patch.object(memory_guard, '_recycler_configured', False)
+    @mock.patch.object(memory_guard, '_recycle_requested', False)
+    @mock.patch.object(memory_guard, '_images_processed', 0)
+    @mock.patch.object(memory_guard, 'WORKER_MAX_IMAGES', 2)
+    def test_process_without_recycler_keeps_serving(self):
+        for _ in range(3):
+            if memory_guard.record_image_processed():
+                memory_guard.request_recycle()
+            memory_guard.check_process()
+        self.assertFalse(memory_guard.recycle_requested())
+
+    @mock.patch.object(memory_guard, '_recycler_configured', False)
+    def test_only_dedicated_ocr_worker_enables_recycling(self):
+        conf = SimpleNamespace()
+        configure_ocr_worker(conf=conf, options={'queues': 'celery,ocr'})
+        self.assertFalse(memory_guard._recycler_configured)
+        self.assertFalse(hasattr(conf, 'worker_max_tasks_per_child'))
+
+        configure_ocr_worker(conf=conf, options={'queues': 'ocr'})
+        self.assertTrue(memory_guard._recycler_configured)
+        self.assertEqual(conf.worker_max_tasks_per_child, memory_guard.WORKER_MAX_IMAGES)
+
+
+class OCRConfigTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='ocr_config_test_'))
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = mock.patch.object(ocr_config, 'get_cache_dir', lambda: self.directory / 'cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def lexicon(self, *terms):
+        path = self.directory / f'lexicon-{len(list(self.directory.iterdir()))}.txt'
+        path.write_text('# comment\n\n' + '\n'.join(terms) + '\n', encoding='utf-8')
+        return path
+
+    def test_generated_files(self):
+        words_path, patterns_path = ocr_config.get_lexicon_files(self.lexicon('Amoxicillin', 'Vitamin D3'))
+
+        words = Path(words_path).read_text(encoding='utf-8').split()
+        self.assertIn('AMOXICILLIN', words)
+        self.assertIn('amoxicillin', words)
+        self.assertIn('Vitamin', words)
+        self.assertNotIn('#', words)
+        self.assertEqual(Path(patterns_path).read_text(encoding='utf-8').split(), ocr_config.DOSAGE_PATTERNS)
+
+    def test_files_are_keyed_by_content(self):
+        first = ocr_config.get_lexicon_files(self.lexicon('Aspirin'))
+        same = ocr_config.get_lexicon_files(self.lexicon('Aspirin'))
+        edited = ocr_config.get_lexicon_files(self.lexicon('Aspirin', 'Ibuprofen'))
+        self.assertEqual(first, same)
+        self.assertNotEqual(first[0], edited[0])
+
+    def test_config_string(self):
+        lexicon = self.lexicon('Aspirin')
+        words_path, patterns_path = ocr_config.get_lexicon_files(lexicon)
+        self.assertEqual(
+            ocr_config.build_tesseract_config(lexicon_path=lexicon, use_whitelist=False),
+            f"--oem 3 --psm 6 -c user_words_file={words_path} -c user_patterns_file={patterns_path}"
+        )
+        self.assertEqual(
+            ocr_config.build_tesseract_config(use_lexicon=False),
+            f"--oem 3 --psm 6 -c tessedit_char_whitelist={ocr_config.DEFAULT_CHAR_WHITELIST}"
+        )
+        with self.settings(OCR_USE_LEXICON=False):
+            self.assertEqual(ocr_config.build_tesseract_config(lexicon_path=lexicon, use_whitelist=False), ocr_config.BASE_CONFIG)
+
+    def test_benchmark_names_are_held_out_of_the_lexicon(self):
+        names = _corpus.drug_names(ocr_config.load_lexicon())
+        kept, held_out = _corpus.held_out_split(names)
+        self.assertTrue(held_out)
+        self.assertFalse(set(kept) & set(held_out))
+        self.assertEqual(_corpus.held_out_split(names), (kept, held_out))
+
+        directory, samples = _corpus.synthetic_corpus(2, held_out)
+        self.addCleanup(shutil.rmtree, directory)
+        rendered = {word for _, truth in samples for word in truth.split()}
+        self.assertTrue(rendered & set(held_out))
+        self.assertFalse(rendered & set(kept))
+
+
+@override_settings(OCR_OMP_THREAD_LIMIT=0, OCR_PARALLEL_JOBS=0, OCR_CONCURRENCY_FILE='')
+class ConcurrencyTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='ocr_concurrency_test_'))
+        self.addCleanup(shutil.rmtree, self.directory)
+        for patcher in (
+            mock.patch.object(concurrency, 'get_cache_dir', lambda: self.directory),
+            mock.patch.object(concurrency, 'available_cpus', lambda: 8),
+            mock.patch.object(concurrency, '_configured_plan', None),
+            mock.patch.object(concurrency, '_local_semaphore', None),
+            mock.patch.dict(os.environ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_default_plan_is_one_thread_per_job(self):
+        self.assertEqual(concurrency.get_plan(), {'threads': 1, 'jobs': 8})
+
+    def test_settings_override_the_plan(self):
+        with self.settings(OCR_OMP_THREAD_LIMIT=2):
+            self.assertEqual(concurrency.get_plan(), {'threads': 2, 'jobs': 4})
+        concurrency._configured_plan = None
+        with self.settings(OCR_OMP_THREAD_LIMIT=2, OCR_PARALLEL_JOBS=3):
+            self.assertEqual(concurrency.get_plan(), {'threads': 2, 'jobs': 3})
+
+    def test_calibration_applies_to_its_cpu_count_only(self):
+        concurrency.save_calibration(threads=2, jobs=4, images_per_second=5.0)
+        self.assertEqual(concurrency.get_plan(), {'threads': 2, 'jobs': 4})
+
+        concurrency._configured_plan = None
+        with mock.patch.object(concurrency, 'available_cpus', lambda: 4):
+            self.assertEqual(concurrency.get_plan(), {'threads': 1, 'jobs': 4})
+
+    def test_configure_environment_sets_thread_limit(self):
+        concurrency.configure_environment(3)
+        self.assertEqual(os.environ['OMP_THREAD_LIMIT'], '3')
+        with self.settings(OCR_OMP_THREAD_LIMIT=2):
+            concurrency.configure_environment()
+        self.assertEqual(os.environ['OMP_THREAD_LIMIT'], '2')
+
+    def test_thread_limit_is_set_before_tesserocr_loads(self):
+        seen = []
+
+        class RecordingFinder:
+            def find_spec(self, name, path=None, target=None):
+                if name == 'tesserocr':
+                    seen.append(os.environ.get('OMP_THREAD_LIMIT'))
+                    raise ImportError(name)
+                return None
+
+        os.environ.pop('OMP_THREAD_LIMIT', None)
+        self.addCleanup(importlib.reload, engine_pool)
+        finders = [RecordingFinder()] + sys.meta_path
+        with self.settings(OCR_OMP_THREAD_LIMIT=2), mock.patch.object(sys, 'meta_path', finders):
+            with mock.patch.dict(sys.modules):
+                sys.modules.pop('tesserocr', None)
+                importlib.reload(engine_pool)
+
+        self.assertEqual(seen, ['2'])
+        self.assertIsNone(engine_pool.tesserocr)
+
+    def assertSlotsCapped(self, jobs):
+        with self.settings(OCR_PARALLEL_JOBS=jobs), contextlib.ExitStack() as held:
+            for _ in range(jobs):
+                held.enter_context(concurrency.ocr_slot(timeout=1))
+            with self.assertRaises(TimeoutError):
+                with concurrency.ocr_slot(timeout=0.1):
+                    pass
+        with concurrency.ocr_slot(timeout=1):
+            pass
+
+    def test_slots_cap_parallel_jobs(self):
+        self.assertSlotsCapped(2)
+
+    def test_slots_fall_back_to_a_process_semaphore(self):
+        with mock.patch.object(concurrency, 'fcntl', None):
+            self.assertSlotsCapped(2)
+
+
+@mock.patch.object(language_routing, 'installed_languages', lambda: {'eng', 'hin', 'tam', 'osd'})
+class LanguageRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.image = Image.new('L', (10, 10))
+
+    def test_multi_language_preference_skips_detection(self):
+        with mock.patch.object(language_routing, 'detect_script') as detect_script:
+            self.assertEqual(language_routing.select_languages(self.image, 'hin+eng'), ('hin+eng', None))
+        detect_script.assert_not_called()
+
+    def test_preference_drops_missing_languages(self):
+        self.assertEqual(language_routing.select_languages(self.image, 'ben+eng'), ('eng', language_routing.LATIN_SCRIPT))
+
+    def test_no_preference_routes_by_script(self):
+        with mock.patch.object(language_routing, 'detect_script', return_value=('Tamil', 5.0)):
+            self.assertEqual(language_routing.select_languages(self.image), ('tam+eng', 'Tamil'))
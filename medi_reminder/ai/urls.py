@@ -27,4 +27,5 @@ urlpatterns = [
     path('ocr-result/<int:result_id>/', views.OCRResultView.as_view(), name='ocr_result'),
     path('recognition/<int:recognition_id>/', views.MedicationRecognitionDetailView.as_view(), name='recognition_detail'),
     path('history/', views.user_ai_history, name='user_ai_history'),
+    path('ocr/jobs/<str:job_id>/events/', views.ocr_progress_stream, name='ocr_progress_stream'),
 ]
@@ -5,16 +5,22 @@ This module contains Django views for AI-related functionality
 including OCR processing, medication recognition, and AI insights.
 """
 
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from rest_framework.authtoken.models import Token
+from . import progress
 from .models import OCRResult, MedicationRecognition, AIInsight
-import json
 import pytesseract
 from PIL import Image
 
@@ -106,4 +112,90 @@ def user_ai_history(request):
     Returns history of OCR and medication recognition for the current user.
     """
     # Implementation for AI history
-    return JsonResponse({'history': []})
\ No newline at end of file
+    return JsonResponse({'history': []})
+
+
+# Seconds between cache polls, between keep-alive comments, and before giving up on a job
+PROGRESS_POLL_INTERVAL = 0.5
+PROGRESS_HEARTBEAT_INTERVAL = 15
+PROGRESS_STREAM_TIMEOUT = 10 * 60
+
+
+def _resolve_stream_user_id(request, job_id):
+    """
+    Resolve the id of the user opening a progress stream.
+
+    Accepts the session user, an ``Authorization: Token <key>`` header, or a
+    ``?token=`` stream token issued for this job with its ``job_id``, since
+    browser EventSource cannot send headers.
+    """
+    if request.user.is_authenticated:
+        return request.user.pk
+
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Token '):
+        key = auth_header[len('Token '):].strip()
+        return Token.objects.filter(key=key).values_list('user_id', flat=True).first()
+
+    token = request.GET.get('token', '')
+    return progress.check_stream_token(token, job_id) if token else None
+
+
+async def _progress_event_stream(job_id, cursor):
+    """
+    Yield server-sent events for a job until it reaches a terminal stage.
+
+    Waiting happens in ``asyncio.sleep``, so an idle stream holds no worker thread.
+    """
+    started = last_sent = time.monotonic()
+    yield "retry: 2000\n\n"
+
+    while time.monotonic() - started < PROGRESS_STREAM_TIMEOUT:
+        events = await progress.aget_events(job_id, since=cursor)
+        for event in events:
+            cursor += 1
+            yield f"id: {cursor}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+            last_sent = time.monotonic()
+            if event['stage'] in progress.TERMINAL_STAGES:
+                return
+
+        if time.monotonic() - last_sent >= PROGRESS_HEARTBEAT_INTERVAL:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+        await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+    yield f"event: timeout\ndata: {json.dumps({'stage': 'timeout'})}\n\n"
+
+
+async def ocr_progress_stream(request, job_id):
+    """
+    Server-sent events stream for an OCR job.
+
+    Sends one event per pipeline stage (uploaded, preprocessed, ocr_done,
+    parsed, persisted) followed by ``completed`` carrying the parsed
+    medications, or ``failed``. Reconnecting clients resume from the
+    ``Last-Event-ID`` header.
+
+    GET /api/ocr/jobs/{job_id}/events/
+    """
+    user_id = await sync_to_async(_resolve_stream_user_id)(request, job_id)
+    if user_id is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+
+    owner_id = await progress.aget_job_owner(job_id)
+    if owner_id is None or owner_id != user_id:
+        return JsonResponse({'error': 'OCR job not found.'}, status=404)
+
+    try:
+        cursor = max(int(request.headers.get('Last-Event-ID', 0)), 0)
+    except ValueError:
+        cursor = 0
+
+    response = StreamingHttpResponse(
+        _progress_event_stream(job_id, cursor),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -10,6 +10,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Q
+from .insights import COMPLIANCE_DAYS, compliance_analysis
 from .models import OCRResult, MedicationRecognition, AIInsight
 from .serializers import (
     OCRResultSerializer,
@@ -82,7 +84,7 @@ class MedicationRecognitionViewSet(viewsets.ModelViewSet):
         """
         Filter medication recognitions by current user if needed.
         """
-        return MedicationRecognition.objects.all()
+        return MedicationRecognition.objects.select_related('ocr_result')
     
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):
@@ -124,9 +126,9 @@ class AIInsightViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Filter AI insights by current user if needed.
+        Current user's insights and general ones.
         """
-        return AIInsight.objects.all()
+        return AIInsight.objects.filter(Q(user=self.request.user) | Q(user__isnull=True))
     
     @action(detail=False, methods=['get'])
     def active(self, request):
@@ -139,6 +141,25 @@ class AIInsightViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def compliance(self, request):
+        """
+        Analyse the current user's recent dose adherence.
+        
+        POST /api/ai-insights/compliance/ {"days": 7}
+        """
+        try:
+            days = int(request.data.get('days', COMPLIANCE_DAYS))
+        except (TypeError, ValueError):
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 366:
+            return Response({'error': 'days must be between 1 and 366'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        insight = compliance_analysis(request.user, days)
+        if insight is None:
+            return Response({'message': 'No doses taken or missed in this period yet'})
+        return Response(self.get_serializer(insight).data, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def generate_recommendations(self, request, pk=None):
         """
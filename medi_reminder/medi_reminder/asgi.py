@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+
+Long-lived streaming endpoints (e.g. the OCR progress event stream) should be
+served through this application, e.g. ``uvicorn medi_reminder.asgi:application``,
+so waiting clients do not each hold a sync worker thread.
 """
 
 import os
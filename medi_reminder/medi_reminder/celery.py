@@ -0,0 +1,92 @@
+"""
+Celery configuration for MediReminder project.
+
+This module configures Celery for asynchronous task processing.
+It sets up the Celery app with Redis as the message broker and result backend.
+"""
+
+import os
+from celery import Celery
+from celery.signals import celeryd_init, worker_process_shutdown
+
+# Set the default Django settings module for the 'celery' program.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medi_reminder.settings')
+
+# Create the Celery app instance
+app = Celery('medi_reminder')
+
+# Using a string here means the worker doesn't have to serialize
+# the configuration object to child processes.
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load task modules from all registered Django apps.
+app.autodiscover_tasks()
+
+# Optional: Configure periodic tasks (beat schedule)
+app.conf.beat_schedule = {
+    # Send notifications for reminders that have come due
+    'dispatch-reminders': {
+        'task': 'reminders.tasks.dispatch_reminders',
+        'schedule': 30.0,  # Run every 30 seconds
+    },
+    # Deliver queued notifications, one relay per priority lane on its own queue
+    'relay-notifications-critical': {
+        'task': 'notifications.tasks.relay_outbox',
+        'schedule': 10.0,  # Run every 10 seconds
+        'args': (['critical'],),
+        'options': {'queue': 'notifications.critical'},
+    },
+    'relay-notifications-standard': {
+        'task': 'notifications.tasks.relay_outbox',
+        'schedule': 30.0,  # Run every 30 seconds
+        'args': (['standard'],),
+        'options': {'queue': 'notifications.standard'},
+    },
+    'relay-notifications-digest': {
+        'task': 'notifications.tasks.relay_outbox',
+        'schedule': 60.0,  # Run every minute
+        'args': (['digest'],),
+        'options': {'queue': 'notifications.digest'},
+    },
+    # Retries whose backoff has elapsed
+    'relay-notifications-retry': {
+        'task': 'notifications.tasks.relay_outbox',
+        'schedule': 60.0,  # Run every minute
+        'args': (['retry'],),
+        'options': {'queue': 'notifications.retry'},
+    },
+    # Mark reminders left pending past the grace window as missed
+    'sweep-missed-reminders': {
+        'task': 'reminders.tasks.sweep_missed_reminders_task',
+        'schedule': 300.0,  # Run every 5 minutes
+    },
+}
+
+# Optional: Set timezone
+app.conf.timezone = 'UTC'
+
+@celeryd_init.connect
+def configure_ocr_worker(conf=None, options=None, **kwargs):
+    """Recycle the processes of a worker dedicated to the OCR queue from the OCR memory budget."""
+    from django.conf import settings
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    if [queue.strip() for queue in queues if queue.strip()] != [settings.OCR_TASK_QUEUE]:
+        return
+    conf.worker_max_tasks_per_child = settings.OCR_WORKER_MAX_IMAGES
+    conf.worker_max_memory_per_child = settings.OCR_WORKER_MAX_RSS_MB * 1024  # in KiB
+    # Pool processes are forked from this one and inherit the flag
+    from ai import memory_guard
+    memory_guard.enable_recycling()
+
+@worker_process_shutdown.connect
+def close_notification_channels(**kwargs):
+    """Close persistent notification connections when a worker process exits."""
+    from notifications.channels import close_channels
+    close_channels()
+
+@app.task(bind=True)
+def debug_task(self):
+    """Debug task to test Celery setup."""
+    print(f'Request: {self.request!r}')
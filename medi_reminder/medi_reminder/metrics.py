@@ -0,0 +1,97 @@
+"""
+Lightweight operational counters for MediReminder.
+
+Counters and gauges are kept in the configured cache so that every app node
+and Celery worker reports into the same place. Recording a metric never
+raises: a cache outage must not break the code path being measured.
+"""
+
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:'
+
+# Metrics are operational, not historical; keep them for a week of idle time
+METRIC_TTL = 7 * 24 * 60 * 60
+
+
+def _key(name: str) -> str:
+    return f"{KEY_PREFIX}{name}"
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    Increase a counter by ``amount``.
+    """
+    key = _key(name)
+    try:
+        cache.add(key, 0, METRIC_TTL)
+        cache.incr(key, amount)
+    except Exception as exc:
+        logger.debug('Failed to increment metric %s: %s', name, exc)
+
+
+def set_gauge(name: str, value: float) -> None:
+    """
+    Record the current value of a gauge.
+    """
+    try:
+        cache.set(_key(name), value, METRIC_TTL)
+    except Exception as exc:
+        logger.debug('Failed to set metric %s: %s', name, exc)
+
+
+def record_sample(name: str, value: float, limit: int = 120) -> None:
+    """
+    Append a timestamped value to a short series, keeping the latest ``limit`` samples.
+
+    Read-modify-write, so samples from concurrent writers can be lost; fine
+    for watching a trend, not for counting.
+    """
+    key = _key(name)
+    try:
+        samples = cache.get(key) or []
+        samples.append((time.time(), value))
+        cache.set(key, samples[-limit:], METRIC_TTL)
+    except Exception as exc:
+        logger.debug('Failed to record metric sample %s: %s', name, exc)
+
+
+def get_samples(name: str) -> List[Tuple[float, float]]:
+    """
+    Read a series written by ``record_sample`` as ``(unix time, value)`` pairs, oldest first.
+    """
+    try:
+        return cache.get(_key(name)) or []
+    except Exception as exc:
+        logger.debug('Failed to read metric %s: %s', name, exc)
+        return []
+
+
+def get(name: str, default: Optional[float] = 0) -> Optional[float]:
+    """
+    Read a counter or gauge.
+    """
+    try:
+        return cache.get(_key(name), default)
+    except Exception as exc:
+        logger.debug('Failed to read metric %s: %s', name, exc)
+        return default
+
+
+def get_many(names: Iterable[str]) -> Dict[str, float]:
+    """
+    Read several counters or gauges at once; missing ones are reported as 0.
+    """
+    names = list(names)
+    try:
+        values = cache.get_many([_key(name) for name in names])
+    except Exception as exc:
+        logger.debug('Failed to read metrics: %s', exc)
+        values = {}
+    return {name: values.get(_key(name), 0) for name in names}
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from kombu import Queue
 
 # Load environment variables from .env file
 load_dotenv()
@@ -55,6 +56,7 @@ INSTALLED_APPS = [
     'medications',
     'reminders',
     'ai',
+    'notifications',
 ]
 
 MIDDLEWARE = [
@@ -229,6 +231,68 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# OCR memory budget
+# Images are rejected from their header before decoding if they exceed these limits,
+# and OCR workers refuse work / are recycled once they cross the RSS threshold.
+OCR_MAX_IMAGE_PIXELS = int(os.getenv('OCR_MAX_IMAGE_PIXELS', '40000000'))
+OCR_MAX_DECODE_MB = int(os.getenv('OCR_MAX_DECODE_MB', '256'))
+OCR_WORKER_MAX_RSS_MB = int(os.getenv('OCR_WORKER_MAX_RSS_MB', '1024'))
+OCR_WORKER_MAX_IMAGES = int(os.getenv('OCR_WORKER_MAX_IMAGES', '200'))
+# OCR tasks run on their own queue. A worker started with `-Q ocr` alone has its
+# processes recycled after OCR_WORKER_MAX_IMAGES tasks or OCR_WORKER_MAX_RSS_MB
+# (see medi_reminder/celery.py); other workers keep Celery's defaults.
+OCR_TASK_QUEUE = os.getenv('OCR_TASK_QUEUE', 'ocr')
+
+# Reminder dispatch (see reminders/dispatch.py)
+REMINDER_DISPATCH_BATCH_SIZE = int(os.getenv('REMINDER_DISPATCH_BATCH_SIZE', '200'))
+REMINDER_DISPATCH_MAX_BATCHES = int(os.getenv('REMINDER_DISPATCH_MAX_BATCHES', '50'))
+
+# A user's reminders dispatched together within this many minutes of each
+# other go out as one digest; 0 sends one notification per reminder (see reminders/delivery.py)
+REMINDER_COALESCE_WINDOW_MINUTES = int(os.getenv('REMINDER_COALESCE_WINDOW_MINUTES', '15'))
+
+# Catch-up mode for dispatch backlogs after outages (see reminders/catchup.py).
+# Dispatch switches to it once the oldest due reminder has waited LAG_MINUTES;
+# RATE (reminders per second) should stay at or above normal dispatch throughput.
+REMINDER_CATCHUP_STALE_MINUTES = int(os.getenv('REMINDER_CATCHUP_STALE_MINUTES', '15'))
+REMINDER_CATCHUP_LAG_MINUTES = int(os.getenv('REMINDER_CATCHUP_LAG_MINUTES', '5'))
+REMINDER_CATCHUP_RATE = float(os.getenv('REMINDER_CATCHUP_RATE', '1000'))
+REMINDER_CATCHUP_BATCH_SIZE = int(os.getenv('REMINDER_CATCHUP_BATCH_SIZE', str(REMINDER_DISPATCH_BATCH_SIZE)))
+REMINDER_CATCHUP_MAX_BATCHES = int(os.getenv('REMINDER_CATCHUP_MAX_BATCHES', str(REMINDER_DISPATCH_MAX_BATCHES)))
+
+# Per-user cache of the upcoming/pending reminder views, in seconds (see reminders/cache.py)
+REMINDER_CACHE_TTL = int(os.getenv('REMINDER_CACHE_TTL', '60'))
+
+# Missed-reminder sweeper (see reminders/sweeper.py)
+REMINDER_MISSED_GRACE_MINUTES = int(os.getenv('REMINDER_MISSED_GRACE_MINUTES', '60'))
+REMINDER_SWEEP_CHUNK_SIZE = int(os.getenv('REMINDER_SWEEP_CHUNK_SIZE', '1000'))
+REMINDER_SWEEP_MAX_CHUNKS = int(os.getenv('REMINDER_SWEEP_MAX_CHUNKS', '100'))
+REMINDER_SWEEP_CHUNK_PAUSE = float(os.getenv('REMINDER_SWEEP_CHUNK_PAUSE', '0'))
+
+# Days of reminders generated for medications without an end date (see reminders/schedule.py)
+REMINDER_SCHEDULE_DAYS = int(os.getenv('REMINDER_SCHEDULE_DAYS', '30'))
+
+# Past days of one-off reminders included in the iCalendar feed (see reminders/ics.py)
+REMINDER_CALENDAR_PAST_DAYS = int(os.getenv('REMINDER_CALENDAR_PAST_DAYS', '30'))
+
+# In-memory reminder scheduler (see reminders/scheduler.py, `manage.py run_reminder_scheduler`)
+REMINDER_SCHEDULER_TICK = float(os.getenv('REMINDER_SCHEDULER_TICK', '0.1'))
+REMINDER_SCHEDULER_HORIZON_MINUTES = int(os.getenv('REMINDER_SCHEDULER_HORIZON_MINUTES', '10'))
+REMINDER_SCHEDULER_REFRESH_SECONDS = int(os.getenv('REMINDER_SCHEDULER_REFRESH_SECONDS', '30'))
+
+# Pre-staging of reminder bursts in the scheduler (see reminders/prestage.py)
+REMINDER_PRESTAGE_MINUTES = float(os.getenv('REMINDER_PRESTAGE_MINUTES', '5'))
+REMINDER_PRESTAGE_BURST_THRESHOLD = int(os.getenv('REMINDER_PRESTAGE_BURST_THRESHOLD', '200'))
+REMINDER_PRESTAGE_JITTER_SECONDS = float(os.getenv('REMINDER_PRESTAGE_JITTER_SECONDS', '0'))
+
+# Dose event log (see reminders/events.py): write events from a Celery task instead of inline
+REMINDER_DOSE_EVENTS_ASYNC = os.getenv('REMINDER_DOSE_EVENTS_ASYNC', 'True').lower() == 'true'
+
+# Partitioned scheduling across scheduler nodes (see reminders/partitions.py)
+REMINDER_PARTITIONS = int(os.getenv('REMINDER_PARTITIONS', '16'))
+REMINDER_PARTITION_LEASE_SECONDS = int(os.getenv('REMINDER_PARTITION_LEASE_SECONDS', '90'))
+REMINDER_PARTITION_LEASE_BACKEND = os.getenv('REMINDER_PARTITION_LEASE_BACKEND', 'db')
+
 # Redis Configuration
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
@@ -255,8 +319,85 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Notification channels (see notifications/channels.py). RATE is sends per
+# second per worker process, BURST the bucket size.
+NOTIFICATION_CHANNELS = {
+    'email': {
+        'BACKEND': 'notifications.channels.EmailChannel',
+        'RATE': float(os.getenv('EMAIL_RATE_LIMIT', '10')),
+        'BURST': int(os.getenv('EMAIL_RATE_BURST', '50')),
+        'BATCH_SIZE': 100,
+    },
+    'sms': {
+        'BACKEND': 'notifications.channels.SMSChannel',
+        'URL': os.getenv('SMS_GATEWAY_URL', ''),
+        'API_KEY': os.getenv('SMS_GATEWAY_API_KEY', ''),
+        'RATE': float(os.getenv('SMS_RATE_LIMIT', '5')),
+        'BURST': int(os.getenv('SMS_RATE_BURST', '10')),
+    },
+    'webpush': {
+        'BACKEND': 'notifications.channels.WebPushChannel',
+        'URL': os.getenv('WEBPUSH_GATEWAY_URL', ''),
+        'API_KEY': os.getenv('WEBPUSH_GATEWAY_API_KEY', ''),
+        'RATE': float(os.getenv('WEBPUSH_RATE_LIMIT', '50')),
+        'BURST': int(os.getenv('WEBPUSH_RATE_BURST', '100')),
+    },
+}
+
+# Notification outbox relay (see notifications/outbox.py)
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv('NOTIFICATION_OUTBOX_BATCH_SIZE', '200'))
+NOTIFICATION_OUTBOX_MAX_BATCHES = int(os.getenv('NOTIFICATION_OUTBOX_MAX_BATCHES', '50'))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '6'))
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+NOTIFICATION_RETRY_MAX_SECONDS = int(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', '3600'))
+NOTIFICATION_LEASE_SECONDS = int(os.getenv('NOTIFICATION_LEASE_SECONDS', '120'))
+
+# Relay priority lanes: batches a multi-lane relay takes from each lane per
+# round, as 'critical=8,standard=4,digest=2,retry=1'. Each lane is relayed on
+# its own Celery queue (see CELERY_TASK_QUEUES).
+NOTIFICATION_LANE_WEIGHTS = {
+    lane.strip(): int(weight)
+    for lane, weight in (
+        item.split('=') for item in
+        os.getenv('NOTIFICATION_LANE_WEIGHTS', 'critical=8,standard=4,digest=2,retry=1').split(',') if item.strip()
+    )
+}
+CELERY_TASK_ROUTES = {
+    'notifications.tasks.relay_outbox': {'queue': 'notifications.standard'},
+    'medications.tasks.process_prescription_ocr': {'queue': OCR_TASK_QUEUE},
+}
+# Queues a worker started without -Q consumes, so a plain
+# `celery -A medi_reminder worker` serves every lane. Lanes can be given
+# dedicated workers instead, e.g. `-Q notifications.critical` next to one
+# started with the remaining queues (see README).
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_QUEUES = [
+    Queue(name, routing_key=name) for name in (
+        CELERY_TASK_DEFAULT_QUEUE,
+        'notifications.critical', 'notifications.standard', 'notifications.digest', 'notifications.retry',
+        OCR_TASK_QUEUE,
+    )
+]
+
+# Channels each reminder is sent on, e.g. "email,sms"
+REMINDER_NOTIFICATION_CHANNELS = [
+    channel.strip() for channel in os.getenv('REMINDER_NOTIFICATION_CHANNELS', 'email').split(',') if channel.strip()
+]
+
 # Tesseract OCR Configuration
 # Configure the path to the Tesseract executable via environment variable.
 # Example on Windows: C:\\Program Files\\Tesseract-OCR\\tesseract.exe
 # Example on Linux/macOS: /usr/bin/tesseract
-TESSERACT_CMD = os.getenv('TESSERACT_CMD', '')
\ No newline at end of file
+TESSERACT_CMD = os.getenv('TESSERACT_CMD', '')
+
+# Medication lexicon for tesseract user-words/user-patterns (see ai/ocr_config.py).
+# Generated files are cached in OCR_CACHE_DIR (defaults to the system temp dir).
+OCR_USE_LEXICON = os.getenv('OCR_USE_LEXICON', 'True').lower() == 'true'
+OCR_LEXICON_PATH = os.getenv('OCR_LEXICON_PATH', '')
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', '')
+
+# OCR concurrency (see ai/concurrency.py). 0 means auto-detect from available CPUs,
+# cgroup quota and the result of `manage.py calibrate_ocr_concurrency --save`.
+OCR_OMP_THREAD_LIMIT = int(os.getenv('OCR_OMP_THREAD_LIMIT', '0'))
+OCR_PARALLEL_JOBS = int(os.getenv('OCR_PARALLEL_JOBS', '0'))
+OCR_SLOT_TIMEOUT = int(os.getenv('OCR_SLOT_TIMEOUT', '120'))
\ No newline at end of file
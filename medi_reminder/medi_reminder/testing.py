@@ -0,0 +1,47 @@
+"""
+Query budgets for API endpoints.
+
+``QueryBudgetTestCase.assertQueryBudget`` calls a view at growing result
+sizes and fails when a call runs more queries than the endpoint's budget,
+or when the count changes with the number of rows, which is how an N+1
+shows up. The cache is disabled so cached endpoints build every response.
+"""
+
+from typing import Callable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base class for per-endpoint query budget tests.
+    """
+    # Rows added before each call
+    growth = (1, 4)
+
+    def count_queries(self, view, user, path: str = '/', **kwargs) -> int:
+        """
+        Queries run by a GET to ``view`` as ``user``, response rendering included.
+        """
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+            response.render()
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return len(queries)
+
+    def assertQueryBudget(self, view, budget: int, grow: Callable[[int], None], user, path: str = '/', **kwargs):
+        """
+        Assert ``view`` stays within ``budget`` queries however many rows ``grow`` adds.
+        """
+        label = f"{view.cls.__name__}.{getattr(view, 'actions', {}).get('get', 'get')}"
+        counts = []
+        for rows in self.growth:
+            grow(rows)
+            counts.append(self.count_queries(view, user, path, **kwargs))
+        self.assertLessEqual(max(counts), budget, f'{label} ran {counts} queries, budget {budget}')
+        self.assertEqual(len(set(counts)), 1, f'{label} query count grows with its rows: {counts}')
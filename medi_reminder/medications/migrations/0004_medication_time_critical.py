@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0003_alter_prescription_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='time_critical',
+            field=models.BooleanField(default=False, help_text='Doses must be taken on time (e.g. insulin); reminders use the critical delivery lane'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0004_medication_time_critical'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['user', '-created_at'], name='medication_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['user', 'end_date'], name='medication_user_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['user', '-created_at'], name='prescription_user_created_idx'),
+        ),
+    ]
@@ -23,6 +23,10 @@ class Medication(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     instructions = models.TextField(blank=True)
+    time_critical = models.BooleanField(
+        default=False,
+        help_text="Doses must be taken on time (e.g. insulin); reminders use the critical delivery lane"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -30,6 +34,11 @@ class Medication(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Medication'
         verbose_name_plural = 'Medications'
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='medication_user_created_idx'),
+            # Active medications: end_date null or not yet passed
+            models.Index(fields=['user', 'end_date'], name='medication_user_end_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.dosage} ({self.frequency})"
@@ -65,6 +74,9 @@ class Prescription(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Prescription'
         verbose_name_plural = 'Prescriptions'
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='prescription_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Prescription #{self.id} - {self.user.username} - {self.created_at.strftime('%Y-%m-%d')}"
@@ -0,0 +1,84 @@
+"""
+Service functions for the medications app.
+
+Holds the prescription OCR pipeline so it can run either inside the upload
+request or in a Celery worker, publishing stage events for progress streaming.
+"""
+
+import logging
+from typing import Dict, Optional
+
+from ai import progress
+from ai.ocr_service import extract_text_from_image, parse_prescription_text
+from .models import Prescription, PrescriptionItem
+
+logger = logging.getLogger(__name__)
+
+
+def process_prescription(prescription: Prescription, job_id: Optional[str] = None) -> Dict:
+    """
+    Run OCR and parsing on an uploaded prescription and persist its items.
+
+    Stage events are published to ``job_id`` (if given) as the pipeline
+    advances. OCRProcessingError and PrescriptionParsingError propagate to
+    the caller, which decides how to report them.
+
+    Returns:
+        dict: Response payload with the doctor name and created medications
+    """
+    raw_text = extract_text_from_image(
+        prescription.image.path,
+        progress_callback=lambda stage: progress.publish(job_id, stage),
+        languages=prescription.user.ocr_languages or None
+    )
+    logger.info(f"Extracted text length: {len(raw_text)}")
+    progress.publish(job_id, progress.STAGE_OCR_DONE, text_length=len(raw_text))
+
+    parsed_data = parse_prescription_text(raw_text)
+    progress.publish(
+        job_id, progress.STAGE_PARSED,
+        medications_count=len(parsed_data.get('medications', []))
+    )
+
+    if parsed_data.get('doctor_name'):
+        prescription.doctor_name = parsed_data['doctor_name']
+        prescription.save()
+        logger.info(f"Updated doctor name: {prescription.doctor_name}")
+
+    medications_created = []
+    for med in parsed_data.get('medications', []):
+        if med.get('name'):
+            try:
+                prescription_item = PrescriptionItem.objects.create(
+                    prescription=prescription,
+                    medication_name=med['name'],
+                    dosage=med.get('dosage'),
+                    frequency=med.get('frequency')
+                )
+                medications_created.append({
+                    "name": prescription_item.medication_name,
+                    "dosage": prescription_item.dosage,
+                    "frequency": prescription_item.frequency
+                })
+                logger.debug(f"Created medication: {prescription_item.medication_name}")
+            except Exception as e:
+                logger.error(f"Failed to create medication: {e}")
+
+    progress.publish(job_id, progress.STAGE_PERSISTED, prescription_id=prescription.id)
+    logger.info(f"Successfully processed prescription #{prescription.id} with {len(medications_created)} medications")
+
+    response_data = {
+        "success": True,
+        "message": "Prescription uploaded and processed successfully.",
+        "prescription_id": prescription.id,
+        "doctor_name": prescription.doctor_name,
+        "medications": medications_created,
+        "medications_count": len(medications_created)
+    }
+
+    if not medications_created:
+        logger.warning(f"No medications extracted for prescription #{prescription.id}")
+        response_data["warning"] = "No medications could be extracted. Please verify the image quality."
+
+    progress.publish(job_id, progress.STAGE_COMPLETED, result=response_data)
+    return response_data
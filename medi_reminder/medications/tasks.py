@@ -0,0 +1,53 @@
+"""
+Celery tasks for the medications app.
+"""
+
+import logging
+
+from celery import shared_task
+
+from ai import progress
+from ai.exceptions import MemoryBudgetExceededError
+from .models import Prescription
+from .services import process_prescription
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds before a task refused by a worker over its memory budget is tried again
+OCR_RETRY_DELAY = 30
+
+
+@shared_task(bind=True, max_retries=3)
+def process_prescription_ocr(self, prescription_id, job_id):
+    """
+    Run the prescription OCR pipeline in a worker, reporting progress to ``job_id``.
+
+    A worker over its memory budget or due for recycling refuses the job; it is
+    retried later, by then usually on a fresh worker process.
+    """
+    try:
+        prescription = Prescription.objects.select_related('user').get(id=prescription_id)
+    except Prescription.DoesNotExist:
+        logger.warning(f"Prescription #{prescription_id} no longer exists, skipping OCR job {job_id}")
+        progress.publish(job_id, progress.STAGE_FAILED, error="Prescription not found.")
+        return None
+
+    try:
+        return process_prescription(prescription, job_id=job_id)
+    except MemoryBudgetExceededError as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"OCR job {job_id} refused ({e}), retrying in {OCR_RETRY_DELAY}s")
+            raise self.retry(exc=e, countdown=OCR_RETRY_DELAY)
+        logger.error(f"OCR job {job_id} refused after {self.request.retries} retries: {e}")
+        prescription.delete()
+        progress.publish(job_id, progress.STAGE_FAILED, error="Server is busy. Please try again shortly.")
+        return None
+    except Exception as e:
+        logger.error(f"OCR job {job_id} failed: {e}", exc_info=True)
+        prescription.delete()
+        progress.publish(
+            job_id, progress.STAGE_FAILED,
+            error="Failed to extract text from image. Please ensure the image is clear and readable."
+        )
+        return None
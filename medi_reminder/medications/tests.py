@@ -1,3 +1,69 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from medi_reminder.testing import QueryBudgetTestCase
+from users.models import CustomUser
+from .models import Medication, Prescription, PrescriptionItem
+from .views import PrescriptionDetailView, PrescriptionListView
+from .viewsets import MedicationViewSet, PrescriptionViewSet
+
+
+class MedicationQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='x')
+
+    def grow(self, rows):
+        for _ in range(rows):
+            Medication.objects.create(
+                user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+            )
+
+    def test_list(self):
+        self.assertQueryBudget(MedicationViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+    def test_search(self):
+        self.assertQueryBudget(
+            MedicationViewSet.as_view({'get': 'search'}), 1, self.grow, self.user, path='/?name=asp'
+        )
+
+
+class PrescriptionQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='x')
+        self.prescription = self.add_prescription()
+
+    def add_prescription(self):
+        return Prescription.objects.create(
+            user=self.user, doctor_name='Dr. Rao',
+            image='prescriptions/prescription.png',
+        )
+
+    def add_item(self, prescription):
+        PrescriptionItem.objects.create(
+            prescription=prescription, medication_name='Aspirin', dosage='75mg', frequency='OD'
+        )
+
+    def grow(self, rows):
+        # New prescriptions with items, and more items on the existing one
+        for _ in range(rows):
+            self.add_item(self.add_prescription())
+            self.add_item(self.prescription)
+
+    def test_list_view(self):
+        # Prescriptions and their items
+        self.assertQueryBudget(PrescriptionListView.as_view(), 2, self.grow, self.user)
+
+    def test_detail_view(self):
+        self.assertQueryBudget(
+            PrescriptionDetailView.as_view(), 2, self.grow, self.user, prescription_id=self.prescription.id
+        )
+
+    def test_viewset_list(self):
+        # Page count, page and items
+        self.assertQueryBudget(PrescriptionViewSet.as_view({'get': 'list'}), 3, self.grow, self.user)
+
+    def test_viewset_retrieve(self):
+        self.assertQueryBudget(
+            PrescriptionViewSet.as_view({'get': 'retrieve'}), 2, self.grow, self.user, pk=self.prescription.id
+        )
@@ -8,17 +8,23 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.urls import reverse
 from PIL import Image
 
 from .models import Prescription, PrescriptionItem
 from .serializers import PrescriptionSerializer
-from ai.ocr_service import extract_text_from_image, parse_prescription_text
+from .services import process_prescription
+from .tasks import process_prescription_ocr
+from ai import progress
 from ai.exceptions import (
     OCRProcessingError, 
     PrescriptionParsingError,
     InvalidImageError,
-    UnsupportedFileTypeError
+    UnsupportedFileTypeError,
+    ImageTooLargeError,
+    MemoryBudgetExceededError
 )
+from ai import memory_guard
 
 logger = logging.getLogger(__name__)
 
@@ -54,7 +60,7 @@ class OCRUploadView(APIView):
         
         try:
             self._validate_image(image_file)
-        except (UnsupportedFileTypeError, InvalidImageError) as e:
+        except (UnsupportedFileTypeError, InvalidImageError, ImageTooLargeError) as e:
             logger.warning(f"Image validation failed: {e}")
             return Response(
                 {"success": False, "error": str(e)},
@@ -67,11 +73,29 @@ class OCRUploadView(APIView):
             prescription = Prescription.objects.create(user=request.user, image=image_file)
             logger.info(f"Created prescription #{prescription.id}")
             
+            job_id = progress.create_job(request.user.id)
+            progress.publish(job_id, progress.STAGE_UPLOADED, prescription_id=prescription.id)
+            
+            if self._wants_async(request):
+                process_prescription_ocr.delay(prescription.id, job_id)
+                logger.info(f"Queued OCR job {job_id} for prescription #{prescription.id}")
+                return Response(
+                    {
+                        "success": True,
+                        "message": "Prescription uploaded. Processing has started.",
+                        "prescription_id": prescription.id,
+                        "job_id": job_id,
+                        "stream_token": progress.stream_token(job_id, request.user.id),
+                        "events_url": reverse('ocr_progress_stream', kwargs={'job_id': job_id}),
+                    },
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
             try:
-                raw_text = extract_text_from_image(prescription.image.path)
-                logger.info(f"Extracted text length: {len(raw_text)}")
+                response_data = process_prescription(prescription, job_id=job_id)
             except OCRProcessingError as e:
                 logger.error(f"OCR extraction failed: {e}")
+                progress.publish(job_id, progress.STAGE_FAILED, error="Failed to extract text from image.")
                 prescription.delete()
                 return Response(
                     {
@@ -81,11 +105,27 @@ class OCRUploadView(APIView):
                     },
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-            
-            try:
-                parsed_data = parse_prescription_text(raw_text)
+            except (ImageTooLargeError, Image.DecompressionBombError) as e:
+                logger.warning(f"Image rejected by memory guard: {e}")
+                progress.publish(job_id, progress.STAGE_FAILED, error="Image is too large to process.")
+                prescription.delete()
+                return Response(
+                    {"success": False, "error": "Image is too large to process."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            except (MemoryBudgetExceededError, TimeoutError) as e:
+                logger.error(f"OCR refused, worker busy or over memory budget: {e}")
+                progress.publish(job_id, progress.STAGE_FAILED, error="Server is busy. Please try again shortly.")
+                prescription.delete()
+                response = Response(
+                    {"success": False, "error": "Server is busy. Please try again shortly."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                response['Retry-After'] = '30'
+                return response
             except PrescriptionParsingError as e:
                 logger.error(f"Parsing failed: {e}")
+                progress.publish(job_id, progress.STAGE_FAILED, error="Failed to parse prescription details.")
                 return Response(
                     {
                         "success": False,
@@ -96,45 +136,7 @@ class OCRUploadView(APIView):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
-            if parsed_data.get('doctor_name'):
-                prescription.doctor_name = parsed_data['doctor_name']
-                prescription.save()
-                logger.info(f"Updated doctor name: {prescription.doctor_name}")
-            
-            medications_created = []
-            for med in parsed_data.get('medications', []):
-                if med.get('name'):
-                    try:
-                        prescription_item = PrescriptionItem.objects.create(
-                            prescription=prescription,
-                            medication_name=med['name'],
-                            dosage=med.get('dosage'),
-                            frequency=med.get('frequency')
-                        )
-                        medications_created.append({
-                            "name": prescription_item.medication_name,
-                            "dosage": prescription_item.dosage,
-                            "frequency": prescription_item.frequency
-                        })
-                        logger.debug(f"Created medication: {prescription_item.medication_name}")
-                    except Exception as e:
-                        logger.error(f"Failed to create medication: {e}")
-            
-            logger.info(f"Successfully processed prescription #{prescription.id} with {len(medications_created)} medications")
-            
-            response_data = {
-                "success": True,
-                "message": "Prescription uploaded and processed successfully.",
-                "prescription_id": prescription.id,
-                "doctor_name": prescription.doctor_name,
-                "medications": medications_created,
-                "medications_count": len(medications_created)
-            }
-            
-            if not medications_created:
-                logger.warning(f"No medications extracted for prescription #{prescription.id}")
-                response_data["warning"] = "No medications could be extracted. Please verify the image quality."
-            
+            response_data["job_id"] = job_id
             return Response(response_data, status=status.HTTP_201_CREATED)
         
         except Exception as e:
@@ -150,6 +152,11 @@ class OCRUploadView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _wants_async(self, request) -> bool:
+        """Check whether the client asked for background processing (``?async=true``)."""
+        value = request.query_params.get('async') or request.data.get('async') or ''
+        return str(value).lower() in ('1', 'true', 'yes')
+    
     def _validate_image(self, image_file: InMemoryUploadedFile):
         """Validate uploaded image file."""
         file_extension = image_file.name.split('.')[-1].lower()
@@ -158,8 +165,11 @@ class OCRUploadView(APIView):
         
         try:
             img = Image.open(image_file)
+            memory_guard.check_image(img)
             img.verify()
             image_file.seek(0)
+        except ImageTooLargeError:
+            raise
         except Exception as e:
             logger.error(f"Image validation failed: {e}")
             raise InvalidImageError("Invalid or corrupted image file")
@@ -176,16 +186,17 @@ class PrescriptionListView(APIView):
         """Get all prescriptions for authenticated user - returns array directly."""
         try:
             logger.info(f"Fetching prescriptions for user: {request.user.username}")
-            prescriptions = Prescription.objects.filter(user=request.user)
+            prescriptions = Prescription.objects.filter(user=request.user).select_related('user').prefetch_related('items')
             serializer = PrescriptionSerializer(
                 prescriptions, 
                 many=True,
                 context={'request': request}
             )
-            logger.info(f"Returning {prescriptions.count()} prescriptions")
+            data = serializer.data
+            logger.info(f"Returning {len(data)} prescriptions")
             
             # Return array directly for frontend compatibility
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(data, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Error fetching prescriptions: {e}", exc_info=True)
@@ -203,7 +214,9 @@ class PrescriptionDetailView(APIView):
         """Get details of a specific prescription."""
         try:
             logger.info(f"Fetching prescription #{prescription_id} for {request.user.username}")
-            prescription = Prescription.objects.get(id=prescription_id, user=request.user)
+            prescription = Prescription.objects.select_related('user').prefetch_related('items').get(
+                id=prescription_id, user=request.user
+            )
             serializer = PrescriptionSerializer(prescription, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         
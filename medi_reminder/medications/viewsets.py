@@ -13,6 +13,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db import models
 from .models import Medication, Prescription
 from .serializers import MedicationSerializer, PrescriptionSerializer
+from reminders.schedule import UnrecognizedFrequencyError, generate_reminders
 
 
 class MedicationViewSet(viewsets.ModelViewSet):
@@ -34,7 +35,7 @@ class MedicationViewSet(viewsets.ModelViewSet):
         """
         Filter medications by current user.
         """
-        return Medication.objects.filter(user=self.request.user)
+        return Medication.objects.filter(user=self.request.user).select_related('user')
     
     @action(detail=False, methods=['get'])
     def search(self, request):
@@ -51,6 +52,26 @@ class MedicationViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         return Response({'error': 'name parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['post'])
+    def generate_reminders(self, request, pk=None):
+        """
+        Create reminders for every dose in the medication's treatment window.
+        
+        POST /api/medications/{id}/generate_reminders/
+        
+        Safe to call repeatedly: doses that already have a reminder are skipped.
+        """
+        medication = self.get_object()
+        try:
+            created, existing = generate_reminders(medication)
+        except UnrecognizedFrequencyError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            {'created': created, 'existing': existing},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -63,15 +84,15 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     serializer_class = PrescriptionSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['processed']
-    ordering_fields = ['uploaded_at']
-    ordering = ['-uploaded_at']
+    filterset_fields = ['doctor_name']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     
     def get_queryset(self):
         """
         Filter prescriptions by current user.
         """
-        return Prescription.objects.filter(user=self.request.user)
+        return Prescription.objects.filter(user=self.request.user).select_related('user').prefetch_related('items')
     
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
@@ -0,0 +1,36 @@
+"""
+Admin configuration for the notifications app.
+
+This module configures the Django admin interface for the notification outbox.
+"""
+
+from django.contrib import admin
+from django.utils import timezone
+from .models import DeliveryAttempt, OutboxMessage
+
+
+class DeliveryAttemptInline(admin.TabularInline):
+    model = DeliveryAttempt
+    extra = 0
+    readonly_fields = ['attempted_at', 'success', 'error']
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for OutboxMessage model.
+
+    Dead letters can be found by filtering on status and requeued from the list.
+    """
+    list_display = ['key', 'channel', 'lane', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'lane', 'channel', 'created_at']
+    search_fields = ['key', 'recipient']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    inlines = [DeliveryAttemptInline]
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected messages')
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} messages requeued")
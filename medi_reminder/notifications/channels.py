@@ -0,0 +1,328 @@
+"""
+Notification channels.
+
+A channel owns a persistent connection to one provider and sends
+notifications in batches over it: email reuses one SMTP connection across
+batches, SMS and web push share a pooled keep-alive HTTP session. Every
+send first takes a token from the channel's rate-limit bucket.
+
+Channels are configured in ``settings.NOTIFICATION_CHANNELS`` and created
+once per process through ``get_channel``.
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    """
+    One message for one recipient on one channel.
+
+    ``key`` identifies the logical notification; providers that support it
+    receive it as an idempotency key so a resend is not delivered twice.
+    ``lane`` is the outbox priority lane it is relayed in.
+    """
+    channel: str
+    recipient: str
+    subject: str
+    body: str
+    key: str
+    data: Dict = field(default_factory=dict)
+    lane: str = 'standard'
+
+
+class Channel:
+    """
+    Base class for notification channels.
+
+    Subclasses implement ``open``, ``close`` and ``deliver``; ``send``
+    handles batching, rate limiting and reconnecting after a failure.
+    ``idempotent`` channels pass the notification key to a provider that
+    drops repeats, so a resend after a crash is harmless.
+    """
+    idempotent = False
+
+    def __init__(
+        self,
+        name: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        batch_size: int = 100,
+        rate_limit_timeout: float = 5.0,
+        max_idle: float = 60.0,
+        **options
+    ):
+        self.name = name
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.rate_limit_timeout = rate_limit_timeout
+        self.max_idle = max_idle
+        self.options = options
+        self.is_open = False
+        self.last_used = 0.0
+        # Connections are not thread-safe; one batch at a time per channel
+        self.lock = threading.Lock()
+
+    def open(self) -> None:
+        self.is_open = True
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def deliver(self, notification: Notification) -> None:
+        """
+        Send a single notification over the open connection; raise on failure.
+        """
+        raise NotImplementedError
+
+    def is_connection_error(self, error: Exception) -> bool:
+        """
+        Whether ``error`` may have left the connection unusable, so it must be reopened.
+        """
+        return True
+
+    def send(
+        self,
+        notifications: Iterable[Notification],
+        errors: Optional[Dict[str, str]] = None,
+        before_deliver: Optional[Callable[[Notification], bool]] = None,
+        after_deliver: Optional[Callable[[Notification], None]] = None,
+    ) -> Set[str]:
+        """
+        Send notifications in batches of ``batch_size``.
+
+        Stops early when the rate limit cannot be met within
+        ``rate_limit_timeout``; the rest are left for a later attempt. If
+        ``errors`` is given, it is filled with the error of every attempted
+        notification that failed, keyed by notification key. A notification
+        for which ``before_deliver`` returns False is skipped, and
+        ``after_deliver`` is called with every notification delivered.
+
+        Returns:
+            set: Keys of the notifications that were delivered
+        """
+        notifications = list(notifications)
+        delivered = set()
+        with self.lock:
+            for offset in range(0, len(notifications), self.batch_size):
+                batch = notifications[offset:offset + self.batch_size]
+                sent, throttled = self._send_batch(
+                    batch, errors if errors is not None else {}, before_deliver, after_deliver
+                )
+                delivered |= sent
+                if throttled:
+                    logger.warning(
+                        f"{self.name}: rate limit reached, deferring "
+                        f"{len(notifications) - offset - len(sent)} notifications"
+                    )
+                    break
+        return delivered
+
+    def _send_batch(
+        self,
+        batch: List[Notification],
+        errors: Dict[str, str],
+        before_deliver: Optional[Callable[[Notification], bool]] = None,
+        after_deliver: Optional[Callable[[Notification], None]] = None,
+    ) -> tuple:
+        delivered = set()
+        # Providers drop idle connections; reconnect rather than fail the first send
+        if self.is_open and time.monotonic() - self.last_used > self.max_idle:
+            self._reset()
+        try:
+            if not self.is_open:
+                self.open()
+        except Exception as e:
+            logger.error(f"{self.name}: could not open connection: {e}")
+            errors.update((notification.key, f"could not connect: {e}") for notification in batch)
+            return delivered, False
+
+        for notification in batch:
+            if self.bucket and not self.bucket.acquire(timeout=self.rate_limit_timeout):
+                return delivered, True
+            if before_deliver is not None and not before_deliver(notification):
+                continue
+            try:
+                self.deliver(notification)
+            except Exception as e:
+                logger.error(f"{self.name}: failed to send {notification.key}: {e}")
+                errors[notification.key] = str(e)
+                if not self.is_connection_error(e):
+                    continue
+                self._reset()
+                try:
+                    self.open()
+                except Exception as e:
+                    logger.error(f"{self.name}: could not reopen connection: {e}")
+                    return delivered, False
+                continue
+            delivered.add(notification.key)
+            self.last_used = time.monotonic()
+            if after_deliver is not None:
+                after_deliver(notification)
+        return delivered, False
+
+    def _reset(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+        self.is_open = False
+
+
+class EmailChannel(Channel):
+    """
+    Email over Django's email backend, keeping one connection open across batches.
+
+    SMTP has no idempotency: the ``X-Idempotency-Key`` header only helps
+    tracing, and a message handed over twice is delivered twice.
+
+    Options:
+        BACKEND_PATH: Email backend to use (default ``settings.EMAIL_BACKEND``)
+        FROM_EMAIL: Sender address (default ``settings.DEFAULT_FROM_EMAIL``)
+    """
+
+    def open(self) -> None:
+        self.connection = get_connection(self.options.get('backend_path'), fail_silently=False)
+        self.connection.open()
+        super().open()
+
+    def close(self) -> None:
+        connection = getattr(self, 'connection', None)
+        if connection is not None:
+            connection.close()
+        super().close()
+
+    def deliver(self, notification: Notification) -> None:
+        message = EmailMessage(
+            subject=notification.subject,
+            body=notification.body,
+            from_email=self.options.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+            to=[notification.recipient],
+            headers={'X-Idempotency-Key': notification.key},
+            connection=self.connection,
+        )
+        if not self.connection.send_messages([message]):
+            raise RuntimeError('message was not accepted')
+
+
+class HTTPChannel(Channel):
+    """
+    JSON-over-HTTP provider using a pooled keep-alive session.
+
+    The notification key is sent as the ``Idempotency-Key`` header, which
+    the provider uses to drop repeated requests.
+
+    Options:
+        URL: Endpoint notifications are POSTed to
+        API_KEY: Sent as a bearer token if set
+        POOL_SIZE: Connections kept in the pool (default 10)
+        TIMEOUT: Request timeout in seconds (default 10)
+    """
+
+    idempotent = True
+
+    def open(self) -> None:
+        if not self.options.get('url'):
+            raise RuntimeError(f"{self.name}: no URL configured")
+        pool_size = self.options.get('pool_size', 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if self.options.get('api_key'):
+            self.session.headers['Authorization'] = f"Bearer {self.options['api_key']}"
+        super().open()
+
+    def close(self) -> None:
+        session = getattr(self, 'session', None)
+        if session is not None:
+            session.close()
+        super().close()
+
+    def is_connection_error(self, error: Exception) -> bool:
+        # An error status arrived over a healthy connection
+        return not isinstance(error, requests.HTTPError)
+
+    def payload(self, notification: Notification) -> Dict:
+        raise NotImplementedError
+
+    def deliver(self, notification: Notification) -> None:
+        response = self.session.post(
+            self.options['url'],
+            json=self.payload(notification),
+            headers={'Idempotency-Key': notification.key},
+            timeout=self.options.get('timeout', 10),
+        )
+        response.raise_for_status()
+
+
+class SMSChannel(HTTPChannel):
+    """
+    SMS through an HTTP gateway; the recipient is a phone number.
+    """
+
+    def payload(self, notification: Notification) -> Dict:
+        return {'to': notification.recipient, 'message': notification.body}
+
+
+class WebPushChannel(HTTPChannel):
+    """
+    Web push through an HTTP push relay; the recipient is the user id the relay maps to subscriptions.
+    """
+
+    def payload(self, notification: Notification) -> Dict:
+        return {
+            'user': notification.recipient,
+            'title': notification.subject,
+            'body': notification.body,
+            'data': notification.data,
+        }
+
+
+_channels: Dict[str, Channel] = {}
+_channels_lock = threading.Lock()
+
+
+def get_channel(name: str) -> Channel:
+    """
+    Return the process-wide channel instance named ``name``.
+
+    Raises:
+        KeyError: If the channel is not configured
+    """
+    channel = _channels.get(name)
+    if channel is not None:
+        return channel
+
+    with _channels_lock:
+        if name not in _channels:
+            config = dict(getattr(settings, 'NOTIFICATION_CHANNELS', {})[name])
+            backend = import_string(config.pop('BACKEND'))
+            _channels[name] = backend(name=name, **{key.lower(): value for key, value in config.items()})
+        return _channels[name]
+
+
+def close_channels() -> None:
+    """
+    Close every open channel connection, e.g. at worker shutdown.
+    """
+    with _channels_lock:
+        for channel in _channels.values():
+            channel._reset()
+        _channels.clear()
@@ -0,0 +1,22 @@
+"""
+Report queue depth and latency for each notification priority lane.
+
+Usage:
+    python manage.py notification_lane_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import lane_stats
+
+
+class Command(BaseCommand):
+    help = 'Show due messages, oldest wait and claim latency per notification lane.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'lane':<10} {'depth':>7} {'oldest':>9} {'avg latency':>12} {'last max':>12}")
+        for lane, stats in lane_stats().items():
+            self.stdout.write(
+                f"{lane:<10} {stats['depth']:>7} {stats['oldest_seconds']:>8.1f}s "
+                f"{stats['avg_latency_ms']:>10.0f}ms {stats['max_latency_ms']:>10.0f}ms"
+            )
@@ -0,0 +1,40 @@
+"""
+Run the local SMTP sink and fake HTTP gateway for development.
+
+Usage:
+    python manage.py run_notification_sinks --smtp-port 1025 --http-port 8025
+
+Then set EMAIL_HOST=127.0.0.1, EMAIL_PORT=1025, EMAIL_USE_TLS=False and
+SMS_GATEWAY_URL / WEBPUSH_GATEWAY_URL to http://127.0.0.1:8025/.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.testing import FakeGateway, SMTPSink
+
+
+class Command(BaseCommand):
+    help = 'Run an in-process SMTP sink and fake HTTP notification gateway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--http-port', type=int, default=8025)
+
+    def handle(self, *args, **options):
+        with SMTPSink(port=options['smtp_port']) as sink, FakeGateway(port=options['http_port']) as gateway:
+            self.stdout.write(self.style.SUCCESS(
+                f"SMTP sink on 127.0.0.1:{sink.port}, gateway on {gateway.url} (Ctrl+C to stop)"
+            ))
+            seen_messages, seen_requests = 0, 0
+            try:
+                while True:
+                    time.sleep(1)
+                    for message in sink.messages[seen_messages:]:
+                        self.stdout.write(f"[smtp] {', '.join(message['to'])}: {message['subject']}")
+                    for request in gateway.requests[seen_requests:]:
+                        self.stdout.write(f"[http] {request['payload']}")
+                    seen_messages, seen_requests = len(sink.messages), len(gateway.requests)
+            except KeyboardInterrupt:
+                pass
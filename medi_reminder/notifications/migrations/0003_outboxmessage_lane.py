@@ -0,0 +1,26 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_outboxmessage_staged'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxmessage',
+            name='outbox_status_next_idx',
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='lane',
+            field=models.CharField(choices=[('critical', 'Time-critical dose'), ('standard', 'Standard dose'), ('digest', 'Digest'), ('retry', 'Retry')], default='standard', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['status', 'lane', 'next_attempt_at'], name='outbox_status_lane_next_idx'),
+        ),
+    ]
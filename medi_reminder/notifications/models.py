@@ -0,0 +1,80 @@
+"""
+Models for the notifications app.
+
+This module contains the transactional outbox: notifications are written as
+outbox rows in the same transaction as the state change that causes them,
+and a relay delivers them afterwards, recording every attempt.
+"""
+
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    Model representing a notification waiting for (or done with) delivery.
+
+    ``key`` is unique per logical notification, so enqueueing the same
+    notification twice is a no-op, and it is passed to providers as their
+    idempotency key. While a relay is sending, ``next_attempt_at`` holds the
+    lease expiry after which another relay may pick the message up again.
+    ``staged`` messages are rendered ahead of time and ignored by the relay
+    until they are released. ``lane`` is the priority lane the message is
+    relayed in; failed messages move to the ``retry`` lane.
+    """
+    STATUS_CHOICES = [
+        ('staged', 'Staged'),
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead letter'),
+    ]
+    LANE_CHOICES = [
+        ('critical', 'Time-critical dose'),
+        ('standard', 'Standard dose'),
+        ('digest', 'Digest'),
+        ('retry', 'Retry'),
+    ]
+
+    key = models.CharField(max_length=200, unique=True, help_text="Idempotency key of the notification")
+    channel = models.CharField(max_length=20)
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    lane = models.CharField(max_length=20, choices=LANE_CHOICES, default='standard')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outbox Message'
+        verbose_name_plural = 'Outbox Messages'
+        indexes = [
+            models.Index(fields=['status', 'lane', 'next_attempt_at'], name='outbox_status_lane_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+class DeliveryAttempt(models.Model):
+    """
+    Model recording one attempt to deliver an outbox message.
+    """
+    message = models.ForeignKey(OutboxMessage, on_delete=models.CASCADE, related_name='delivery_attempts')
+    attempted_at = models.DateTimeField(default=timezone.now)
+    success = models.BooleanField()
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-attempted_at']
+        verbose_name = 'Delivery Attempt'
+        verbose_name_plural = 'Delivery Attempts'
+
+    def __str__(self):
+        return f"Attempt on {self.message_id} at {self.attempted_at:%Y-%m-%d %H:%M} ({'ok' if self.success else 'failed'})"
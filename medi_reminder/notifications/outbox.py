@@ -0,0 +1,459 @@
+"""
+Transactional outbox relay.
+
+``enqueue`` writes notifications as ``OutboxMessage`` rows and must be
+called inside the transaction that changes the state they report on, so the
+notification exists if and only if the change commits. ``relay`` then
+drains the outbox in batches:
+
+1. Claim due messages by moving them to ``sending`` with a lease
+   (``SELECT ... FOR UPDATE SKIP LOCKED`` where supported, a conditional
+   UPDATE per row on SQLite).
+2. Send them through their channel, passing the outbox key as the
+   provider's idempotency key.
+3. Record an attempt per message and mark it sent, schedule a retry with
+   exponential backoff, or dead-letter it after ``MAX_ATTEMPTS``.
+
+Notifications for a known upcoming burst can be rendered ahead of time with
+``stage``; they wait as ``staged`` rows until ``release`` hands them to the
+relay (or ``discard`` drops them).
+
+Messages are relayed in priority lanes (``critical``, ``standard``,
+``digest`` and ``retry``). Each lane has its own Celery queue, and a relay
+serving several lanes takes batches from them by smooth weighted round
+robin (``NOTIFICATION_LANE_WEIGHTS``), so a backlog in one lane slows the
+others down in proportion to its weight but never blocks them. Queue
+latency, from when a message became due to when it was claimed, is
+recorded per lane.
+
+A relay that dies mid-batch leaves its messages ``sending`` until the lease
+expires, and another relay then picks them up. Idempotent channels (HTTP
+providers taking an ``Idempotency-Key``) are sent in bulk: a resend carries
+the same key and the provider drops it. For other channels, email included,
+each message's lease is renewed just before it is sent and the send is
+recorded right after. A slow batch then never loses a message it is still
+going to send, and a relay that dies re-sends at most the one message it
+was sending at the time. Every status change after sending is conditional
+on the relay still holding the message's lease, so a relay whose lease
+expired never overwrites what the message's new owner did with it.
+"""
+
+import time
+import random
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from medi_reminder import metrics
+from .channels import Notification, get_channel
+from .models import DeliveryAttempt, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 200)
+MAX_BATCHES = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_BATCHES', 50)
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 6)
+RETRY_BASE_SECONDS = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+RETRY_MAX_SECONDS = getattr(settings, 'NOTIFICATION_RETRY_MAX_SECONDS', 3600)
+LEASE_SECONDS = getattr(settings, 'NOTIFICATION_LEASE_SECONDS', 120)
+LANES = [lane for lane, _ in OutboxMessage.LANE_CHOICES]
+LANE_WEIGHTS = getattr(settings, 'NOTIFICATION_LANE_WEIGHTS', {'critical': 8, 'standard': 4, 'digest': 2, 'retry': 1})
+
+
+@dataclass
+class RelayStats:
+    """
+    Outcome of one relay run.
+    """
+    claimed: int = 0
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+    deferred: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+
+def enqueue(notifications: Iterable[Notification]) -> int:
+    """
+    Add notifications to the outbox; ones whose key is already there are skipped.
+
+    A staged message with the same key is released instead, so a
+    notification staged ahead of time is never left behind when it ends up
+    being dispatched the normal way. Call inside the transaction making the
+    corresponding state change.
+
+    Returns:
+        int: Number of notifications passed in
+    """
+    now = timezone.now()
+    messages = [
+        OutboxMessage(
+            key=notification.key,
+            channel=notification.channel,
+            recipient=notification.recipient,
+            subject=notification.subject,
+            body=notification.body,
+            data=notification.data,
+            lane=notification.lane,
+            next_attempt_at=now,
+        )
+        for notification in notifications
+    ]
+    OutboxMessage.objects.bulk_create(messages, batch_size=500, ignore_conflicts=True)
+    release([message.key for message in messages], now)
+    return len(messages)
+
+
+def stage(notifications: Iterable[Notification]) -> int:
+    """
+    Store rendered notifications as ``staged``, invisible to the relay until released.
+
+    Returns:
+        int: Number of notifications passed in
+    """
+    messages = [
+        OutboxMessage(
+            key=notification.key,
+            channel=notification.channel,
+            recipient=notification.recipient,
+            subject=notification.subject,
+            body=notification.body,
+            data=notification.data,
+            lane=notification.lane,
+            status='staged',
+        )
+        for notification in notifications
+    ]
+    OutboxMessage.objects.bulk_create(messages, batch_size=1000, ignore_conflicts=True)
+    return len(messages)
+
+
+def release(keys: List[str], now: Optional[datetime] = None) -> int:
+    """
+    Hand staged messages to the relay.
+
+    Call inside the transaction making the corresponding state change.
+
+    Returns:
+        int: Number of messages released
+    """
+    now = now or timezone.now()
+    released = 0
+    for offset in range(0, len(keys), 500):
+        released += OutboxMessage.objects.filter(
+            key__in=keys[offset:offset + 500], status='staged'
+        ).update(status='pending', next_attempt_at=now)
+    return released
+
+
+def discard(keys: List[str]) -> int:
+    """
+    Drop staged messages that will not be sent.
+    """
+    discarded = 0
+    for offset in range(0, len(keys), 500):
+        discarded += OutboxMessage.objects.filter(key__in=keys[offset:offset + 500], status='staged').delete()[0]
+    return discarded
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff with jitter for the given number of failed attempts.
+    """
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def due_messages(now: datetime, lanes: Optional[List[str]] = None):
+    """
+    Messages waiting to be sent, including ones whose sending lease has expired.
+    """
+    messages = OutboxMessage.objects.filter(
+        status__in=['pending', 'sending'], next_attempt_at__lte=now
+    )
+    if lanes is not None:
+        messages = messages.filter(lane__in=lanes)
+    return messages
+
+
+# Claimed messages keep the next_attempt_at they were due at, for latency metrics
+
+def _claim_locked(now: datetime, batch_size: int, lanes: Optional[List[str]] = None) -> List[OutboxMessage]:
+    lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+    with transaction.atomic():
+        batch = list(
+            due_messages(now, lanes)
+            .order_by('next_attempt_at')
+            .select_for_update(skip_locked=True, of=lock_of)[:batch_size]
+        )
+        if batch:
+            OutboxMessage.objects.filter(id__in=[message.id for message in batch]).update(
+                status='sending', next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return batch
+
+
+def _claim_sqlite(now: datetime, batch_size: int, lanes: Optional[List[str]] = None) -> List[OutboxMessage]:
+    candidates = list(due_messages(now, lanes).order_by('next_attempt_at')[:batch_size])
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    return [
+        message for message in candidates
+        if due_messages(now).filter(id=message.id).update(status='sending', next_attempt_at=lease)
+    ]
+
+
+def _claimer():
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_locked
+    return _claim_sqlite
+
+
+def _record_latency(batch: List[OutboxMessage], now: datetime) -> None:
+    by_lane = defaultdict(list)
+    for message in batch:
+        by_lane[message.lane].append(max(0, int((now - message.next_attempt_at).total_seconds() * 1000)))
+    for lane, latencies in by_lane.items():
+        metrics.increment(f'notifications.lane.{lane}.claimed', len(latencies))
+        metrics.increment(f'notifications.lane.{lane}.latency_ms', sum(latencies))
+        metrics.set_gauge(f'notifications.lane.{lane}.latency_max_ms', max(latencies))
+
+
+class _LeaseKeeper:
+    """
+    Renews each message's lease just before it is sent and records the send right after.
+
+    Used for channels whose provider cannot drop a resent message.
+    """
+
+    def __init__(self, messages: List[OutboxMessage], lease: datetime):
+        self.messages = {message.key: message for message in messages}
+        self.leases = dict.fromkeys(self.messages, lease)
+        self.recorded = set()
+        self.lost = set()
+
+    def before_deliver(self, notification: Notification) -> bool:
+        message = self.messages[notification.key]
+        lease = timezone.now() + timedelta(seconds=LEASE_SECONDS)
+        renewed = OutboxMessage.objects.filter(
+            id=message.id, status='sending', next_attempt_at=self.leases[notification.key]
+        ).update(next_attempt_at=lease)
+        if not renewed:
+            # The lease expired and another relay has claimed the message
+            logger.warning(f"Lost the lease on notification {notification.key}, leaving it to its new owner")
+            self.lost.add(notification.key)
+            return False
+        self.leases[notification.key] = lease
+        return True
+
+    def after_deliver(self, notification: Notification) -> None:
+        message = self.messages[notification.key]
+        now = timezone.now()
+        with transaction.atomic():
+            OutboxMessage.objects.filter(id=message.id).update(status='sent', sent_at=now, last_error='')
+            DeliveryAttempt.objects.create(message=message, attempted_at=now, success=True)
+        self.recorded.add(notification.key)
+
+
+def _send(batch: List[OutboxMessage], stats: RelayStats, lease: datetime) -> None:
+    by_channel = defaultdict(list)
+    for message in batch:
+        by_channel[message.channel].append(message)
+
+    now = timezone.now()
+    _record_latency(batch, now)
+    # The lease each message is held under; per-message renewals replace it
+    leases = {message.key: lease for message in batch}
+    sent, errors, recorded, lost = set(), {}, set(), set()
+    for channel, messages in by_channel.items():
+        notifications = [
+            Notification(
+                channel=message.channel,
+                recipient=message.recipient,
+                subject=message.subject,
+                body=message.body,
+                key=message.key,
+                data=message.data,
+                lane=message.lane,
+            )
+            for message in messages
+        ]
+        try:
+            provider = get_channel(channel)
+        except KeyError:
+            errors.update((message.key, f"unknown channel {channel!r}") for message in messages)
+            continue
+        if provider.idempotent:
+            sent |= provider.send(notifications, errors=errors)
+            continue
+        keeper = _LeaseKeeper(messages, lease)
+        try:
+            sent |= provider.send(
+                notifications, errors=errors,
+                before_deliver=keeper.before_deliver, after_deliver=keeper.after_deliver
+            )
+        finally:
+            recorded |= keeper.recorded
+            lost |= keeper.lost
+            leases.update(keeper.leases)
+
+    attempts, done, retry, dead, untried = [], [], [], [], []
+    for message in batch:
+        if message.key in recorded or message.key in lost:
+            continue
+        if message.key in sent:
+            attempts.append(DeliveryAttempt(message=message, attempted_at=now, success=True))
+            done.append(message)
+        elif message.key in errors:
+            attempts.append(DeliveryAttempt(message=message, attempted_at=now, success=False, error=errors[message.key]))
+            message.attempts += 1
+            message.last_error = errors[message.key]
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = 'dead'
+                dead.append(message)
+            else:
+                message.status = 'pending'
+                message.lane = 'retry'
+                message.next_attempt_at = now + retry_delay(message.attempts)
+                retry.append(message)
+        else:
+            # Not attempted (rate limited): release without counting an attempt
+            untried.append(message)
+
+    # Every write is conditional on still holding the message's lease: once
+    # it has expired, another relay may have claimed, sent or retried it
+    def held(messages):
+        by_lease = defaultdict(list)
+        for message in messages:
+            by_lease[leases[message.key]].append(message.id)
+        return [
+            OutboxMessage.objects.filter(id__in=ids, status='sending', next_attempt_at=held_lease)
+            for held_lease, ids in by_lease.items()
+        ]
+
+    with transaction.atomic():
+        DeliveryAttempt.objects.bulk_create(attempts)
+        for messages in held(done):
+            messages.update(status='sent', sent_at=now, last_error='')
+        failed = [
+            message for message in retry + dead
+            if held([message])[0].update(
+                status=message.status, lane=message.lane, attempts=message.attempts,
+                next_attempt_at=message.next_attempt_at, last_error=message.last_error,
+            )
+        ]
+        retry = [message for message in failed if message.status != 'dead']
+        dead = [message for message in failed if message.status == 'dead']
+        deferred = sum(messages.update(status='pending', next_attempt_at=now) for messages in held(untried))
+
+    for message in dead:
+        logger.error(f"Notification {message.key} dead-lettered after {message.attempts} attempts: {message.last_error}")
+
+    stats.sent += len(sent)
+    stats.retried += len(retry)
+    stats.dead += len(dead)
+    stats.deferred += deferred
+
+
+def _weighted_order(lanes: List[str]):
+    """
+    Yield lanes in smooth weighted round-robin order, e.g. weights 3:1 give a, a, b, a, a, a, b, a, ...
+    """
+    weights = {lane: max(1, LANE_WEIGHTS.get(lane, 1)) for lane in lanes}
+    total = sum(weights.values())
+    current = dict.fromkeys(lanes, 0)
+    while True:
+        for lane in lanes:
+            current[lane] += weights[lane]
+        lane = max(lanes, key=lambda name: current[name])
+        current[lane] -= total
+        yield lane
+
+
+def relay(
+    now: Optional[datetime] = None,
+    batch_size: int = BATCH_SIZE,
+    max_batches: int = MAX_BATCHES,
+    lanes: Optional[List[str]] = None
+) -> RelayStats:
+    """
+    Deliver due outbox messages in batches until none are left or ``max_batches`` is reached.
+
+    Batches are taken from ``lanes`` (default: all) in weighted round-robin
+    order; a lane drops out of the run once it is empty or its provider's
+    rate limit defers part of a batch.
+
+    Returns:
+        RelayStats: Counts for the run
+    """
+    claim = _claimer()
+    stats = RelayStats()
+    started = time.perf_counter()
+    active = list(lanes or LANES)
+    order = _weighted_order(active)
+    while active and stats.batches < max_batches:
+        lane = next(order)
+        if lane not in active:
+            continue
+        claimed_at = now or timezone.now()
+        batch = claim(claimed_at, batch_size, [lane])
+        deferred = stats.deferred
+        if batch:
+            stats.batches += 1
+            stats.claimed += len(batch)
+            _send(batch, stats, claimed_at + timedelta(seconds=LEASE_SECONDS))
+        # Drop the lane when it is drained or a provider's rate limit deferred part of the batch
+        if len(batch) < batch_size or stats.deferred > deferred:
+            active.remove(lane)
+    stats.elapsed = time.perf_counter() - started
+
+    if stats.claimed:
+        metrics.increment('notifications.outbox.sent', stats.sent)
+        metrics.increment('notifications.outbox.retried', stats.retried)
+        metrics.increment('notifications.outbox.dead', stats.dead)
+        logger.info(
+            f"Relayed {stats.sent}/{stats.claimed} notifications in {stats.batches} batches "
+            f"({stats.retried} to retry, {stats.dead} dead-lettered, {stats.elapsed:.2f}s)"
+        )
+    return stats
+
+
+def lane_stats(now: Optional[datetime] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Per-lane queue depth and age of the oldest due message, with the average
+    and latest maximum claim latency recorded by the relay.
+    """
+    now = now or timezone.now()
+    rows = {
+        row['lane']: row for row in
+        due_messages(now).values('lane').annotate(depth=Count('id'), oldest=Min('next_attempt_at')).order_by()
+    }
+    counters = metrics.get_many(
+        f'notifications.lane.{lane}.{name}' for lane in LANES for name in ('claimed', 'latency_ms', 'latency_max_ms')
+    )
+
+    report = {}
+    for lane in LANES:
+        row = rows.get(lane)
+        claimed = counters[f'notifications.lane.{lane}.claimed']
+        report[lane] = {
+            'depth': row['depth'] if row else 0,
+            'oldest_seconds': round((now - row['oldest']).total_seconds(), 1) if row else 0.0,
+            'avg_latency_ms': round(counters[f'notifications.lane.{lane}.latency_ms'] / claimed, 1) if claimed else 0.0,
+            'max_latency_ms': counters[f'notifications.lane.{lane}.latency_max_ms'],
+        }
+    return report
+
+
+def pending_count() -> int:
+    """
+    Number of messages not yet sent or dead-lettered.
+    """
+    return OutboxMessage.objects.filter(status__in=['pending', 'sending']).count()
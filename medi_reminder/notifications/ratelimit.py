@@ -0,0 +1,61 @@
+"""
+Token bucket rate limiting for notification providers.
+"""
+
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Holds up to ``capacity`` tokens and refills at ``rate`` tokens per
+    second, allowing bursts of ``capacity`` sends while keeping the long-run
+    rate at ``rate``. Limits are per process: with several workers, give
+    each a share of the provider's quota.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take ``tokens`` if available.
+
+        Returns:
+            float: 0 on success, otherwise the seconds to wait before retrying
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Block until ``tokens`` are available or ``timeout`` seconds pass.
+
+        Returns:
+            bool: True if the tokens were taken
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining < wait:
+                    return False
+            time.sleep(wait)
@@ -0,0 +1,21 @@
+"""
+Celery tasks for the notifications app.
+"""
+
+from typing import List, Optional
+
+from celery import shared_task
+
+from .outbox import relay
+
+
+@shared_task
+def relay_outbox(lanes: Optional[List[str]] = None):
+    """
+    Deliver due outbox messages in ``lanes`` (default: all), including retries whose backoff has elapsed.
+
+    Scheduled once per lane on that lane's queue (see ``CELERY_TASK_ROUTES``
+    and the beat schedule), so a busy lane only backs up its own queue.
+    """
+    stats = relay(lanes=lanes)
+    return {'claimed': stats.claimed, 'sent': stats.sent, 'retried': stats.retried, 'dead': stats.dead}
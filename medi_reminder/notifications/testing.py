@@ -0,0 +1,203 @@
+"""
+Local stand-ins for notification providers.
+
+``SMTPSink`` is a minimal in-process SMTP server that stores what it
+receives, and ``FakeGateway`` is an HTTP endpoint standing in for an SMS
+gateway or push relay. Both run on a background thread, so tests and local
+development exercise the real channels, connections included, without
+external services. ``manage.py run_notification_sinks`` runs them standalone.
+
+``NullChannel`` skips the network altogether and only counts what it is
+given, optionally waiting a fixed latency per send; load simulations use it
+to model a provider without one.
+"""
+
+import json
+import time
+import threading
+import socketserver
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from .channels import Channel, Notification
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        sink = self.server.sink
+        sink.connections += 1
+        mail_from, recipients = None, []
+        self.reply('220 localhost SMTP sink ready')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                sink.store(mail_from, recipients, b''.join(data))
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _BackgroundServer:
+
+    def __init__(self, server):
+        self.server = server
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SMTPSink(_BackgroundServer):
+    """
+    In-process SMTP server storing every message it accepts.
+
+    Point ``EMAIL_HOST``/``EMAIL_PORT`` at it with ``EMAIL_USE_TLS=False``.
+    ``connections`` counts SMTP sessions, so tests can check connection reuse.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(_Server((host, port), _SMTPHandler))
+        self.server.sink = self
+        self.messages: List[Dict] = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def store(self, mail_from: str, recipients: List[str], data: bytes) -> None:
+        message = message_from_bytes(data)
+        with self.lock:
+            self.messages.append({
+                'from': mail_from,
+                'to': recipients,
+                'subject': message['Subject'],
+                'headers': dict(message.items()),
+                'body': message.get_payload(),
+            })
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        gateway = self.server.gateway
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        status = gateway.handle(payload, dict(self.headers))
+
+        body = json.dumps({'status': 'ok' if status < 400 else 'error'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class FakeGateway(_BackgroundServer):
+    """
+    HTTP endpoint recording JSON POSTs, standing in for an SMS gateway or push relay.
+
+    Requests repeating an ``Idempotency-Key`` are acknowledged but not
+    recorded again. Set ``fail_status`` to make every request fail with that
+    status, e.g. 429 or 503.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        server = ThreadingHTTPServer((host, port), _GatewayHandler)
+        server.daemon_threads = True
+        super().__init__(server)
+        self.server.gateway = self
+        self.requests: List[Dict] = []
+        self.keys = set()
+        self.fail_status: Optional[int] = None
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/"
+
+    def handle(self, payload: Dict, headers: Dict) -> int:
+        if self.fail_status:
+            return self.fail_status
+        key = headers.get('Idempotency-Key')
+        with self.lock:
+            if key and key in self.keys:
+                return 200
+            if key:
+                self.keys.add(key)
+            self.requests.append({'payload': payload, 'headers': headers})
+        return 202
+
+
+class NullChannel(Channel):
+    """
+    Channel that accepts every notification without sending it.
+
+    Options:
+        LATENCY: Seconds to wait per send, modelling a provider round trip
+        IDEMPOTENT: Whether the modelled provider drops repeated keys
+    """
+
+    def __init__(self, name: str, latency: float = 0.0, idempotent: bool = False, **options):
+        super().__init__(name, **options)
+        self.latency = latency
+        self.idempotent = idempotent
+        self.delivered = 0
+
+    def deliver(self, notification: Notification) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        self.delivered += 1
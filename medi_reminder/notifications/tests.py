@@ -0,0 +1,287 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from medi_reminder.celery import app
+from . import outbox
+from .channels import EmailChannel, Notification, SMSChannel
+from .models import DeliveryAttempt, OutboxMessage
+from .ratelimit import TokenBucket
+from .testing import FakeGateway, NullChannel, SMTPSink
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def notifications(count, channel='email', recipient='patient@example.com'):
+    return [
+        Notification(channel=channel, recipient=recipient, subject=f'Dose {i}', body='Take your dose', key=f'dose-{i}')
+        for i in range(count)
+    ]
+
+
+class QueueRoutingTests(SimpleTestCase):
+
+    def test_routed_queues_are_consumed_by_default(self):
+        # A worker started without -Q consumes exactly the declared queues
+        declared = set(app.amqp.queues)
+        scheduled = {
+            entry['options']['queue'] for entry in app.conf.beat_schedule.values() if 'queue' in entry.get('options', {})
+        }
+        routed = {route['queue'] for route in app.conf.task_routes.values()}
+        self.assertLessEqual(scheduled | routed, declared)
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('notifications.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        self.clock.sleep(0.5)
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+    def test_acquire_paces_to_rate(self):
+        bucket = TokenBucket(rate=10, capacity=1)
+        for _ in range(21):
+            self.assertTrue(bucket.acquire())
+        # One from the burst, then one every 100ms
+        self.assertAlmostEqual(self.clock.now - 1000.0, 2.0)
+
+    def test_acquire_gives_up_after_timeout(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.acquire()
+        self.assertFalse(bucket.acquire(timeout=0.5))
+        self.assertTrue(bucket.acquire(timeout=1))
+
+
+class EmailChannelTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sink = SMTPSink().start()
+        self.addCleanup(self.sink.stop)
+        override = override_settings(
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.sink.port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', DEFAULT_FROM_EMAIL='reminders@example.com',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.channel = EmailChannel('email', batch_size=2, backend_path='django.core.mail.backends.smtp.EmailBackend')
+        self.addCleanup(self.channel.close)
+
+    def test_batches_share_one_connection(self):
+        delivered = self.channel.send(notifications(5))
+        self.channel.send(notifications(1))
+
+        self.assertEqual(len(delivered), 5)
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(len(self.sink.messages), 6)
+        self.assertEqual(self.sink.messages[0]['to'], ['patient@example.com'])
+        self.assertEqual(self.sink.messages[0]['headers']['X-Idempotency-Key'], 'dose-0')
+
+    def test_reconnects_after_idle(self):
+        self.channel.send(notifications(1))
+        self.channel.last_used -= self.channel.max_idle + 1
+        self.channel.send(notifications(1))
+        self.assertEqual(self.sink.connections, 2)
+
+
+class HTTPChannelTests(SimpleTestCase):
+
+    def setUp(self):
+        self.gateway = FakeGateway().start()
+        self.addCleanup(self.gateway.stop)
+        self.channel = SMSChannel('sms', url=self.gateway.url, api_key='secret', batch_size=2)
+        self.addCleanup(self.channel.close)
+
+    def test_delivers_with_idempotency_key(self):
+        delivered = self.channel.send(notifications(3, channel='sms', recipient='+15550100'))
+        # A resend is acknowledged by the gateway but not delivered twice
+        self.channel.send(notifications(1, channel='sms', recipient='+15550100'))
+
+        self.assertEqual(delivered, {'dose-0', 'dose-1', 'dose-2'})
+        self.assertEqual(len(self.gateway.requests), 3)
+        request = self.gateway.requests[0]
+        self.assertEqual(request['payload'], {'to': '+15550100', 'message': 'Take your dose'})
+        self.assertEqual(request['headers']['Authorization'], 'Bearer secret')
+
+    def test_error_status_is_reported_per_notification(self):
+        self.gateway.fail_status = 503
+        errors = {}
+        delivered = self.channel.send(notifications(2, channel='sms'), errors)
+
+        self.assertEqual(delivered, set())
+        self.assertEqual(set(errors), {'dose-0', 'dose-1'})
+        self.assertIn('503', errors['dose-0'])
+
+
+class FlakyChannel(NullChannel):
+    """
+    Stand-in provider failing for some keys, or dying (as a crashed relay would) on one.
+    """
+
+    def __init__(self, name, failing=(), crash_on=None, **options):
+        super().__init__(name, **options)
+        self.failing = set(failing)
+        self.crash_on = crash_on
+        # Called with each notification before delivering it
+        self.on_deliver = None
+
+    def deliver(self, notification):
+        if self.on_deliver:
+            self.on_deliver(notification)
+        if notification.key == self.crash_on:
+            raise SystemExit('relay killed')
+        if notification.key in self.failing:
+            raise RuntimeError('provider unavailable')
+        super().deliver(notification)
+
+
+class RelayTests(TestCase):
+
+    def setUp(self):
+        self.channel = FlakyChannel('email')
+        patcher = mock.patch.object(outbox, 'get_channel', lambda name: self.channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, count):
+        outbox.enqueue(notifications(count))
+        return list(OutboxMessage.objects.order_by('key'))
+
+    def statuses(self):
+        return list(OutboxMessage.objects.order_by('key').values_list('status', flat=True))
+
+    def test_sends_and_records_attempts(self):
+        self.enqueue(3)
+        stats = outbox.relay()
+
+        self.assertEqual((stats.claimed, stats.sent), (3, 3))
+        self.assertEqual(self.statuses(), ['sent'] * 3)
+        self.assertEqual(DeliveryAttempt.objects.filter(success=True).count(), 3)
+
+    def test_failure_backs_off_in_retry_lane(self):
+        self.enqueue(2)
+        self.channel.failing = {'dose-1'}
+        before = timezone.now()
+        stats = outbox.relay()
+
+        self.assertEqual((stats.sent, stats.retried), (1, 1))
+        message = OutboxMessage.objects.get(key='dose-1')
+        self.assertEqual((message.status, message.lane, message.attempts), ('pending', 'retry', 1))
+        delay = (message.next_attempt_at - before).total_seconds()
+        self.assertGreaterEqual(delay, outbox.RETRY_BASE_SECONDS * 0.9)
+        self.assertLessEqual(delay, outbox.RETRY_BASE_SECONDS * 1.1 + 5)
+
+        # Not due again until the backoff has elapsed
+        self.assertEqual(outbox.relay().claimed, 0)
+        self.channel.failing = set()
+        self.assertEqual(outbox.relay(now=message.next_attempt_at).sent, 1)
+
+    @mock.patch.object(outbox, 'MAX_ATTEMPTS', 2)
+    def test_dead_letter_after_max_attempts(self):
+        self.enqueue(1)
+        self.channel.failing = {'dose-0'}
+        now = timezone.now()
+        for _ in range(2):
+            outbox.relay(now=now)
+            now += timedelta(seconds=outbox.RETRY_MAX_SECONDS * 2)
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('dead', 2))
+        self.assertEqual(DeliveryAttempt.objects.filter(success=False).count(), 2)
+        self.assertEqual(outbox.relay(now=now).claimed, 0)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.enqueue(2)
+        now = timezone.now()
+        # A relay that claimed the messages and died
+        outbox._claimer()(now, 10)
+
+        self.assertEqual(outbox.relay(now=now).claimed, 0)
+        stats = outbox.relay(now=now + timedelta(seconds=outbox.LEASE_SECONDS + 1))
+        self.assertEqual(stats.sent, 2)
+
+    def test_sends_are_recorded_before_the_next_one(self):
+        self.enqueue(3)
+        self.channel.crash_on = 'dose-1'
+        with self.assertRaises(SystemExit):
+            outbox.relay()
+
+        # The message sent before the crash is not sent again
+        self.assertEqual(self.statuses(), ['sent', 'sending', 'sending'])
+        self.channel.crash_on = None
+        outbox.relay(now=timezone.now() + timedelta(seconds=outbox.LEASE_SECONDS + 1))
+        self.assertEqual(self.channel.delivered, 3)
+
+    def test_lost_lease_is_left_to_its_new_owner(self):
+        self.enqueue(2)
+        now = timezone.now()
+        batch = outbox._claimer()(now, 10)
+        # The first relay stalled past its lease and another relay claimed dose-1
+        other_lease = now + timedelta(seconds=outbox.LEASE_SECONDS * 2)
+        OutboxMessage.objects.filter(key='dose-1').update(next_attempt_at=other_lease)
+
+        outbox._send(batch, outbox.RelayStats(), now + timedelta(seconds=outbox.LEASE_SECONDS))
+
+        self.assertEqual(self.channel.delivered, 1)
+        message = OutboxMessage.objects.get(key='dose-1')
+        self.assertEqual((message.status, message.next_attempt_at), ('sending', other_lease))
+
+    def reclaim_on(self, key, reclaimed, lease):
+        # Another relay claims ``reclaimed`` just before ``key`` is delivered
+        def reclaim(notification):
+            if notification.key == key:
+                OutboxMessage.objects.filter(key=reclaimed).update(status='sending', next_attempt_at=lease)
+        self.channel.on_deliver = reclaim
+
+    def test_failure_after_lost_lease_is_left_to_its_new_owner(self):
+        self.enqueue(2)
+        now = timezone.now()
+        batch = outbox._claimer()(now, 10)
+        self.channel.failing = {'dose-0'}
+        other_lease = now + timedelta(seconds=outbox.LEASE_SECONDS * 3)
+        self.reclaim_on('dose-1', 'dose-0', other_lease)
+
+        stats = outbox.RelayStats()
+        outbox._send(batch, stats, now + timedelta(seconds=outbox.LEASE_SECONDS))
+
+        self.assertEqual((stats.sent, stats.retried), (1, 0))
+        message = OutboxMessage.objects.get(key='dose-0')
+        self.assertEqual((message.status, message.attempts, message.next_attempt_at), ('sending', 0, other_lease))
+
+    def test_bulk_send_does_not_overwrite_a_reclaimed_message(self):
+        self.channel.idempotent = True
+        self.enqueue(2)
+        now = timezone.now()
+        batch = outbox._claimer()(now, 10)
+        other_lease = now + timedelta(seconds=outbox.LEASE_SECONDS * 3)
+        self.reclaim_on('dose-1', 'dose-0', other_lease)
+
+        outbox._send(batch, outbox.RelayStats(), now + timedelta(seconds=outbox.LEASE_SECONDS))
+
+        self.assertEqual(self.statuses(), ['sending', 'sent'])
+        self.assertEqual(OutboxMessage.objects.get(key='dose-0').next_attempt_at, other_lease)
+
+    def test_idempotent_channel_is_sent_in_bulk(self):
+        self.channel.idempotent = True
+        self.enqueue(3)
+        self.assertEqual(outbox.relay().sent, 3)
+        self.assertEqual(self.statuses(), ['sent'] * 3)
@@ -0,0 +1,235 @@
+"""
+Materialized adherence rollups.
+
+``AdherenceRollup`` holds done/missed/pending dose counts per user,
+medication and (local) day. Every path that creates reminders or changes
+their status applies the matching deltas in the same transaction:
+
+- ``transition_reminders`` (mark_done, mark_missed, bulk_status), the
+  missed-reminder sweeper and catch-up expiry call ``record_transitions``
+- ``generate_reminders`` calls ``record_created``
+- ``roll_forward`` calls ``record_rolled``
+- single-row saves and deletes call ``record_created``/``record_changed``
+  from the signals in ``reminders.signals``
+
+Adherence reads then sum at most one row per medication and day instead of
+scanning every dose. A repeating reminder is a single row that moves to its
+next occurrence, so its past occurrences survive only in the rollups; when
+a series moves on from an occurrence still pending, that dose is counted as
+missed. ``rebuild`` recomputes rollups from the reminder rows (see the
+``rebuild_adherence_rollups`` command); the days before a repeating
+series' current occurrence cannot be recomputed, so their rollups are kept.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AdherenceRollup, Reminder
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('done', 'missed', 'pending')
+
+# (user id, medication id, day) -> status -> change
+Deltas = Dict[Tuple[int, int, date], Counter]
+
+# (user id, medication id, scheduled time, status)
+Row = Tuple[int, int, datetime, str]
+
+
+def _day(moment: datetime) -> date:
+    return timezone.localtime(moment).date()
+
+
+def apply_deltas(deltas: Deltas) -> None:
+    """
+    Add count changes to the rollups, creating missing rows for positive changes.
+    """
+    now = timezone.now()
+    for (user_id, medication_id, day), counts in deltas.items():
+        counts = {status: change for status, change in counts.items() if change}
+        if not counts:
+            continue
+        rollup = AdherenceRollup.objects.filter(user_id=user_id, medication_id=medication_id, day=day)
+        changes = {status: F(status) + change for status, change in counts.items()}
+        if rollup.update(**changes, updated_at=now):
+            continue
+        if not any(change > 0 for change in counts.values()):
+            # Nothing to take away from (e.g. the medication is being deleted)
+            continue
+        try:
+            with transaction.atomic():
+                AdherenceRollup.objects.create(
+                    user_id=user_id, medication_id=medication_id, day=day,
+                    **{status: max(change, 0) for status, change in counts.items()}
+                )
+        except IntegrityError:
+            # Created concurrently
+            rollup.update(**changes, updated_at=now)
+
+
+def record_created(reminders: Iterable[Reminder]) -> None:
+    """
+    Count newly created reminders.
+    """
+    deltas: Deltas = defaultdict(Counter)
+    for reminder in reminders:
+        deltas[(reminder.user_id, reminder.medication_id, _day(reminder.scheduled_time))][reminder.status] += 1
+    apply_deltas(deltas)
+
+
+def record_transitions(rows: Iterable[Row], status: str) -> None:
+    """
+    Move ``(user id, medication id, scheduled time, old status)`` doses to ``status``.
+    """
+    deltas: Deltas = defaultdict(Counter)
+    for user_id, medication_id, scheduled_time, old_status in rows:
+        if old_status == status:
+            continue
+        counts = deltas[(user_id, medication_id, _day(scheduled_time))]
+        counts[old_status] -= 1
+        counts[status] += 1
+    apply_deltas(deltas)
+
+
+def record_changed(old: Optional[Row], new: Optional[Row]) -> None:
+    """
+    Move one reminder's count from its old ``(user, medication, scheduled time, status)`` to its new one.
+
+    ``old`` is None for a new reminder and ``new`` None for a deleted one.
+    """
+    deltas: Deltas = defaultdict(Counter)
+    for row, change in ((old, -1), (new, 1)):
+        if row is not None:
+            user_id, medication_id, scheduled_time, status = row
+            deltas[(user_id, medication_id, _day(scheduled_time))][status] += change
+    apply_deltas(deltas)
+
+
+def record_rolled(rows: Iterable[Tuple[int, int, datetime, str, datetime]]) -> None:
+    """
+    Count the next occurrence of rolled-forward series as pending.
+
+    Rows are ``(user id, medication id, old time, old status, new time)``;
+    the old occurrence keeps its count, as missed if it was still pending.
+    """
+    deltas: Deltas = defaultdict(Counter)
+    for user_id, medication_id, old_time, old_status, new_time in rows:
+        if old_status == 'pending':
+            counts = deltas[(user_id, medication_id, _day(old_time))]
+            counts['pending'] -= 1
+            counts['missed'] += 1
+        deltas[(user_id, medication_id, _day(new_time))]['pending'] += 1
+    apply_deltas(deltas)
+
+
+def _later_occurrence(tz):
+    # A repeating series of the same medication whose current occurrence is
+    # after the outer row's day: that day may hold its past occurrences
+    return Exists(
+        Reminder.objects.filter(user_id=OuterRef('user_id'), medication_id=OuterRef('medication_id'))
+        .exclude(repeat='once')
+        .annotate(series_day=TruncDate('scheduled_time', tzinfo=tz))
+        .filter(series_day__gt=OuterRef('day'))
+    )
+
+
+def rebuild(user_ids: Optional[List[int]] = None, since: Optional[date] = None) -> int:
+    """
+    Recompute rollups from the reminder rows, for all users or ``user_ids``, from ``since`` on.
+
+    A repeating series keeps only its current occurrence as a row, so days
+    before it cannot be reproduced from the reminder rows; existing rollups
+    for those days of the medication are kept as they are, and only the
+    other days are recomputed.
+
+    Returns:
+        int: Rollup rows written
+    """
+    tz = timezone.get_current_timezone()
+    rollups = AdherenceRollup.objects.all()
+    reminders = Reminder.objects.annotate(day=TruncDate('scheduled_time', tzinfo=tz))
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+        reminders = reminders.filter(user_id__in=user_ids)
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        reminders = reminders.filter(day__gte=since)
+
+    kept = rollups.filter(_later_occurrence(tz))
+    reminders = reminders.exclude(
+        Exists(kept.filter(user_id=OuterRef('user_id'), medication_id=OuterRef('medication_id'), day=OuterRef('day')))
+    )
+    counts = reminders.order_by().values('user_id', 'medication_id', 'day').annotate(
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    )
+    with transaction.atomic():
+        rollups.exclude(_later_occurrence(tz)).delete()
+        written = AdherenceRollup.objects.bulk_create(
+            (AdherenceRollup(**row) for row in counts.iterator()), batch_size=1000
+        )
+    logger.info(f"Rebuilt {len(written)} adherence rollups")
+    return len(written)
+
+
+def _rate(done: int, missed: int) -> Optional[float]:
+    # Pending doses are not decided yet, so they don't count either way
+    return done / (done + missed) if done + missed else None
+
+
+def summary(user, start: date, end: date, medication_id: Optional[int] = None) -> dict:
+    """
+    Dose counts and adherence rate for ``user`` over the days ``[start, end]``.
+    """
+    rollups = AdherenceRollup.objects.filter(user=user, day__gte=start, day__lte=end)
+    if medication_id is not None:
+        rollups = rollups.filter(medication_id=medication_id)
+    totals = rollups.aggregate(**{status: Sum(status) for status in STATUSES})
+    totals = {status: totals[status] or 0 for status in STATUSES}
+    return {'start': start, 'end': end, **totals, 'rate': _rate(totals['done'], totals['missed'])}
+
+
+def by_day(user, start: date, end: date) -> List[dict]:
+    """
+    Dose counts and adherence rate per day for ``user`` over ``[start, end]``, days without doses omitted.
+    """
+    rows = (
+        AdherenceRollup.objects.filter(user=user, day__gte=start, day__lte=end)
+        .values('day').annotate(**{f'{status}_count': Sum(status) for status in STATUSES}).order_by('day')
+    )
+    return [
+        {
+            'day': row['day'],
+            **{status: row[f'{status}_count'] for status in STATUSES},
+            'rate': _rate(row['done_count'], row['missed_count']),
+        }
+        for row in rows
+    ]
+
+
+def by_medication(user, start: date, end: date) -> List[dict]:
+    """
+    Dose counts and adherence rate per medication for ``user`` over ``[start, end]``.
+    """
+    rows = (
+        AdherenceRollup.objects.filter(user=user, day__gte=start, day__lte=end)
+        .values('medication_id', 'medication__name')
+        .annotate(**{f'{status}_count': Sum(status) for status in STATUSES})
+        .order_by('medication__name')
+    )
+    return [
+        {
+            'medication': row['medication_id'],
+            'medication_name': row['medication__name'],
+            **{status: row[f'{status}_count'] for status in STATUSES},
+            'rate': _rate(row['done_count'], row['missed_count']),
+        }
+        for row in rows
+    ]
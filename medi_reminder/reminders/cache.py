@@ -0,0 +1,114 @@
+"""
+Per-user caching of reminder list responses.
+
+Each user has a version token in the shared cache and every cached response
+is stored under a key containing it. Changing a user's reminders or
+medications replaces the token, so every app node misses on its next read
+and rebuilds; stale entries are never read again and simply expire.
+
+Version changes come from ``post_save``/``post_delete`` signals (see
+``reminders.signals``) and from ``invalidate_users`` calls in code paths
+that write with ``update()``/``bulk_create()``, which send no signals.
+
+Responses that depend on the time as well as the rows (``upcoming``) are
+built for the start of a ``time_bucket`` and key on it, so no entry is
+served after the window it was built for has moved on.
+"""
+
+import time
+import uuid
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from medi_reminder import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = getattr(settings, 'REMINDER_CACHE_TTL', 60)
+
+# Version tokens outlive the entries they guard
+VERSION_TTL = 24 * 60 * 60
+
+
+def _version_key(user_id: int) -> str:
+    return f"reminders:version:{user_id}"
+
+
+def _entry_key(user_id: int, name: str, version: str) -> str:
+    return f"reminders:{name}:{user_id}:{version}"
+
+
+def time_bucket(now: Optional[datetime] = None) -> datetime:
+    """
+    Start of the ``CACHE_TTL``-second slot containing ``now``.
+    """
+    width = max(CACHE_TTL, 1)
+    seconds = int((now or timezone.now()).timestamp())
+    return datetime.fromtimestamp(seconds - seconds % width, tz=dt_timezone.utc)
+
+
+def invalidate_users(user_ids: Iterable[int]) -> None:
+    """
+    Give each user a new version token, invalidating their cached responses on every node.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    token = uuid.uuid4().hex
+    try:
+        cache.set_many({_version_key(user_id): token for user_id in user_ids}, VERSION_TTL)
+    except Exception as exc:
+        logger.warning(f"Failed to invalidate reminder cache for {len(user_ids)} users: {exc}")
+
+
+def get_or_build(user_id: int, name: str, build: Callable[[], object]):
+    """
+    Return the cached response ``name`` for ``user_id``, building and storing it on a miss.
+
+    Hits, misses and the age of served entries are recorded as metrics. If
+    the cache is unavailable the response is built directly.
+    """
+    try:
+        version = cache.get(_version_key(user_id))
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(_version_key(user_id), version, VERSION_TTL):
+                version = cache.get(_version_key(user_id), version)
+        key = _entry_key(user_id, name, version)
+        entry = cache.get(key)
+    except Exception as exc:
+        logger.warning(f"Reminder cache unavailable: {exc}")
+        return build()
+
+    if entry is not None:
+        metrics.increment('reminders.cache.hit')
+        metrics.increment('reminders.cache.age_ms', int((time.time() - entry['stored_at']) * 1000))
+        return entry['data']
+
+    metrics.increment('reminders.cache.miss')
+    data = build()
+    try:
+        cache.set(key, {'data': data, 'stored_at': time.time()}, CACHE_TTL)
+    except Exception as exc:
+        logger.warning(f"Failed to store reminder cache entry {key}: {exc}")
+    return data
+
+
+def cache_stats() -> Dict[str, float]:
+    """
+    Hit ratio and mean age in seconds of served entries, across all nodes.
+    """
+    counts = metrics.get_many(['reminders.cache.hit', 'reminders.cache.miss', 'reminders.cache.age_ms'])
+    hits, misses = counts['reminders.cache.hit'], counts['reminders.cache.miss']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'mean_age_seconds': round(counts['reminders.cache.age_ms'] / hits / 1000, 3) if hits else 0.0,
+    }
@@ -0,0 +1,208 @@
+"""
+Catch-up mode for the reminder dispatcher.
+
+After a broker or worker outage thousands of reminders can be due at once.
+Sending them all in one pass would stampede the database and the
+notification providers, and most of the oldest alerts would arrive too late
+to be useful. Catch-up mode instead:
+
+1. Dispatches reminders overdue by less than ``REMINDER_CATCHUP_STALE_MINUTES``
+   normally, in bounded batches paced by a token bucket.
+2. Marks reminders older than that as missed and tells each user about
+   theirs in a single summary notification instead of one alert per dose.
+3. Records the backlog depth after every batch, as the
+   ``reminders.catchup.backlog`` gauge and the
+   ``reminders.catchup.backlog_history`` series, so the drain can be watched.
+
+The periodic dispatch task switches to catch-up mode on its own once the
+oldest due reminder has waited ``REMINDER_CATCHUP_LAG_MINUTES``. A large but
+fresh backlog, such as the top-of-hour burst, is left to normal dispatch,
+and catch-up's default pace matches normal throughput so it never drains
+slower. Only one catch-up run works a set of partitions at a time, so
+overlapping runs cannot multiply the rate.
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from medi_reminder import metrics
+from notifications.outbox import relay
+from notifications.ratelimit import TokenBucket
+from . import adherence, events
+from .delivery import DOSE_LANES, enqueue_missed_summaries
+from .dispatch import DispatchStats, _batch_dispatcher, _record, due_reminders
+from .recurrence import roll_forward
+from .transitions import send_transitioned
+
+logger = logging.getLogger(__name__)
+
+STALE_MINUTES = getattr(settings, 'REMINDER_CATCHUP_STALE_MINUTES', 15)
+LAG_MINUTES = getattr(settings, 'REMINDER_CATCHUP_LAG_MINUTES', 5)
+RATE = getattr(settings, 'REMINDER_CATCHUP_RATE', 1000)
+BATCH_SIZE = getattr(settings, 'REMINDER_CATCHUP_BATCH_SIZE', 200)
+MAX_BATCHES = getattr(settings, 'REMINDER_CATCHUP_MAX_BATCHES', 50)
+
+# Upper bound on one run holding the catch-up lock, should it die without releasing it
+LOCK_SECONDS = 10 * 60
+
+
+@dataclass
+class CatchUpStats:
+    """
+    Outcome of one catch-up run.
+    """
+    dispatched: int = 0
+    expired: int = 0
+    summaries: int = 0
+    batches: int = 0
+    backlog: List[int] = field(default_factory=list)  # depth after each batch
+    elapsed: float = 0.0
+
+
+def backlog_depth(now: Optional[datetime] = None, partitions: Optional[Set[int]] = None) -> int:
+    """
+    Number of reminders that are due and not yet notified.
+    """
+    return due_reminders(now or timezone.now(), partitions).count()
+
+
+def needs_catch_up(now: Optional[datetime] = None, lag: timedelta = timedelta(minutes=LAG_MINUTES)) -> bool:
+    """
+    Whether the dispatcher is behind: a due reminder has been waiting longer than ``lag``.
+    """
+    now = now or timezone.now()
+    return due_reminders(now).filter(scheduled_time__lt=now - lag).exists()
+
+
+def _lock_key(partitions: Optional[Set[int]]) -> str:
+    scope = ','.join(map(str, sorted(partitions))) if partitions is not None else 'all'
+    return f"reminders:catchup:lock:{scope}"
+
+
+def _expire_stale_batch(stale, now: datetime, batch_size: int) -> tuple:
+    """
+    Mark a batch of stale reminders missed and queue one summary per user, in one transaction.
+    """
+    lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+    with transaction.atomic():
+        # Ordered by user so each user's stale reminders land in as few summaries as possible
+        batch = list(
+            stale.select_related('user', 'medication')
+            .order_by('user_id', 'scheduled_time')
+            .select_for_update(of=lock_of)[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        # Re-check the condition so a reminder dispatched in the meantime is left alone
+        stale.filter(id__in=[reminder.id for reminder in batch]).update(
+            status='missed', notified=True, updated_at=now
+        )
+        adherence.record_transitions(
+            [(reminder.user_id, reminder.medication_id, reminder.scheduled_time, 'pending') for reminder in batch],
+            'missed'
+        )
+        events.log_transitions(
+            [(reminder.id, reminder.user_id, reminder.medication_id, reminder.scheduled_time) for reminder in batch],
+            'missed', now
+        )
+        summaries = enqueue_missed_summaries(batch)
+        send_transitioned('missed', [(reminder.id, reminder.user_id) for reminder in batch], now)
+    return len(batch), summaries
+
+
+def catch_up(
+    now: Optional[datetime] = None,
+    stale_after: timedelta = timedelta(minutes=STALE_MINUTES),
+    rate: float = RATE,
+    batch_size: int = BATCH_SIZE,
+    max_batches: int = MAX_BATCHES,
+    partitions: Optional[Set[int]] = None
+) -> CatchUpStats:
+    """
+    Drain the dispatch backlog in rate-limited batches.
+
+    Each batch takes recent reminders first and stale ones once those are
+    done; ``rate`` caps reminders handled per second across both. A run
+    stops after ``max_batches`` and the next run carries on. A run that
+    finds another one already working ``partitions`` returns without doing
+    anything.
+
+    Returns:
+        CatchUpStats: Counts, backlog depth per batch and time taken
+    """
+    lock = _lock_key(partitions)
+    if not cache.add(lock, True, LOCK_SECONDS):
+        logger.info("Catch-up already running, skipping this run")
+        return CatchUpStats()
+    try:
+        return _catch_up(now, stale_after, rate, batch_size, max_batches, partitions)
+    finally:
+        cache.delete(lock)
+
+
+def _catch_up(
+    now: Optional[datetime],
+    stale_after: timedelta,
+    rate: float,
+    batch_size: int,
+    max_batches: int,
+    partitions: Optional[Set[int]]
+) -> CatchUpStats:
+    now = now or timezone.now()
+    cutoff = now - stale_after
+    roll_forward(now, partitions=partitions)
+    dispatch_batch = _batch_dispatcher()
+    bucket = TokenBucket(rate, capacity=max(rate, batch_size))
+
+    stats = CatchUpStats()
+    dispatch_stats = DispatchStats()
+    started = time.perf_counter()
+    while stats.batches < max_batches:
+        bucket.acquire(batch_size)
+        due = due_reminders(now, partitions)
+        claimed, delivered = dispatch_batch(due.filter(scheduled_time__gte=cutoff), batch_size)
+        if claimed:
+            dispatch_stats.batches += 1
+            dispatch_stats.claimed += claimed
+            dispatch_stats.delivered += delivered
+            dispatch_stats.failed += claimed - delivered
+            stats.dispatched += claimed
+        else:
+            expired, summaries = _expire_stale_batch(due.filter(scheduled_time__lt=cutoff), now, batch_size)
+            if not expired:
+                break
+            stats.expired += expired
+            stats.summaries += summaries
+
+        stats.batches += 1
+        depth = backlog_depth(now, partitions)
+        stats.backlog.append(depth)
+        metrics.set_gauge('reminders.catchup.backlog', depth)
+        metrics.record_sample('reminders.catchup.backlog_history', depth)
+        if not depth:
+            break
+
+    stats.elapsed = time.perf_counter() - started
+    dispatch_stats.elapsed = stats.elapsed
+    _record(dispatch_stats)
+    if stats.dispatched or stats.expired:
+        metrics.increment('reminders.catchup.dispatched', stats.dispatched)
+        metrics.increment('reminders.catchup.expired', stats.expired)
+        metrics.increment('reminders.catchup.summaries', stats.summaries)
+        relay(lanes=DOSE_LANES + ['digest'])
+    if stats.batches:
+        logger.info(
+            f"Catch-up: dispatched {stats.dispatched}, expired {stats.expired} stale reminders "
+            f"({stats.summaries} summaries) in {stats.batches} batches, {stats.elapsed:.2f}s; "
+            f"backlog now {stats.backlog[-1] if stats.backlog else 0}"
+        )
+    return stats
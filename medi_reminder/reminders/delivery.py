@@ -0,0 +1,290 @@
+"""
+Notification delivery for reminders.
+
+Renders each reminder for the channels in
+``settings.REMINDER_NOTIFICATION_CHANNELS`` and queues the notifications in
+the transactional outbox, keyed by reminder occurrence and channel so a
+reminder is never queued twice for the same dose.
+
+A user's reminders dispatched together and due within
+``REMINDER_COALESCE_WINDOW_MINUTES`` of each other are coalesced into one
+digest listing every dose, so six medications at 08:00 cost one provider
+call per channel instead of six. Each dose keeps its own reminder row and
+status, and the digest's data lists every reminder id so clients can offer
+a per-dose "taken" action. ``delivery_stats`` reports sends per dose.
+
+Reminders that went stale during an outage are reported with one summary
+per user instead of one alert each (see ``reminders.catchup``).
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from medi_reminder import metrics
+
+from notifications import outbox
+from notifications.channels import Notification
+
+logger = logging.getLogger(__name__)
+
+REMINDER_CHANNELS = getattr(settings, 'REMINDER_NOTIFICATION_CHANNELS', ['email'])
+
+# Outbox lanes dose alerts are queued in; dispatch relays these right away
+DOSE_LANES = ['critical', 'standard']
+
+COALESCE_WINDOW_MINUTES = getattr(settings, 'REMINDER_COALESCE_WINDOW_MINUTES', 15)
+
+
+def reminder_recipient(reminder, channel: str) -> Optional[str]:
+    """
+    Address of the reminder's user on ``channel``, or None if they have none.
+    """
+    user = reminder.user
+    if channel == 'email':
+        return user.email or None
+    if channel == 'sms':
+        return user.phone_number or None
+    if channel == 'webpush':
+        return str(user.pk)
+    return None
+
+
+def notification_key(reminder, channel: str) -> str:
+    """
+    Idempotency key for one occurrence of a reminder on one channel.
+    """
+    return f"reminder-{reminder.id}-{int(reminder.scheduled_time.timestamp())}-{channel}"
+
+
+def render_reminder(reminder, channel: str) -> Optional[Notification]:
+    """
+    Build the notification for a single reminder on ``channel``.
+    """
+    recipient = reminder_recipient(reminder, channel)
+    if not recipient:
+        return None
+
+    medication = reminder.medication
+    local_time = timezone.localtime(reminder.scheduled_time)
+    if channel == 'email':
+        body = (
+            f"Hi {reminder.user.first_name or reminder.user.username},\n\n"
+            f"It's time to take {medication.name} ({medication.dosage}), "
+            f"scheduled for {local_time.strftime('%H:%M on %d %b %Y')}.\n"
+        )
+        if medication.instructions:
+            body += f"\nInstructions: {medication.instructions}\n"
+    else:
+        body = f"Time to take {medication.name} ({medication.dosage}) - {local_time.strftime('%H:%M')}"
+
+    return Notification(
+        channel=channel,
+        recipient=recipient,
+        subject=f"Medication reminder: {medication.name}",
+        body=body,
+        key=notification_key(reminder, channel),
+        data={'reminder': reminder.id, 'medication': medication.id},
+        lane='critical' if medication.time_critical else 'standard',
+    )
+
+
+def coalesce(reminders: Iterable, window: timedelta = timedelta(minutes=COALESCE_WINDOW_MINUTES)) -> List[List]:
+    """
+    Group reminders per user, each group spanning at most ``window`` from its first dose.
+
+    A zero window turns coalescing off: every reminder is its own group.
+    """
+    by_user = defaultdict(list)
+    for reminder in reminders:
+        by_user[reminder.user_id].append(reminder)
+
+    groups = []
+    for user_reminders in by_user.values():
+        user_reminders.sort(key=lambda reminder: (reminder.scheduled_time, reminder.id))
+        group = [user_reminders[0]]
+        for reminder in user_reminders[1:]:
+            if window and reminder.scheduled_time - group[0].scheduled_time <= window:
+                group.append(reminder)
+            else:
+                groups.append(group)
+                group = [reminder]
+        groups.append(group)
+    return groups
+
+
+def render_digest(reminders: List, channel: str) -> Optional[Notification]:
+    """
+    Build one notification listing several doses of the same user; a single reminder renders as usual.
+    """
+    if len(reminders) == 1:
+        return render_reminder(reminders[0], channel)
+
+    first = reminders[0]
+    recipient = reminder_recipient(first, channel)
+    if not recipient:
+        return None
+
+    lines = [
+        f"{reminder.medication.name} ({reminder.medication.dosage}) at "
+        f"{timezone.localtime(reminder.scheduled_time).strftime('%H:%M')}"
+        for reminder in reminders
+    ]
+    if channel == 'email':
+        body = (
+            f"Hi {first.user.first_name or first.user.username},\n\n"
+            f"It's time to take {len(reminders)} medications:\n\n"
+            + ''.join(f"  - {line}\n" for line in lines)
+        )
+        instructions = [
+            f"{reminder.medication.name}: {reminder.medication.instructions}"
+            for reminder in reminders if reminder.medication.instructions
+        ]
+        if instructions:
+            body += "\nInstructions:\n" + ''.join(f"  - {line}\n" for line in instructions)
+        body += "\nMark each dose as taken in MediReminder.\n"
+    else:
+        body = f"Time to take {len(reminders)} medications: " + '; '.join(lines)
+
+    return Notification(
+        channel=channel,
+        recipient=recipient,
+        subject=f"Medication reminder: {len(reminders)} doses",
+        body=body,
+        key=f"digest-{first.user_id}-{first.id}-{int(first.scheduled_time.timestamp())}-{channel}",
+        data={'reminders': [{'reminder': reminder.id, 'medication': reminder.medication_id} for reminder in reminders]},
+        lane='critical' if any(reminder.medication.time_critical for reminder in reminders) else 'standard',
+    )
+
+
+def render_reminders(
+    reminders: Iterable,
+    channels: List[str] = None,
+    window: timedelta = timedelta(minutes=COALESCE_WINDOW_MINUTES)
+) -> List[Tuple[List, List[Notification]]]:
+    """
+    Coalesce reminders and render each group for every channel.
+
+    Returns:
+        list: ``(reminders, notifications)`` per group; notifications is
+        empty if the user has no address on any channel
+    """
+    channels = channels or REMINDER_CHANNELS
+    rendered = []
+    doses = messages = 0
+    for group in coalesce(reminders, window):
+        notifications = [n for n in (render_digest(group, channel) for channel in channels) if n]
+        rendered.append((group, notifications))
+        doses += len(group) * len(notifications)
+        messages += len(notifications)
+
+    if doses:
+        metrics.increment('reminders.delivery.doses', doses)
+        metrics.increment('reminders.delivery.messages', messages)
+    return rendered
+
+
+def enqueue_reminders(reminders: Iterable, channels: List[str] = None) -> Set[int]:
+    """
+    Write the notifications for a batch of reminders to the outbox, coalescing per user.
+
+    Call inside the transaction that marks the reminders notified; the
+    outbox relay delivers them once it commits.
+
+    Returns:
+        set: Ids of reminders that are done with (notifications queued, or
+        undeliverable because the user has no address on any channel)
+    """
+    channels = channels or REMINDER_CHANNELS
+    handled = set()
+    notifications = []
+
+    for group, rendered in render_reminders(reminders, channels):
+        if not rendered:
+            logger.info(
+                f"User {group[0].user_id} has no address for {channels}, "
+                f"skipping reminders {[reminder.id for reminder in group]}"
+            )
+        notifications.extend(rendered)
+        handled.update(reminder.id for reminder in group)
+
+    outbox.enqueue(notifications)
+    return handled
+
+
+def delivery_stats() -> Dict[str, float]:
+    """
+    Doses delivered, messages queued for them and the resulting sends per dose.
+    """
+    counts = metrics.get_many(['reminders.delivery.doses', 'reminders.delivery.messages'])
+    doses, messages = counts['reminders.delivery.doses'], counts['reminders.delivery.messages']
+    return {
+        'doses': doses,
+        'messages': messages,
+        'sends_per_dose': round(messages / doses, 3) if doses else 0.0,
+    }
+
+
+def render_missed_summary(reminders: List, channel: str) -> Optional[Notification]:
+    """
+    Build one notification telling a user about several reminders that could not be sent on time.
+
+    ``reminders`` all belong to the same user, in scheduled order.
+    """
+    first = reminders[0]
+    recipient = reminder_recipient(first, channel)
+    if not recipient:
+        return None
+
+    lines = [
+        f"{reminder.medication.name} ({reminder.medication.dosage}) at "
+        f"{timezone.localtime(reminder.scheduled_time).strftime('%H:%M on %d %b')}"
+        for reminder in reminders
+    ]
+    count = len(reminders)
+    if channel == 'email':
+        body = (
+            f"Hi {first.user.first_name or first.user.username},\n\n"
+            f"We could not send {count} medication reminder{'s' if count > 1 else ''} on time:\n\n"
+            + ''.join(f"  - {line}\n" for line in lines)
+            + "\nThey have been marked as missed. If you took them, you can mark them as done in MediReminder.\n"
+        )
+    else:
+        body = f"{count} reminder{'s' if count > 1 else ''} could not be sent on time and were marked missed: " + '; '.join(lines)
+
+    last = reminders[-1]
+    return Notification(
+        channel=channel,
+        recipient=recipient,
+        subject=f"Missed medication reminders ({count})",
+        body=body,
+        key=f"missed-{first.user_id}-{first.id}-{int(last.scheduled_time.timestamp())}-{channel}",
+        data={'reminders': [reminder.id for reminder in reminders]},
+        lane='digest',
+    )
+
+
+def enqueue_missed_summaries(reminders: Iterable, channels: List[str] = None) -> int:
+    """
+    Write one missed-reminder summary per user and channel to the outbox.
+
+    Returns:
+        int: Number of notifications queued
+    """
+    channels = channels or REMINDER_CHANNELS
+    by_user = defaultdict(list)
+    for reminder in reminders:
+        by_user[reminder.user_id].append(reminder)
+
+    notifications = []
+    for user_reminders in by_user.values():
+        user_reminders.sort(key=lambda reminder: reminder.scheduled_time)
+        notifications.extend(
+            n for n in (render_missed_summary(user_reminders, channel) for channel in channels) if n
+        )
+    return outbox.enqueue(notifications)
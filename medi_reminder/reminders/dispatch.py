@@ -0,0 +1,205 @@
+"""
+Reminder dispatch engine.
+
+Claims due reminders in bounded batches, queues their notifications in the
+outbox and marks them notified in the same transaction, then runs the outbox
+relay to deliver them. On PostgreSQL (and other backends that support it)
+batches are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+workers can dispatch at once without sending the same reminder twice. SQLite
+has no row locks, so there each row is claimed with a conditional UPDATE.
+"""
+
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Set
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from medi_reminder import metrics
+from notifications.outbox import relay
+from .cache import invalidate_users
+from .delivery import DOSE_LANES, enqueue_reminders
+from .models import Reminder
+from .partitions import partition_filter
+from .recurrence import roll_forward
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'REMINDER_DISPATCH_BATCH_SIZE', 200)
+MAX_BATCHES = getattr(settings, 'REMINDER_DISPATCH_MAX_BATCHES', 50)
+
+
+@dataclass
+class DispatchStats:
+    """
+    Outcome of one dispatch run.
+    """
+    claimed: int = 0
+    # Reminders done with: notifications queued, or none to queue (no address)
+    delivered: int = 0
+    failed: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Reminders handled per second."""
+        return self.delivered / self.elapsed if self.elapsed else 0.0
+
+
+def due_reminders(now: datetime, partitions: Optional[Set[int]] = None):
+    """
+    Reminders that are due and have not been notified yet, optionally limited to ``partitions``.
+    """
+    queryset = Reminder.objects.filter(status='pending', notified=False, scheduled_time__lte=now)
+    if partitions is not None:
+        queryset = partition_filter(queryset, partitions)
+    return queryset
+
+
+def _mark_notified(ids, now: datetime) -> None:
+    # update() bypasses auto_now, so updated_at is set explicitly
+    Reminder.objects.filter(id__in=ids).update(notified=True, updated_at=now)
+
+
+def _dispatch_batch_locked(candidates, batch_size: int) -> tuple:
+    """
+    Claim a batch, queue its notifications and mark it notified in one transaction.
+
+    Locked rows are skipped by concurrent workers; the locks are released when
+    the transaction commits, together with the outbox rows.
+    """
+    lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+    with transaction.atomic():
+        # Ordered by user within each time so a user's doses share a batch and coalesce
+        batch = list(
+            candidates
+            .select_related('user', 'medication')
+            .order_by('scheduled_time', 'user_id')
+            .select_for_update(skip_locked=True, of=lock_of)[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        handled = enqueue_reminders(batch)
+        _mark_notified(handled, timezone.now())
+        user_ids = {reminder.user_id for reminder in batch}
+        transaction.on_commit(lambda: invalidate_users(user_ids))
+    return len(batch), len(handled)
+
+
+def _dispatch_batch_sqlite(candidates, batch_size: int) -> tuple:
+    """
+    Claim rows one by one with a conditional UPDATE, then queue their notifications.
+
+    A row belongs to the worker whose UPDATE flipped ``notified``; SQLite
+    serialises writers, so claiming and queueing share one transaction.
+    """
+    now = timezone.now()
+    candidates = list(
+        candidates.order_by('scheduled_time', 'user_id').values_list('id', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return 0, 0
+
+    with transaction.atomic():
+        claimed_ids = [
+            reminder_id for reminder_id in candidates
+            if Reminder.objects.filter(id=reminder_id, notified=False).update(notified=True, updated_at=now)
+        ]
+        batch = list(Reminder.objects.filter(id__in=claimed_ids).select_related('user', 'medication'))
+        handled = enqueue_reminders(batch)
+        user_ids = {reminder.user_id for reminder in batch}
+        transaction.on_commit(lambda: invalidate_users(user_ids))
+    return len(claimed_ids), len(handled)
+
+
+def dispatch_due_reminders(
+    now: Optional[datetime] = None,
+    batch_size: int = BATCH_SIZE,
+    max_batches: int = MAX_BATCHES,
+    partitions: Optional[Set[int]] = None,
+    relay_now: bool = True
+) -> DispatchStats:
+    """
+    Dispatch due reminders in bounded batches until none are left or ``max_batches`` is reached.
+
+    A partitioned scheduler node passes the ``partitions`` it owns. The
+    queued notifications are relayed right away unless ``relay_now`` is off,
+    in which case they wait in the outbox for the next relay run.
+
+    Returns:
+        DispatchStats: Counts and throughput for the run
+    """
+    now = now or timezone.now()
+    roll_forward(now, partitions=partitions)
+    dispatch_batch = _batch_dispatcher()
+
+    stats = DispatchStats()
+    started = time.perf_counter()
+    while stats.batches < max_batches:
+        claimed, delivered = dispatch_batch(due_reminders(now, partitions), batch_size)
+        if not claimed:
+            break
+        stats.batches += 1
+        stats.claimed += claimed
+        stats.delivered += delivered
+        stats.failed += claimed - delivered
+        if claimed < batch_size:
+            break
+    stats.elapsed = time.perf_counter() - started
+    _record(stats)
+    if stats.claimed and relay_now:
+        # Deliver right away; the periodic relay picks up retries
+        relay(lanes=DOSE_LANES)
+    return stats
+
+
+def dispatch_reminder_ids(ids: List[int], now: Optional[datetime] = None) -> DispatchStats:
+    """
+    Dispatch specific reminders, e.g. ones fired by the in-memory scheduler.
+
+    The due/pending/not-notified conditions are re-checked against the
+    database, which stays the source of truth for what gets sent. Repeating
+    reminders fired for their next occurrence are rolled forward first.
+    """
+    now = now or timezone.now()
+    roll_forward(now, ids=ids)
+    dispatch_batch = _batch_dispatcher()
+
+    stats = DispatchStats()
+    started = time.perf_counter()
+    for offset in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[offset:offset + BATCH_SIZE]
+        claimed, delivered = dispatch_batch(due_reminders(now).filter(id__in=chunk), len(chunk))
+        stats.batches += 1
+        stats.claimed += claimed
+        stats.delivered += delivered
+        stats.failed += claimed - delivered
+    stats.elapsed = time.perf_counter() - started
+    _record(stats)
+    if stats.claimed:
+        # Deliver right away; the periodic relay picks up retries
+        relay(lanes=DOSE_LANES)
+    return stats
+
+
+def _batch_dispatcher():
+    if connection.features.has_select_for_update_skip_locked:
+        return _dispatch_batch_locked
+    return _dispatch_batch_sqlite
+
+
+def _record(stats: DispatchStats) -> None:
+    if stats.claimed:
+        metrics.increment('reminders.dispatch.delivered', stats.delivered)
+        metrics.increment('reminders.dispatch.failed', stats.failed)
+        metrics.set_gauge('reminders.dispatch.rate', round(stats.rate, 2))
+        logger.info(
+            f"Dispatched {stats.delivered}/{stats.claimed} reminders in {stats.batches} batches "
+            f"({stats.elapsed:.2f}s, {stats.rate:.1f} reminders/sec)"
+        )
@@ -0,0 +1,110 @@
+"""
+Append-only dose event log.
+
+``Reminder.status`` is overwritten in place, so every status change is
+also appended to ``DoseEvent``: taken, missed or reopened (set back to
+pending), with when it happened and how long after the scheduled time.
+The writers that change status (``transition_reminders``, the sweeper,
+catch-up expiry, ``roll_forward`` and single-row saves) call
+``log_transitions`` with the whole batch; the events are handed to the ``write_dose_events`` Celery task
+after the change commits and bulk-inserted there, off the request path.
+With ``REMINDER_DOSE_EVENTS_ASYNC`` off, or when the task cannot be queued,
+they are written inline after commit instead.
+
+Reads go through the ``(user, occurred_at)`` and ``(occurred_at)``
+indexes: ``history`` for one user's range and ``latency_summary`` for
+aggregates over a range.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+from django.utils.dateparse import parse_datetime
+
+from .models import DoseEvent
+
+logger = logging.getLogger(__name__)
+
+ASYNC = getattr(settings, 'REMINDER_DOSE_EVENTS_ASYNC', True)
+BATCH_SIZE = 1000
+
+EVENT_TYPES = {'done': DoseEvent.TAKEN, 'missed': DoseEvent.MISSED, 'pending': DoseEvent.REOPENED}
+
+# (reminder id, user id, medication id, scheduled time)
+Row = Tuple[int, int, int, datetime]
+
+
+def log_transitions(rows: Iterable[Row], status: str, occurred_at: datetime) -> None:
+    """
+    Log doses moved to ``status`` at ``occurred_at``, once the current transaction commits.
+    """
+    event_type = EVENT_TYPES[status]
+    events = [
+        [reminder_id, user_id, medication_id, int((occurred_at - scheduled_time).total_seconds())]
+        for reminder_id, user_id, medication_id, scheduled_time in rows
+    ]
+    if events:
+        stamp = occurred_at.isoformat()
+        transaction.on_commit(lambda: _submit(event_type, stamp, events))
+
+
+def _submit(event_type: int, occurred_at: str, events: List[list]) -> None:
+    if ASYNC:
+        from .tasks import write_dose_events
+
+        try:
+            write_dose_events.delay(event_type, occurred_at, events)
+            return
+        except Exception as exc:
+            logger.warning(f"Could not queue {len(events)} dose events, writing them inline: {exc}")
+    write_events(event_type, occurred_at, events)
+
+
+def write_events(event_type: int, occurred_at: Union[str, datetime], events: List[list]) -> int:
+    """
+    Insert ``[reminder id, user id, medication id, latency]`` events of one type and time.
+
+    Returns:
+        int: Events written
+    """
+    if isinstance(occurred_at, str):
+        occurred_at = parse_datetime(occurred_at)
+    written = DoseEvent.objects.bulk_create(
+        (
+            DoseEvent(
+                reminder_id=reminder_id, user_id=user_id, medication_id=medication_id,
+                event_type=event_type, occurred_at=occurred_at, latency=latency,
+            )
+            for reminder_id, user_id, medication_id, latency in events
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return len(written)
+
+
+def history(user, start: datetime, end: datetime, reminder_id: Optional[int] = None):
+    """
+    The user's dose events in ``[start, end)``, oldest first.
+    """
+    events = DoseEvent.objects.filter(user=user, occurred_at__gte=start, occurred_at__lt=end)
+    if reminder_id is not None:
+        events = events.filter(reminder_id=reminder_id)
+    return events.order_by('occurred_at', 'id')
+
+
+def latency_summary(start: datetime, end: datetime, user=None) -> List[dict]:
+    """
+    Event counts and latency (seconds from schedule) per event type in ``[start, end)``.
+    """
+    events = DoseEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end)
+    if user is not None:
+        events = events.filter(user=user)
+    labels = dict(DoseEvent.EVENT_TYPES)
+    rows = events.order_by().values('event_type').annotate(
+        count=Count('id'), avg_latency=Avg('latency'), min_latency=Min('latency'), max_latency=Max('latency')
+    )
+    return [{**row, 'event_type': labels[row['event_type']]} for row in rows.order_by('event_type')]
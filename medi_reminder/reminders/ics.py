@@ -0,0 +1,148 @@
+"""
+iCalendar (RFC 5545) export of a user's reminders.
+
+Repeating reminders become a single event with an RRULE rather than one
+event per dose, and the feed is generated line by line so it can be streamed.
+One-off reminders older than ``REMINDER_CALENDAR_PAST_DAYS`` and series that
+ended before then are left out, so the feed stays bounded however long the
+user has been taking medication. ``feed_validators`` derives the ETag and
+Last-Modified values from one aggregate query, letting unchanged polls be
+answered with 304 before any event is rendered.
+"""
+
+import hashlib
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from medications.models import Medication
+from .models import Reminder
+
+PRODID = '-//MediReminder//Reminder Feed//EN'
+EVENT_DURATION = 'PT15M'
+RRULE_FREQ = {'daily': 'DAILY', 'weekly': 'WEEKLY'}
+PAST_DAYS = getattr(settings, 'REMINDER_CALENDAR_PAST_DAYS', 30)
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line: str) -> str:
+    """
+    Fold a content line to 75 octets as RFC 5545 requires.
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        # Continuation lines start with a space, leaving 74 octets of content
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def window_start(now: Optional[datetime] = None) -> date:
+    """
+    First local day of the feed: earlier one-off reminders and ended series are left out.
+    """
+    return timezone.localdate(now or timezone.now()) - timedelta(days=PAST_DAYS)
+
+
+def feed_validators(user, token: str = '', now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Compute the feed's ETag and Last-Modified time.
+
+    Row counts are part of the ETag so that deleting a reminder or a
+    medication changes it even though no remaining ``updated_at`` moves;
+    the feed token and window start are too, so a rotated URL or a window
+    that moved on is never answered with 304.
+    """
+    reminders = Reminder.objects.filter(user=user).aggregate(count=Count('id'), latest=Max('updated_at'))
+    medications = Medication.objects.filter(user=user).aggregate(count=Count('id'), latest=Max('updated_at'))
+
+    stamps = [stamp for stamp in (reminders['latest'], medications['latest']) if stamp]
+    last_modified = max(stamps) if stamps else None
+    fingerprint = (
+        f"{user.pk}:{token}:{window_start(now)}:{reminders['count']}:{reminders['latest']}:"
+        f"{medications['count']}:{medications['latest']}"
+    )
+    etag = '"' + hashlib.sha1(fingerprint.encode()).hexdigest() + '"'
+    return etag, last_modified
+
+
+def _event_lines(reminder: Reminder) -> Iterator[str]:
+    medication = reminder.medication
+    yield 'BEGIN:VEVENT'
+    yield f"UID:reminder-{reminder.id}@medi-reminder"
+    yield f"DTSTAMP:{_format_datetime(reminder.updated_at)}"
+    yield f"LAST-MODIFIED:{_format_datetime(reminder.updated_at)}"
+    yield f"DTSTART:{_format_datetime(reminder.scheduled_time)}"
+    yield f"DURATION:{EVENT_DURATION}"
+    yield f"SUMMARY:{_escape(f'Take {medication.name} ({medication.dosage})')}"
+    if medication.instructions:
+        yield f"DESCRIPTION:{_escape(medication.instructions)}"
+
+    freq = RRULE_FREQ.get(reminder.repeat)
+    if freq:
+        rule = f"RRULE:FREQ={freq}"
+        if medication.end_date:
+            until = timezone.make_aware(
+                datetime.combine(medication.end_date, time.max), timezone.get_current_timezone()
+            )
+            rule += f";UNTIL={_format_datetime(until)}"
+        yield rule
+    elif reminder.status != 'pending':
+        yield f"STATUS:{'CANCELLED' if reminder.status == 'missed' else 'CONFIRMED'}"
+    yield 'END:VEVENT'
+
+
+def iter_calendar(user, name: str = 'Medication reminders', now: Optional[datetime] = None) -> Iterator[bytes]:
+    """
+    Yield the user's reminder calendar as encoded, folded iCalendar lines.
+    """
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:{PRODID}",
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f"X-WR-CALNAME:{_escape(name)}",
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+    ]
+    for line in header:
+        yield _fold(line).encode('utf-8')
+
+    start = window_start(now)
+    since = timezone.make_aware(datetime.combine(start, time.min), timezone.get_current_timezone())
+    in_window = Q(scheduled_time__gte=since) | (
+        Q(repeat__in=list(RRULE_FREQ))
+        & (Q(medication__end_date__isnull=True) | Q(medication__end_date__gte=start))
+    )
+    reminders = (
+        Reminder.objects.filter(user=user).filter(in_window)
+        .select_related('medication')
+        .order_by('id')
+        .iterator(chunk_size=500)
+    )
+    for reminder in reminders:
+        yield ''.join(_fold(line) for line in _event_lines(reminder)).encode('utf-8')
+
+    yield _fold('END:VCALENDAR').encode('utf-8')
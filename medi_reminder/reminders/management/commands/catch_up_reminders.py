@@ -0,0 +1,52 @@
+"""
+Drain a reminder dispatch backlog in catch-up mode.
+
+Usage:
+    python manage.py catch_up_reminders --stale-minutes 15 --rate 50
+    python manage.py catch_up_reminders --until-empty
+    python manage.py catch_up_reminders --status
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from medi_reminder import metrics
+from reminders.catchup import BATCH_SIZE, MAX_BATCHES, RATE, STALE_MINUTES, backlog_depth, catch_up
+
+
+class Command(BaseCommand):
+    help = 'Dispatch overdue reminders in rate-limited batches, summarising stale ones per user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=STALE_MINUTES)
+        parser.add_argument('--rate', type=float, default=RATE, help='Reminders per second')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=MAX_BATCHES)
+        parser.add_argument('--until-empty', action='store_true', help='Keep running until the backlog is drained')
+        parser.add_argument('--status', action='store_true', help='Show the backlog and its recent history, then exit')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(f"Backlog: {backlog_depth()} due reminders")
+            for stamp, depth in metrics.get_samples('reminders.catchup.backlog_history'):
+                self.stdout.write(f"  {datetime.fromtimestamp(stamp):%H:%M:%S}  {depth}")
+            return
+
+        while True:
+            started = time.perf_counter()
+            stats = catch_up(
+                stale_after=timedelta(minutes=options['stale_minutes']),
+                rate=options['rate'],
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+            )
+            depth = stats.backlog[-1] if stats.backlog else 0
+            self.stdout.write(
+                f"Dispatched {stats.dispatched}, expired {stats.expired} ({stats.summaries} summaries) "
+                f"in {time.perf_counter() - started:.2f}s; backlog {depth}"
+            )
+            if not options['until_empty'] or not stats.batches or not depth:
+                break
+        self.stdout.write(self.style.SUCCESS('Catch-up finished'))
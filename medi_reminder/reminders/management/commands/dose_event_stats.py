@@ -0,0 +1,45 @@
+"""
+Summarise the dose event log: how many doses were taken, missed or reopened and how late.
+
+Usage:
+    python manage.py dose_event_stats --days 30
+    python manage.py dose_event_stats --days 7 --user 42
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reminders.events import latency_summary
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Show dose event counts and latency from schedule per event type.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--user', type=int, help='Only this user id')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            try:
+                user = CustomUser.objects.get(id=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user with id {options['user']}")
+
+        end = timezone.now()
+        start = end - timedelta(days=options['days'])
+        rows = latency_summary(start, end, user)
+        if not rows:
+            self.stdout.write(f"No dose events in the last {options['days']} days")
+            return
+
+        self.stdout.write(f"{'event':<10} {'count':>8} {'avg late':>10} {'min':>10} {'max':>10}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['event_type']:<10} {row['count']:>8} {row['avg_latency'] / 60:>9.1f}m "
+                f"{row['min_latency'] / 60:>9.1f}m {row['max_latency'] / 60:>9.1f}m"
+            )
@@ -0,0 +1,21 @@
+"""
+Report the reminder response cache's hit ratio and staleness.
+
+Usage:
+    python manage.py reminder_cache_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from reminders.cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit ratio and mean age of served entries for the cached reminder views.'
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.2%} "
+            f"mean_age={stats['mean_age_seconds']:.1f}s"
+        )
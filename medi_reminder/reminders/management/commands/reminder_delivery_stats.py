@@ -0,0 +1,20 @@
+"""
+Report how many provider sends reminder delivery needs per dose.
+
+Usage:
+    python manage.py reminder_delivery_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from reminders.delivery import delivery_stats
+
+
+class Command(BaseCommand):
+    help = 'Show doses delivered, messages queued for them and sends per dose after coalescing.'
+
+    def handle(self, *args, **options):
+        stats = delivery_stats()
+        self.stdout.write(
+            f"doses={stats['doses']} messages={stats['messages']} sends_per_dose={stats['sends_per_dose']:.3f}"
+        )
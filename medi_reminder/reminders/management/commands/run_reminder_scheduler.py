@@ -0,0 +1,79 @@
+"""
+Run the in-memory reminder scheduler.
+
+Usage:
+    python manage.py run_reminder_scheduler --horizon 10 --refresh 30
+    python manage.py run_reminder_scheduler --partitioned --lease-backend redis
+    python manage.py run_reminder_scheduler --prestage --jitter 20
+"""
+
+from django.core.management.base import BaseCommand
+
+from reminders.partitions import LEASE_BACKEND, LEASE_SECONDS, PartitionCoordinator, get_lease_store
+from reminders.prestage import BURST_THRESHOLD, JITTER_SECONDS, LEAD_MINUTES, BurstStager
+from reminders.scheduler import HORIZON_MINUTES, REFRESH_SECONDS, TICK_SECONDS, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Fire near-term reminders on time from an in-memory timing wheel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=float, default=HORIZON_MINUTES, help='Minutes of reminders to keep loaded')
+        parser.add_argument('--refresh', type=float, default=REFRESH_SECONDS, help='Seconds between database refreshes')
+        parser.add_argument('--tick', type=float, default=TICK_SECONDS, help='Timing wheel resolution in seconds')
+        parser.add_argument(
+            '--partitioned', action='store_true',
+            help='Only handle the partitions this node holds leases for'
+        )
+        parser.add_argument('--node-id', help='Node name for partition leases (default: host-pid)')
+        parser.add_argument(
+            '--lease-backend', choices=['db', 'redis', 'local'], default=LEASE_BACKEND,
+            help='Where partition leases are stored'
+        )
+        parser.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS, help='Partition lease duration')
+        parser.add_argument(
+            '--prestage', action='store_true',
+            help='Render and stage notifications for reminder bursts ahead of time'
+        )
+        parser.add_argument('--lead-minutes', type=float, default=LEAD_MINUTES, help='How far ahead bursts are staged')
+        parser.add_argument(
+            '--burst-threshold', type=int, default=BURST_THRESHOLD,
+            help='Reminders due in one minute that count as a burst'
+        )
+        parser.add_argument('--jitter', type=float, default=JITTER_SECONDS, help='Spread staged releases over this many seconds')
+
+    def handle(self, *args, **options):
+        coordinator = None
+        if options['partitioned']:
+            coordinator = PartitionCoordinator(
+                node_id=options['node_id'],
+                store=get_lease_store(options['lease_backend']),
+                lease_seconds=options['lease_seconds'],
+            )
+        stager = None
+        if options['prestage']:
+            stager = BurstStager(
+                lead_minutes=options['lead_minutes'],
+                threshold=options['burst_threshold'],
+                jitter=options['jitter'],
+            )
+        scheduler = ReminderScheduler(
+            horizon_minutes=options['horizon'],
+            refresh_seconds=options['refresh'],
+            tick=options['tick'],
+            coordinator=coordinator,
+            stager=stager,
+        )
+        self.stdout.write(
+            f"Reminder scheduler running: horizon {options['horizon']} min, "
+            f"refresh every {options['refresh']}s, tick {options['tick']}s"
+        )
+        if coordinator is not None:
+            self.stdout.write(
+                f"Partitioned as node {coordinator.node_id} "
+                f"({coordinator.partition_count} partitions, {options['lease_backend']} leases)"
+            )
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write('Scheduler stopped')
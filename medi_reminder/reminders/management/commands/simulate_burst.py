@@ -0,0 +1,101 @@
+"""
+Measure burst pre-staging capacity with a synthetic spike.
+
+Seeds ``--reminders`` reminders due in the same minute, lets the scheduler
+plan and stage them as it would a few minutes ahead of a real burst, then
+releases them all at their due time and reports how long each phase took.
+Everything runs in one transaction that is rolled back unless ``--keep`` is
+given; notifications are staged and released but not sent.
+
+Usage:
+    python manage.py simulate_burst --reminders 100000
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medications.models import Medication
+from reminders.models import Reminder
+from reminders.prestage import BurstStager
+from reminders.scheduler import ReminderScheduler
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Stage and release a synthetic burst of reminders due in the same minute and report timings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reminders', type=int, default=100000)
+        parser.add_argument('--per-user', type=int, default=3, help='Reminders per synthetic user')
+        parser.add_argument('--lead-minutes', type=float, default=5)
+        parser.add_argument('--jitter', type=float, default=0)
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic data instead of rolling back')
+
+    def _seed(self, count: int, per_user: int, due):
+        run = int(time.time())
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(username=f'burst-{run}-{i}', email=f'burst-{run}-{i}@example.com')
+                for i in range((count + per_user - 1) // per_user)
+            ],
+            batch_size=1000,
+        )
+        medications = Medication.objects.bulk_create(
+            [
+                Medication(user=user, name=f'Synthetic {n}', dosage='1 tablet', frequency='daily', start_date=date.today())
+                for user in users for n in range(per_user)
+            ][:count],
+            batch_size=1000,
+        )
+        Reminder.objects.bulk_create(
+            [Reminder(user=medication.user, medication=medication, scheduled_time=due) for medication in medications],
+            batch_size=1000,
+        )
+
+    def _timed(self, label: str, func):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<10} {elapsed:8.2f}s")
+        return result, elapsed
+
+    def handle(self, *args, **options):
+        count = options['reminders']
+        now = timezone.now()
+        due = now.replace(second=0, microsecond=0) + timedelta(minutes=max(1, options['lead_minutes'] - 1))
+
+        with transaction.atomic():
+            self._timed('seed', lambda: self._seed(count, options['per_user'], due))
+
+            stager = BurstStager(lead_minutes=options['lead_minutes'], threshold=1, jitter=options['jitter'])
+            scheduler = ReminderScheduler(
+                horizon_minutes=options['lead_minutes'] + 1,
+                base_queryset=Reminder.objects.filter(scheduled_time=due),
+                fire=lambda ids: None,
+                stager=stager,
+            )
+            self._timed('plan', lambda: scheduler.refresh(now))
+
+            def stage_all():
+                while scheduler.to_stage:
+                    scheduler.stage_next()
+            _, staging = self._timed('stage', stage_all)
+
+            # Release at the due time (plus the full jitter window)
+            ids = scheduler.wheel.advance(due.timestamp() + options['jitter'])
+            (claimed, released), releasing = self._timed(
+                'release', lambda: stager.release(ids, now=due, relay=False)
+            )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} reminders due in one minute: staged {len(ids)} at {len(ids) / staging if staging else 0:.0f}/s, "
+            f"released {claimed} reminders ({released} notifications) in {releasing:.2f}s "
+            f"({claimed / releasing if releasing else 0:.0f}/s)"
+        ))
@@ -0,0 +1,33 @@
+"""
+Run one missed-reminder sweep from the command line.
+
+Usage:
+    python manage.py sweep_missed_reminders --grace-minutes 30 --chunk-size 500
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from reminders.sweeper import CHUNK_PAUSE, CHUNK_SIZE, GRACE_MINUTES, MAX_CHUNKS, sweep_missed_reminders
+
+
+class Command(BaseCommand):
+    help = 'Mark pending reminders overdue past the grace window as missed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=GRACE_MINUTES)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--max-chunks', type=int, default=MAX_CHUNKS)
+        parser.add_argument('--pause', type=float, default=CHUNK_PAUSE, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        stats = sweep_missed_reminders(
+            grace=timedelta(minutes=options['grace_minutes']),
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'],
+            pause=options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {stats.swept} reminders missed in {stats.chunks} chunks ({stats.elapsed:.2f}s)"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import reminders.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reminders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=reminders.models.generate_feed_token, max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Calendar Feed',
+                'verbose_name_plural': 'Calendar Feeds',
+            },
+        ),
+    ]
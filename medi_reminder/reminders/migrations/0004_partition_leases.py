@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0003_calendarfeed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartitionLease',
+            fields=[
+                ('partition', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=255)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Partition Lease',
+                'verbose_name_plural': 'Partition Leases',
+                'ordering': ['partition'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SchedulerNode',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Scheduler Node',
+                'verbose_name_plural': 'Scheduler Nodes',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0004_partition_leases'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'status', 'scheduled_time'], name='reminder_user_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', '-created_at'], name='reminder_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['scheduled_time'], name='reminder_pending_time_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0005_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reminders', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdherenceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('done', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_rollups', to='medications.medication')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Adherence Rollup',
+                'verbose_name_plural': 'Adherence Rollups',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['user', 'day'], name='adherence_user_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='adherencerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'medication', 'day'), name='adherence_rollup_unique'),
+        ),
+    ]
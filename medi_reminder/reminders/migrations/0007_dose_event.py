@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-19 01:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reminders', '0006_adherence_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoseEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('reminder_id', models.BigIntegerField()),
+                ('medication_id', models.BigIntegerField()),
+                ('event_type', models.PositiveSmallIntegerField(choices=[(1, 'Taken'), (2, 'Missed'), (3, 'Reopened')])),
+                ('occurred_at', models.DateTimeField()),
+                ('latency', models.IntegerField(help_text='Seconds from the scheduled time to the event; negative if early')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='dose_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dose Event',
+                'verbose_name_plural': 'Dose Events',
+                'ordering': ['-occurred_at'],
+                'indexes': [models.Index(fields=['user', 'occurred_at'], name='dose_event_user_time_idx'), models.Index(fields=['occurred_at'], name='dose_event_time_idx')],
+            },
+        ),
+    ]
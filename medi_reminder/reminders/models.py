@@ -5,6 +5,8 @@ This module contains Django models for reminder-related data.
 Defines the structure for medication reminders.
 """
 
+import secrets
+
 from django.db import models
 from django.conf import settings
 
@@ -37,6 +39,148 @@ class Reminder(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Reminder'
         verbose_name_plural = 'Reminders'
+        indexes = [
+            # Per-user lists: upcoming/pending by status and time, default ordering
+            models.Index(fields=['user', 'status', 'scheduled_time'], name='reminder_user_status_time_idx'),
+            models.Index(fields=['user', '-created_at'], name='reminder_user_created_idx'),
+            # Dispatch, catch-up and the overdue sweeper only ever look at pending rows
+            models.Index(
+                fields=['scheduled_time'], name='reminder_pending_time_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.medication.name} ({self.scheduled_time.strftime('%Y-%m-%d %H:%M')})"
+
+
+def generate_feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """
+    Model holding a user's secret calendar feed token.
+    
+    Calendar apps cannot log in, so the feed URL carries this token instead;
+    rotating it revokes every previously shared URL.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_feed')
+    token = models.CharField(max_length=64, unique=True, default=generate_feed_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Calendar Feed'
+        verbose_name_plural = 'Calendar Feeds'
+    
+    def __str__(self):
+        return f"Calendar feed for {self.user.username}"
+    
+    def rotate(self):
+        """
+        Replace the token, invalidating the old feed URL.
+        """
+        self.token = generate_feed_token()
+        self.save(update_fields=['token'])
+
+
+class PartitionLease(models.Model):
+    """
+    Model recording which scheduler node owns a reminder partition, and until when.
+    
+    Reminders are partitioned by user id; see reminders.partitions.
+    """
+    partition = models.PositiveIntegerField(primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['partition']
+        verbose_name = 'Partition Lease'
+        verbose_name_plural = 'Partition Leases'
+    
+    def __str__(self):
+        return f"Partition {self.partition} - {self.owner}"
+
+
+class SchedulerNode(models.Model):
+    """
+    Model holding the heartbeat of a running scheduler node.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    last_seen = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Scheduler Node'
+        verbose_name_plural = 'Scheduler Nodes'
+    
+    def __str__(self):
+        return self.name
+
+
+class AdherenceRollup(models.Model):
+    """
+    Model holding one user's dose counts for one medication on one day.
+    
+    Kept up to date on every reminder status change so adherence can be
+    read per day instead of per dose; see reminders.adherence.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='adherence_rollups')
+    medication = models.ForeignKey('medications.Medication', on_delete=models.CASCADE, related_name='adherence_rollups')
+    day = models.DateField()
+    done = models.IntegerField(default=0)
+    missed = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        verbose_name = 'Adherence Rollup'
+        verbose_name_plural = 'Adherence Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'medication', 'day'], name='adherence_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='adherence_user_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.medication_id} ({self.day}): {self.done} done, {self.missed} missed"
+
+
+class DoseEvent(models.Model):
+    """
+    Model recording one status change of a dose: taken, missed or reopened.
+    
+    Rows are only ever appended, in batches after the change commits; see
+    reminders.events. The reminder and medication are kept as plain ids so
+    the history outlives them and writes never touch the reminder table.
+    """
+    TAKEN = 1
+    MISSED = 2
+    REOPENED = 3
+    EVENT_TYPES = [(TAKEN, 'Taken'), (MISSED, 'Missed'), (REOPENED, 'Reopened')]
+    
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='dose_events', db_index=False
+    )
+    reminder_id = models.BigIntegerField()
+    medication_id = models.BigIntegerField()
+    event_type = models.PositiveSmallIntegerField(choices=EVENT_TYPES)
+    occurred_at = models.DateTimeField()
+    latency = models.IntegerField(help_text="Seconds from the scheduled time to the event; negative if early")
+    
+    class Meta:
+        ordering = ['-occurred_at']
+        verbose_name = 'Dose Event'
+        verbose_name_plural = 'Dose Events'
+        indexes = [
+            # Covers the user FK as well as per-user time ranges
+            models.Index(fields=['user', 'occurred_at'], name='dose_event_user_time_idx'),
+            models.Index(fields=['occurred_at'], name='dose_event_time_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.medication.name} ({self.scheduled_time.strftime('%Y-%m-%d %H:%M')})"
\ No newline at end of file
+        return f"{self.get_event_type_display()} reminder {self.reminder_id} at {self.occurred_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,292 @@
+"""
+Partitioned reminder scheduling.
+
+Reminders are split into ``REMINDER_PARTITIONS`` partitions by
+``user_id mod N``, so all of a user's reminders live in one partition.
+Every scheduler node heartbeats into a lease store and takes the partitions
+whose number modulo the live node count equals its rank among the live
+nodes. Ownership is a lease that the owner renews; when a node dies its
+heartbeat and leases expire and the survivors' shares grow to cover its
+partitions, and a joining node makes the others release the partitions
+that move to it.
+
+Lease stores: ``DatabaseLeaseStore`` (default), ``RedisLeaseStore`` and
+the in-process ``LocalLeaseStore`` for tests and single-node development.
+"""
+
+import os
+import socket
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .models import PartitionLease, SchedulerNode
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COUNT = getattr(settings, 'REMINDER_PARTITIONS', 16)
+LEASE_SECONDS = getattr(settings, 'REMINDER_PARTITION_LEASE_SECONDS', 90)
+LEASE_BACKEND = getattr(settings, 'REMINDER_PARTITION_LEASE_BACKEND', 'db')
+
+
+def partition_filter(queryset, partitions: Set[int], count: int = PARTITION_COUNT):
+    """
+    Narrow a Reminder queryset to the given partitions.
+    """
+    return queryset.annotate(partition=Mod('user_id', count)).filter(partition__in=sorted(partitions))
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseStore:
+    """
+    Interface for partition leases and node heartbeats.
+    """
+
+    def heartbeat(self, node: str, ttl: float) -> None:
+        raise NotImplementedError
+
+    def live_nodes(self, ttl: float) -> List[str]:
+        raise NotImplementedError
+
+    def remove_node(self, node: str) -> None:
+        raise NotImplementedError
+
+    def acquire(self, partition: int, node: str, ttl: float) -> bool:
+        """
+        Take or renew the lease on ``partition``; False if another node holds it.
+        """
+        raise NotImplementedError
+
+    def release(self, partition: int, node: str) -> None:
+        raise NotImplementedError
+
+    def owners(self) -> Dict[int, str]:
+        """
+        Current, unexpired lease holders by partition.
+        """
+        raise NotImplementedError
+
+
+class LocalLeaseStore(LeaseStore):
+    """
+    In-process lease store; ``clock`` can be replaced to simulate time passing.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.nodes: Dict[str, float] = {}
+        self.leases: Dict[int, tuple] = {}
+        self.lock = threading.Lock()
+
+    def heartbeat(self, node, ttl):
+        with self.lock:
+            self.nodes[node] = self.clock()
+
+    def live_nodes(self, ttl):
+        now = self.clock()
+        with self.lock:
+            return sorted(node for node, seen in self.nodes.items() if now - seen <= ttl)
+
+    def remove_node(self, node):
+        with self.lock:
+            self.nodes.pop(node, None)
+
+    def acquire(self, partition, node, ttl):
+        now = self.clock()
+        with self.lock:
+            owner, expires = self.leases.get(partition, (None, 0))
+            if owner not in (None, node) and expires > now:
+                return False
+            self.leases[partition] = (node, now + ttl)
+            return True
+
+    def release(self, partition, node):
+        with self.lock:
+            if self.leases.get(partition, (None,))[0] == node:
+                del self.leases[partition]
+
+    def owners(self):
+        now = self.clock()
+        with self.lock:
+            return {partition: owner for partition, (owner, expires) in self.leases.items() if expires > now}
+
+
+class DatabaseLeaseStore(LeaseStore):
+    """
+    Leases and heartbeats in the ``PartitionLease`` / ``SchedulerNode`` tables.
+
+    Acquiring is a conditional UPDATE (free, expired or already ours), so two
+    nodes can never both succeed on the same partition.
+    """
+
+    def heartbeat(self, node, ttl):
+        SchedulerNode.objects.update_or_create(name=node, defaults={'last_seen': timezone.now()})
+
+    def live_nodes(self, ttl):
+        cutoff = timezone.now() - timedelta(seconds=ttl)
+        return list(SchedulerNode.objects.filter(last_seen__gte=cutoff).order_by('name').values_list('name', flat=True))
+
+    def remove_node(self, node):
+        SchedulerNode.objects.filter(name=node).delete()
+
+    def acquire(self, partition, node, ttl):
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=ttl)
+        updated = PartitionLease.objects.filter(partition=partition).filter(
+            Q(owner=node) | Q(expires_at__lt=now)
+        ).update(owner=node, expires_at=expires_at)
+        if updated:
+            return True
+        try:
+            with transaction.atomic():
+                PartitionLease.objects.create(partition=partition, owner=node, expires_at=expires_at)
+            return True
+        except IntegrityError:
+            return False
+
+    def release(self, partition, node):
+        PartitionLease.objects.filter(partition=partition, owner=node).delete()
+
+    def owners(self):
+        return dict(
+            PartitionLease.objects.filter(expires_at__gte=timezone.now()).values_list('partition', 'owner')
+        )
+
+
+class RedisLeaseStore(LeaseStore):
+    """
+    Leases as expiring Redis keys, heartbeats in a sorted set.
+    """
+    KEY_PREFIX = 'reminders:partition:'
+    NODES_KEY = 'reminders:scheduler-nodes'
+
+    ACQUIRE_SCRIPT = """
+    local owner = redis.call('GET', KEYS[1])
+    if not owner or owner == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+        return 1
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.acquire_script = self.client.register_script(self.ACQUIRE_SCRIPT)
+        self.release_script = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def heartbeat(self, node, ttl):
+        self.client.zadd(self.NODES_KEY, {node: time.time()})
+
+    def live_nodes(self, ttl):
+        self.client.zremrangebyscore(self.NODES_KEY, '-inf', time.time() - ttl)
+        return sorted(self.client.zrange(self.NODES_KEY, 0, -1))
+
+    def remove_node(self, node):
+        self.client.zrem(self.NODES_KEY, node)
+
+    def acquire(self, partition, node, ttl):
+        return bool(self.acquire_script(keys=[f"{self.KEY_PREFIX}{partition}"], args=[node, int(ttl * 1000)]))
+
+    def release(self, partition, node):
+        self.release_script(keys=[f"{self.KEY_PREFIX}{partition}"], args=[node])
+
+    def owners(self):
+        owners = {}
+        for key in self.client.scan_iter(f"{self.KEY_PREFIX}*"):
+            owner = self.client.get(key)
+            if owner:
+                owners[int(key[len(self.KEY_PREFIX):])] = owner
+        return owners
+
+
+def get_lease_store(backend: str = LEASE_BACKEND) -> LeaseStore:
+    """
+    Build the lease store configured by ``REMINDER_PARTITION_LEASE_BACKEND`` (db, redis or local).
+    """
+    if backend == 'redis':
+        return RedisLeaseStore()
+    if backend == 'local':
+        return LocalLeaseStore()
+    return DatabaseLeaseStore()
+
+
+class PartitionCoordinator:
+    """
+    Keeps one node's share of the partitions leased.
+
+    Call ``rebalance`` at least every ``lease_seconds / 3`` seconds; it
+    heartbeats, renews the node's leases, releases partitions that now
+    belong to another node and takes over ones freed up.
+    """
+
+    def __init__(
+        self,
+        node_id: Optional[str] = None,
+        store: Optional[LeaseStore] = None,
+        partitions: int = PARTITION_COUNT,
+        lease_seconds: float = LEASE_SECONDS
+    ):
+        self.node_id = node_id or default_node_id()
+        self.store = store or get_lease_store()
+        self.partition_count = partitions
+        self.lease_seconds = lease_seconds
+        self.owned: Set[int] = set()
+
+    def target(self, live: List[str]) -> Set[int]:
+        """
+        Partitions this node should own given the live nodes.
+        """
+        if self.node_id not in live:
+            live = sorted(live + [self.node_id])
+        rank, size = live.index(self.node_id), len(live)
+        return {partition for partition in range(self.partition_count) if partition % size == rank}
+
+    def rebalance(self) -> Set[int]:
+        """
+        Heartbeat, release partitions that moved away and lease this node's share.
+
+        Returns:
+            set: Partitions this node owns now
+        """
+        self.store.heartbeat(self.node_id, self.lease_seconds)
+        target = self.target(self.store.live_nodes(self.lease_seconds))
+
+        for partition in self.owned - target:
+            self.store.release(partition, self.node_id)
+
+        owned = {
+            partition for partition in sorted(target)
+            if self.store.acquire(partition, self.node_id, self.lease_seconds)
+        }
+        if owned != self.owned:
+            logger.info(f"Node {self.node_id} owns partitions {sorted(owned)} of {self.partition_count}")
+        self.owned = owned
+        return owned
+
+    def close(self) -> None:
+        """
+        Release every lease and leave the cluster, handing partitions over immediately.
+        """
+        for partition in self.owned:
+            self.store.release(partition, self.node_id)
+        self.store.remove_node(self.node_id)
+        self.owned = set()
@@ -0,0 +1,244 @@
+"""
+Pre-staging of reminder bursts.
+
+Most doses are scheduled at round times, so dispatch load arrives as spikes
+at 08:00, 13:00, 21:00 and so on. The scheduler spots minutes with at least
+``REMINDER_PRESTAGE_BURST_THRESHOLD`` reminders a few minutes ahead and the
+``BurstStager`` renders their notifications early, storing them in the
+outbox as ``staged`` rows. When a staged reminder comes due only two cheap
+set-based updates remain: claim the reminder rows and release their staged
+messages to the relay. Releases can be spread over
+``REMINDER_PRESTAGE_JITTER_SECONDS`` to soften the spike at the provider.
+
+A user's reminders staged for the same time are coalesced into one digest
+like on the normal dispatch path. A reminder that is changed after staging
+is unstaged, together with any reminders sharing its digest, and dispatched
+the normal way; if the normal path reaches a staged reminder first,
+``enqueue`` releases the staged message instead of writing a second one.
+"""
+
+import random
+import logging
+from collections import Counter, defaultdict
+from itertools import groupby
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notifications import outbox
+from .cache import invalidate_users
+from .delivery import DOSE_LANES, REMINDER_CHANNELS, enqueue_reminders, render_reminders
+from .models import Reminder
+
+logger = logging.getLogger(__name__)
+
+LEAD_MINUTES = getattr(settings, 'REMINDER_PRESTAGE_MINUTES', 5)
+BURST_THRESHOLD = getattr(settings, 'REMINDER_PRESTAGE_BURST_THRESHOLD', 200)
+JITTER_SECONDS = getattr(settings, 'REMINDER_PRESTAGE_JITTER_SECONDS', 0.0)
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class StagedReminder:
+    """
+    A reminder whose notifications are waiting in the outbox.
+    """
+    user_id: int
+    scheduled_time: datetime
+    updated_at: datetime
+    keys: List[str]
+
+
+def burst_minutes(due_times: Iterable[Tuple[int, float]], threshold: int = BURST_THRESHOLD) -> List[int]:
+    """
+    Ids of the ``(reminder id, due timestamp)`` pairs that fall in a minute holding at least ``threshold`` reminders.
+    """
+    due_times = list(due_times)
+    per_minute = Counter(int(due // 60) for _, due in due_times)
+    return [reminder_id for reminder_id, due in due_times if per_minute[int(due // 60)] >= threshold]
+
+
+class BurstStager:
+    """
+    Renders and stages notifications ahead of a burst and releases them when it comes due.
+    """
+
+    def __init__(
+        self,
+        lead_minutes: float = LEAD_MINUTES,
+        threshold: int = BURST_THRESHOLD,
+        jitter: float = JITTER_SECONDS,
+        channels: Optional[List[str]] = None
+    ):
+        self.lead = lead_minutes * 60
+        self.threshold = threshold
+        self.jitter = jitter
+        self.channels = channels or REMINDER_CHANNELS
+        self.staged: Dict[int, StagedReminder] = {}
+        # Staged message key -> reminders it covers
+        self.members: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.staged)
+
+    def release_time(self, reminder_id: int) -> float:
+        """
+        When a staged reminder should be released: its time plus up to ``jitter`` seconds.
+
+        The jitter is derived from the reminder's first message key, so every
+        reminder in a digest is released on the same tick.
+        """
+        staged = self.staged[reminder_id]
+        seed = staged.keys[0] if staged.keys else reminder_id
+        return staged.scheduled_time.timestamp() + random.Random(seed).uniform(0, self.jitter)
+
+    def is_current(self, reminder_id: int, updated_at: datetime) -> bool:
+        """
+        Whether a staged reminder is unchanged since it was staged.
+        """
+        staged = self.staged.get(reminder_id)
+        return staged is not None and staged.updated_at == updated_at
+
+    def stage(self, ids: List[int]) -> List[int]:
+        """
+        Render and stage the notifications of pending reminders.
+
+        Returns:
+            list: Ids of the reminders staged
+        """
+        staged_ids = []
+        for offset in range(0, len(ids), CHUNK_SIZE):
+            reminders = Reminder.objects.filter(
+                id__in=ids[offset:offset + CHUNK_SIZE], status='pending', notified=False
+            ).select_related('user', 'medication')
+
+            by_time = defaultdict(list)
+            for reminder in reminders:
+                by_time[reminder.scheduled_time].append(reminder)
+
+            notifications = []
+            for same_time in by_time.values():
+                for group, rendered in render_reminders(same_time, self.channels):
+                    keys = [n.key for n in rendered]
+                    notifications.extend(rendered)
+                    for key in keys:
+                        self.members[key] = [reminder.id for reminder in group]
+                    for reminder in group:
+                        self.staged[reminder.id] = StagedReminder(
+                            reminder.user_id, reminder.scheduled_time, reminder.updated_at, keys
+                        )
+                        staged_ids.append(reminder.id)
+            outbox.stage(notifications)
+
+        if staged_ids:
+            logger.info(f"Staged notifications for {len(staged_ids)} reminders")
+        return staged_ids
+
+    def forget(self, ids: Iterable[int]) -> None:
+        """
+        Drop staged reminders and their staged messages, along with every reminder sharing one of those messages.
+        """
+        pending, keys = list(ids), set()
+        while pending:
+            staged = self.staged.pop(pending.pop(), None)
+            if staged is None:
+                continue
+            for key in staged.keys:
+                if key not in keys:
+                    keys.add(key)
+                    pending.extend(self.members.pop(key, []))
+        if keys:
+            outbox.discard(list(keys))
+
+    def close(self) -> None:
+        self.forget(list(self.staged))
+
+    def _claim(self, ids: List[int], scheduled_time: datetime, now: datetime) -> List[int]:
+        """
+        Mark staged reminders that are still pending for ``scheduled_time`` as notified.
+        """
+        candidates = Reminder.objects.filter(
+            id__in=ids, status='pending', notified=False, scheduled_time=scheduled_time
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            lock_of = ('self',) if connection.features.has_select_for_update_of else ()
+            claimed = list(candidates.select_for_update(skip_locked=True, of=lock_of).values_list('id', flat=True))
+            Reminder.objects.filter(id__in=claimed).update(notified=True, updated_at=now)
+            return claimed
+
+        # SQLite: the UPDATE takes the database write lock, so the rows stamped
+        # with this ``now`` afterwards are exactly the ones this call claimed
+        candidates.update(notified=True, updated_at=now)
+        return list(Reminder.objects.filter(id__in=ids, notified=True, updated_at=now).values_list('id', flat=True))
+
+    def _chunks_by_user(self, ids: List[int]) -> Iterable[List[int]]:
+        # Chunks of about CHUNK_SIZE that never split one user's reminders
+        ids = sorted(ids, key=lambda reminder_id: self.staged[reminder_id].user_id)
+        chunk = []
+        for _, user_ids in groupby(ids, key=lambda reminder_id: self.staged[reminder_id].user_id):
+            chunk.extend(user_ids)
+            if len(chunk) >= CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def release(self, ids: List[int], now: Optional[datetime] = None, relay: bool = True) -> Tuple[int, int]:
+        """
+        Claim due staged reminders and release their messages to the relay.
+
+        Messages of reminders that can no longer be claimed (done, changed or
+        dispatched by another worker) are discarded. When only part of a
+        digest's reminders can be claimed, the digest is discarded and the
+        claimed ones are rendered again on the spot.
+
+        Returns:
+            tuple: Reminders claimed and messages released
+        """
+        now = now or timezone.now()
+        by_time = defaultdict(list)
+        for reminder_id in ids:
+            if reminder_id in self.staged:
+                by_time[self.staged[reminder_id].scheduled_time].append(reminder_id)
+
+        claimed_count = released = 0
+        for scheduled_time, group in by_time.items():
+            for chunk in self._chunks_by_user(group):
+                with transaction.atomic():
+                    claimed = set(self._claim(chunk, scheduled_time, now))
+                    keys = {key for reminder_id in claimed for key in self.staged[reminder_id].keys}
+                    complete = {key for key in keys if claimed.issuperset(self.members.get(key, []))}
+                    released += outbox.release(list(complete), now)
+
+                    # Digests that also cover unclaimed reminders are dropped
+                    # and their claimed reminders rendered again
+                    incomplete = keys - complete
+                    partial = [
+                        reminder_id for reminder_id in claimed
+                        if not complete.issuperset(self.staged[reminder_id].keys)
+                    ]
+                    if partial:
+                        outbox.discard(list(incomplete))
+                        enqueue_reminders(
+                            Reminder.objects.filter(id__in=partial).select_related('user', 'medication'),
+                            self.channels
+                        )
+                    user_ids = {self.staged[reminder_id].user_id for reminder_id in claimed}
+                    transaction.on_commit(lambda user_ids=user_ids: invalidate_users(user_ids))
+
+                unclaimed = [reminder_id for reminder_id in chunk if reminder_id not in claimed]
+                unclaimed += [reminder_id for key in incomplete for reminder_id in self.members.get(key, [])]
+                for reminder_id in claimed:
+                    del self.staged[reminder_id]
+                for key in complete:
+                    self.members.pop(key, None)
+                self.forget(unclaimed)
+                claimed_count += len(claimed)
+
+        if claimed_count and relay:
+            outbox.relay(lanes=DOSE_LANES)
+        return claimed_count, released
@@ -0,0 +1,242 @@
+"""
+Recurrence engine for daily and weekly reminders.
+
+A repeating reminder row is a series: its ``scheduled_time`` is the anchor
+(the current occurrence) and further occurrences lie a whole number of
+periods before or after it, bounded by the medication's start and end dates.
+The next occurrence is computed in O(1) with integer arithmetic, and ranges
+are expanded lazily so calendar views never materialise the whole series.
+
+Periods are fixed-length (24h / 7 days) in UTC, matching ``TIME_ZONE``.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import adherence, events
+from .cache import invalidate_users
+from .models import Reminder
+from .partitions import partition_filter
+
+PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+# Upper bound on occurrences cached per reminder and range
+MAX_CACHED_OCCURRENCES = 1000
+
+def _series_bounds(start_date: Optional[date], end_date: Optional[date]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start_date, time.min), tz) if start_date else None
+    upper = timezone.make_aware(datetime.combine(end_date, time.max), tz) if end_date else None
+    return lower, upper
+
+
+def first_occurrence_at_or_after(
+    anchor: datetime,
+    repeat: str,
+    moment: datetime,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Optional[datetime]:
+    """
+    Return the first occurrence of a series at or after ``moment``, or None if the series has ended.
+    """
+    period = PERIODS.get(repeat)
+    if period is None:
+        return anchor if anchor >= moment else None
+
+    lower, upper = _series_bounds(start_date, end_date)
+    if lower and moment < lower:
+        moment = lower
+
+    steps = math.ceil((moment - anchor) / period)
+    occurrence = anchor + steps * period
+    if upper and occurrence > upper:
+        return None
+    return occurrence
+
+
+def next_occurrence_at(
+    anchor: datetime,
+    repeat: str,
+    after: datetime,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Optional[datetime]:
+    """
+    Return the first occurrence strictly after ``after``, or None if there is none.
+    """
+    return first_occurrence_at_or_after(anchor, repeat, after + timedelta(microseconds=1), start_date, end_date)
+
+
+def next_occurrence(reminder: Reminder, after: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Return the reminder's next occurrence after ``after`` (default: now).
+    """
+    medication = reminder.medication
+    return next_occurrence_at(
+        reminder.scheduled_time, reminder.repeat, after or timezone.now(),
+        medication.start_date, medication.end_date
+    )
+
+
+def _iter_series(
+    anchor: datetime,
+    repeat: str,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    start: datetime,
+    end: datetime
+) -> Iterator[datetime]:
+    occurrence = first_occurrence_at_or_after(anchor, repeat, start, start_date, end_date)
+    period = PERIODS.get(repeat)
+    _, upper = _series_bounds(None, end_date)
+    limit = min(end, upper) if upper else end
+
+    while occurrence is not None and occurrence <= limit:
+        yield occurrence
+        if period is None:
+            return
+        occurrence += period
+
+
+def iter_occurrences(reminder: Reminder, start: datetime, end: datetime) -> Iterator[datetime]:
+    """
+    Lazily yield the reminder's occurrences within ``[start, end]``.
+    """
+    medication = reminder.medication
+    return _iter_series(
+        reminder.scheduled_time, reminder.repeat, medication.start_date, medication.end_date, start, end
+    )
+
+
+@lru_cache(maxsize=4096)
+def _cached_expansion(reminder_id, version, anchor, repeat, start_date, end_date, start, end) -> Tuple[datetime, ...]:
+    return tuple(islice(_iter_series(anchor, repeat, start_date, end_date, start, end), MAX_CACHED_OCCURRENCES))
+
+
+def _day_bounds(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """
+    Widen ``[start, end]`` to whole local days.
+    """
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(timezone.localtime(start).date(), time.min), tz)
+    upper = timezone.make_aware(datetime.combine(timezone.localtime(end).date(), time.max), tz)
+    return lower, upper
+
+
+def expand_occurrences(reminder: Reminder, start: datetime, end: datetime) -> Tuple[datetime, ...]:
+    """
+    Expand the reminder's occurrences in ``[start, end]``, cached per reminder version.
+
+    Expansions are cached over the whole local days the range touches, so
+    requests whose bounds default to "now" share entries through the day. The
+    cache key includes the reminder's and its medication's ``updated_at``,
+    so editing either one invalidates its expansions. At most
+    ``MAX_CACHED_OCCURRENCES`` occurrences are kept per reminder and range.
+    """
+    medication = reminder.medication
+    version = (reminder.updated_at, medication.updated_at)
+    occurrences = _cached_expansion(
+        reminder.id, version, reminder.scheduled_time, reminder.repeat,
+        medication.start_date, medication.end_date, *_day_bounds(start, end)
+    )
+    return occurrences[bisect_left(occurrences, start):bisect_right(occurrences, end)]
+
+
+def series_in_range(queryset, start: datetime, end: datetime):
+    """
+    Narrow a Reminder queryset to series that can have an occurrence in ``[start, end]``.
+    """
+    return queryset.filter(
+        Q(repeat='once', scheduled_time__gte=start, scheduled_time__lte=end)
+        | (
+            Q(repeat__in=list(PERIODS))
+            & (Q(medication__end_date__isnull=True) | Q(medication__end_date__gte=start.date()))
+            & Q(medication__start_date__lte=end.date())
+        )
+    )
+
+
+def due_series(now: datetime):
+    """
+    Repeating reminders whose next occurrence has come due.
+
+    The latest occurrence at or before ``now`` is later than ``now`` minus
+    the period, so series whose medication ended before that day can never
+    roll again and are left out.
+    """
+    condition = Q()
+    for repeat, period in PERIODS.items():
+        condition |= Q(repeat=repeat, scheduled_time__lte=now - period) & (
+            Q(medication__end_date__isnull=True)
+            | Q(medication__end_date__gte=timezone.localtime(now - period).date())
+        )
+    return Reminder.objects.filter(condition)
+
+
+def roll_forward(
+    now: Optional[datetime] = None,
+    ids: Optional[List[int]] = None,
+    partitions: Optional[Set[int]] = None
+) -> int:
+    """
+    Move repeating reminders whose next occurrence has come due onto that occurrence.
+
+    The row's ``scheduled_time`` becomes the latest occurrence at or before
+    ``now`` and it is reset to pending/not notified, so dispatch, ``pending``
+    and ``upcoming`` treat it like any other due reminder. An occurrence
+    left behind still pending is counted and logged as missed. Series past
+    the medication's end date are left alone.
+
+    Returns:
+        int: Number of reminders rolled forward
+    """
+    now = now or timezone.now()
+    queryset = due_series(now).select_related('medication')
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    if partitions is not None:
+        queryset = partition_filter(queryset, partitions)
+
+    rolled, moves = [], []
+    for reminder in queryset.iterator(chunk_size=500):
+        period = PERIODS[reminder.repeat]
+        _, upper = _series_bounds(None, reminder.medication.end_date)
+        occurrence = reminder.scheduled_time + math.floor((now - reminder.scheduled_time) / period) * period
+        if upper and occurrence > upper:
+            continue
+        moves.append((reminder.user_id, reminder.medication_id, reminder.scheduled_time, reminder.status, occurrence))
+        reminder.scheduled_time = occurrence
+        reminder.status = 'pending'
+        reminder.notified = False
+        reminder.updated_at = now
+        rolled.append(reminder)
+
+    if rolled:
+        with transaction.atomic():
+            Reminder.objects.bulk_update(
+                rolled, ['scheduled_time', 'status', 'notified', 'updated_at'], batch_size=500
+            )
+            adherence.record_rolled(moves)
+            events.log_transitions(
+                [
+                    (reminder.id, reminder.user_id, reminder.medication_id, old_time)
+                    for reminder, (_, _, old_time, old_status, _) in zip(rolled, moves)
+                    if old_status == 'pending'
+                ],
+                'missed', now
+            )
+        user_ids = {reminder.user_id for reminder in rolled}
+        transaction.on_commit(lambda: invalidate_users(user_ids))
+    return len(rolled)
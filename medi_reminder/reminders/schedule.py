@@ -0,0 +1,204 @@
+"""
+Reminder schedule generation from medication frequency.
+
+Parses the frequency vocabulary recognised by OCR extraction
+(``ai.ocr_service._extract_medications``): OD/BD/TDS/QDS, "N times/day",
+once/twice/thrice, "every N hours", times of day and meal timings. Each
+medication's treatment window is turned into one-off reminders in a
+single pass and written with ``bulk_create`` in one transaction. Generation
+is idempotent: doses that already have a reminder are not created again.
+"""
+
+import re
+from datetime import datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from medications.models import Medication
+from . import adherence
+from .cache import invalidate_users
+from .models import Reminder
+
+# Window length for medications without an end date
+OPEN_ENDED_DAYS = getattr(settings, 'REMINDER_SCHEDULE_DAYS', 30)
+
+# Time of the first dose of the day
+FIRST_DOSE = time(8, 0)
+
+SLOT_TIMES = {
+    'morning': time(8, 0),
+    'afternoon': time(14, 0),
+    'evening': time(18, 0),
+    'night': time(21, 0),
+    'breakfast': time(8, 0),
+    'lunch': time(13, 0),
+    'dinner': time(19, 0),
+}
+
+MEAL_OFFSET = timedelta(minutes=30)
+
+# Standard daily dose times for N doses a day
+DAILY_TIMES = {
+    1: (time(8, 0),),
+    2: (time(8, 0), time(20, 0)),
+    3: (time(8, 0), time(14, 0), time(20, 0)),
+    4: (time(8, 0), time(12, 0), time(16, 0), time(20, 0)),
+}
+
+ABBREVIATIONS = {'od': 1, 'bd': 2, 'bid': 2, 'tds': 3, 'tid': 3, 'qds': 4, 'qid': 4}
+WORD_COUNTS = {'once': 1, 'twice': 2, 'thrice': 3}
+
+TIMES_PER_DAY_RE = re.compile(r'\b(\d+)\s*(?:times?|x)\s*(?:per|/|a)?\s*day\b', re.IGNORECASE)
+EVERY_HOURS_RE = re.compile(r'\bevery\s+(\d+)\s*(?:hours?|hrs?|h)\b', re.IGNORECASE)
+ABBREVIATION_RE = re.compile(r'\b(OD|BD|BID|TDS|TID|QDS|QID)\b', re.IGNORECASE)
+WORD_COUNT_RE = re.compile(r'\b(once|twice|thrice)\b', re.IGNORECASE)
+SLOT_RE = re.compile(r'\b(morning|afternoon|evening|night)\b', re.IGNORECASE)
+MEAL_RE = re.compile(r'\b(before|after)\s*(meals?|food|breakfast|lunch|dinner)\b', re.IGNORECASE)
+
+
+class UnrecognizedFrequencyError(ValueError):
+    """Raised when a frequency string cannot be turned into dose times."""
+
+
+def _times_per_day(count: int) -> Tuple[time, ...]:
+    if count in DAILY_TIMES:
+        return DAILY_TIMES[count]
+    # More than four doses: spread evenly over the day from the first dose
+    step = timedelta(days=1) / count
+    start = datetime.combine(datetime.min.date(), FIRST_DOSE)
+    return tuple(sorted((start + i * step).time() for i in range(count)))
+
+
+def parse_frequency(frequency: str) -> Tuple[Tuple[time, ...], Optional[timedelta]]:
+    """
+    Parse a frequency string into daily dose times or a fixed interval.
+
+    Returns:
+        tuple: ``(times, interval)``; ``times`` are the times of day for
+        daily schedules, ``interval`` is set instead for "every N hours"
+
+    Raises:
+        UnrecognizedFrequencyError: If no known pattern matches
+    """
+    text = (frequency or '').strip()
+
+    match = EVERY_HOURS_RE.search(text)
+    if match:
+        hours = int(match.group(1))
+        if not 1 <= hours <= 168:
+            raise UnrecognizedFrequencyError(f"Unsupported interval: {text!r}")
+        return (), timedelta(hours=hours)
+
+    match = TIMES_PER_DAY_RE.search(text)
+    if match and 1 <= int(match.group(1)) <= 24:
+        return _times_per_day(int(match.group(1))), None
+
+    match = ABBREVIATION_RE.search(text)
+    if match:
+        return _times_per_day(ABBREVIATIONS[match.group(1).lower()]), None
+
+    # Named times of day / meals, e.g. "morning and night", "after breakfast"
+    slots = {SLOT_TIMES[slot.lower()] for slot in SLOT_RE.findall(text)}
+    for timing, meal in MEAL_RE.findall(text):
+        meal = meal.lower()
+        meal_times = (
+            [SLOT_TIMES['breakfast'], SLOT_TIMES['lunch'], SLOT_TIMES['dinner']]
+            if meal in ('meal', 'meals', 'food') else [SLOT_TIMES[meal]]
+        )
+        offset = -MEAL_OFFSET if timing.lower() == 'before' else MEAL_OFFSET
+        slots.update(
+            (datetime.combine(datetime.min.date(), meal_time) + offset).time() for meal_time in meal_times
+        )
+    if slots:
+        return tuple(sorted(slots)), None
+
+    match = WORD_COUNT_RE.search(text)
+    if match:
+        return _times_per_day(WORD_COUNTS[match.group(1).lower()]), None
+
+    raise UnrecognizedFrequencyError(f"Unrecognized frequency: {text!r}")
+
+
+def treatment_window(medication: Medication, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    Return the aware ``[start, end)`` datetimes covered by a medication.
+
+    Medications without an end date are covered for ``OPEN_ENDED_DAYS`` from
+    the later of their start date and today, so a long-running course keeps
+    getting reminders.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(medication.start_date, time.min), tz)
+    if medication.end_date:
+        end = timezone.make_aware(datetime.combine(medication.end_date, time.min), tz) + timedelta(days=1)
+    else:
+        today = timezone.make_aware(datetime.combine(timezone.localdate(now), time.min), tz)
+        end = max(start, today) + timedelta(days=OPEN_ENDED_DAYS)
+    return start, end
+
+
+def dose_times(medication: Medication, now: Optional[datetime] = None) -> List[datetime]:
+    """
+    Compute every dose time in the medication's treatment window from ``now`` on.
+    """
+    times, interval = parse_frequency(medication.frequency)
+    now = now or timezone.now()
+    start, end = treatment_window(medication, now)
+    tz = timezone.get_current_timezone()
+
+    if interval is not None:
+        first = timezone.make_aware(datetime.combine(medication.start_date, FIRST_DOSE), tz)
+        # Skip the doses already behind ``now``
+        skipped = max(0, (now - first) // interval)
+        count = max(0, -(-(end - first) // interval))
+        candidates = (first + i * interval for i in range(skipped, count))
+    else:
+        skipped = max(0, (timezone.localdate(now) - medication.start_date).days)
+        days = (end - start).days
+        candidates = (
+            timezone.make_aware(datetime.combine(medication.start_date + timedelta(days=day), dose), tz)
+            for day in range(skipped, days)
+            for dose in times
+        )
+    return [moment for moment in candidates if now <= moment < end]
+
+
+def generate_reminders(medication: Medication, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """
+    Create the medication's missing one-off reminders for its treatment window.
+
+    The medication row is locked for the duration, so concurrent calls
+    serialise and the second one finds every dose already scheduled.
+
+    Returns:
+        tuple: ``(created, existing)`` reminder counts
+
+    Raises:
+        UnrecognizedFrequencyError: If the frequency cannot be parsed
+    """
+    planned = dose_times(medication, now)
+    if not planned:
+        return 0, 0
+
+    with transaction.atomic():
+        list(Medication.objects.select_for_update().filter(id=medication.id).values_list('id', flat=True))
+        existing = set(
+            Reminder.objects.filter(
+                medication=medication,
+                scheduled_time__gte=planned[0],
+                scheduled_time__lte=planned[-1],
+            ).values_list('scheduled_time', flat=True)
+        )
+        missing = [
+            Reminder(user_id=medication.user_id, medication=medication, scheduled_time=moment, repeat='once')
+            for moment in planned if moment not in existing
+        ]
+        Reminder.objects.bulk_create(missing, batch_size=500)
+        adherence.record_created(missing)
+        if missing:
+            transaction.on_commit(lambda: invalidate_users([medication.user_id]))
+
+    return len(missing), len(planned) - len(missing)
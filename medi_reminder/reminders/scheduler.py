@@ -0,0 +1,328 @@
+"""
+In-memory scheduler for near-term reminders.
+
+Loads reminders due within the next few minutes into a hashed timing wheel
+holding only ``(reminder id, due tick)`` pairs, fires each one on its tick
+and refreshes incrementally from an ``updated_at`` watermark with a single
+query per refresh window. Repeating reminders are loaded for their next
+occurrence once their current one has been handled. Firing goes through ``dispatch_reminder_ids``,
+which re-checks every reminder against the database, so the table stays the
+source of truth and the periodic dispatch task remains a safety net.
+
+With a ``PartitionCoordinator`` the scheduler only loads the partitions its
+node holds leases for, and reloads whenever the coordinator rebalances.
+
+With a ``BurstStager`` the notifications of reminder bursts are rendered and
+staged a few minutes ahead, a chunk per tick, and released when they come due.
+"""
+
+import math
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .dispatch import dispatch_reminder_ids
+from .models import Reminder
+from .partitions import PARTITION_COUNT, PartitionCoordinator, partition_filter
+from .prestage import CHUNK_SIZE as STAGE_CHUNK_SIZE, BurstStager, burst_minutes
+from .recurrence import PERIODS, next_occurrence_at
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = getattr(settings, 'REMINDER_SCHEDULER_TICK', 0.1)
+HORIZON_MINUTES = getattr(settings, 'REMINDER_SCHEDULER_HORIZON_MINUTES', 10)
+REFRESH_SECONDS = getattr(settings, 'REMINDER_SCHEDULER_REFRESH_SECONDS', 30)
+
+# Re-read rows updated slightly before the watermark, in case a transaction
+# committed after a later one with an older updated_at
+WATERMARK_OVERLAP = timedelta(seconds=2)
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel of reminder ids.
+
+    Time is divided into ticks of ``tick`` seconds and the wheel has one slot
+    per tick over ``horizon`` seconds. Each slot is a plain list of ids and
+    ``entries`` maps an id to its absolute due tick, so scheduling, cancelling
+    and firing are O(1) per reminder.
+    """
+
+    def __init__(self, tick: float, horizon: float, start: float):
+        self.tick = tick
+        self.size = int(math.ceil(horizon / tick)) + 1
+        self.slots: List[List[int]] = [[] for _ in range(self.size)]
+        self.entries: Dict[int, int] = {}
+        self.current_tick = int(start / tick)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def schedule(self, reminder_id: int, due: float) -> bool:
+        """
+        Add or move a reminder; overdue ones land on the current tick.
+
+        Returns:
+            bool: False if the reminder is beyond the wheel's horizon
+        """
+        due_tick = max(int(math.ceil(due / self.tick)), self.current_tick)
+        if due_tick - self.current_tick >= self.size:
+            self.cancel(reminder_id)
+            return False
+
+        if self.entries.get(reminder_id) == due_tick:
+            return True
+        self.cancel(reminder_id)
+        self.slots[due_tick % self.size].append(reminder_id)
+        self.entries[reminder_id] = due_tick
+        return True
+
+    def cancel(self, reminder_id: int) -> None:
+        due_tick = self.entries.pop(reminder_id, None)
+        if due_tick is not None:
+            self.slots[due_tick % self.size].remove(reminder_id)
+
+    def advance(self, now: float) -> List[int]:
+        """
+        Move the wheel up to ``now`` and return the ids whose tick has passed.
+        """
+        now_tick = int(now / self.tick)
+        fired = []
+        # After a stall longer than the horizon every slot is due once
+        for due_tick in range(self.current_tick, min(now_tick + 1, self.current_tick + self.size)):
+            slot = self.slots[due_tick % self.size]
+            if not slot:
+                continue
+            remaining = []
+            for reminder_id in slot:
+                if self.entries.get(reminder_id, now_tick + 1) <= now_tick:
+                    del self.entries[reminder_id]
+                    fired.append(reminder_id)
+                else:
+                    remaining.append(reminder_id)
+            slot[:] = remaining
+        self.current_tick = max(self.current_tick, now_tick + 1)
+        return fired
+
+
+class ReminderScheduler:
+    """
+    Keeps the next ``horizon_minutes`` of reminders in a timing wheel and fires them on time.
+    """
+
+    def __init__(
+        self,
+        horizon_minutes: float = HORIZON_MINUTES,
+        refresh_seconds: float = REFRESH_SECONDS,
+        tick: float = TICK_SECONDS,
+        fire: Callable[[List[int]], object] = dispatch_reminder_ids,
+        base_queryset=None,
+        coordinator: Optional[PartitionCoordinator] = None,
+        stager: Optional[BurstStager] = None
+    ):
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.refresh_interval = refresh_seconds
+        self.fire_callback = fire
+        self.reminders = base_queryset if base_queryset is not None else Reminder.objects.all()
+        self.base_queryset = self.reminders
+        self.coordinator = coordinator
+        self.partitions: Optional[Set[int]] = None
+        self.stager = stager
+        self.to_stage: List[int] = []
+        self.wheel = TimingWheel(tick, self.horizon.total_seconds(), time.time())
+        self.watermark: Optional[datetime] = None
+        self.loaded_until: Optional[datetime] = None
+
+    def set_partitions(self, partitions: Set[int]) -> bool:
+        """
+        Restrict the scheduler to ``partitions``, reloading from scratch if they changed.
+
+        Returns:
+            bool: True if the partitions changed
+        """
+        if partitions == self.partitions:
+            return False
+        self.partitions = set(partitions)
+        count = self.coordinator.partition_count if self.coordinator is not None else PARTITION_COUNT
+        self.base_queryset = partition_filter(self.reminders, self.partitions, count)
+        if self.stager is not None:
+            self.stager.close()
+            self.to_stage = []
+        self.wheel = TimingWheel(self.wheel.tick, self.horizon.total_seconds(), time.time())
+        self.watermark = None
+        self.loaded_until = None
+        return True
+
+    def rebalance(self) -> bool:
+        """
+        Renew this node's leases and follow any change in the partitions it owns.
+
+        Returns:
+            bool: True if the owned partitions changed
+        """
+        return self.set_partitions(self.coordinator.rebalance())
+
+    def _schedulable(self, until: datetime) -> Q:
+        return Q(status='pending', notified=False, scheduled_time__lte=until)
+
+    def _recurring(self, until: datetime, after: Optional[datetime] = None) -> Q:
+        # Series whose next occurrence (one period on) may fall in the window
+        condition = Q()
+        for repeat, period in PERIODS.items():
+            window = Q(repeat=repeat, scheduled_time__lte=until - period)
+            if after is not None:
+                window &= Q(scheduled_time__gt=after - period)
+            condition |= window
+        return condition
+
+    def _due_time(self, scheduled_time, repeat, status, notified, start_date, end_date) -> Optional[datetime]:
+        if status == 'pending' and not notified:
+            return scheduled_time
+        if repeat in PERIODS:
+            return next_occurrence_at(scheduled_time, repeat, scheduled_time, start_date, end_date)
+        return None
+
+    def refresh(self, now: Optional[datetime] = None) -> int:
+        """
+        Apply changes since the watermark and load reminders newly inside the horizon.
+
+        The first call loads everything due within the horizon (including
+        overdue reminders); later calls read only rows updated since the
+        watermark plus rows whose time has just come inside the horizon.
+
+        Returns:
+            int: Number of rows read
+        """
+        now = now or timezone.now()
+        until = now + self.horizon
+
+        if self.watermark is None:
+            condition = self._schedulable(until) | self._recurring(until)
+        else:
+            condition = (
+                Q(updated_at__gte=self.watermark - WATERMARK_OVERLAP)
+                | (self._schedulable(until) & Q(scheduled_time__gt=self.loaded_until))
+                | self._recurring(until, after=self.loaded_until)
+            )
+
+        rows = self.base_queryset.filter(condition).values_list(
+            'id', 'scheduled_time', 'repeat', 'status', 'notified', 'updated_at',
+            'medication__start_date', 'medication__end_date'
+        )
+
+        count = 0
+        changed = []
+        staged = self.stager.staged if self.stager is not None else {}
+        for reminder_id, scheduled_time, repeat, status, notified, updated_at, start_date, end_date in rows.iterator():
+            count += 1
+            if self.watermark is None or updated_at > self.watermark:
+                self.watermark = updated_at
+            if reminder_id in staged:
+                if self.stager.is_current(reminder_id, updated_at):
+                    # Keep the staged release time
+                    continue
+                changed.append(reminder_id)
+            due = self._due_time(scheduled_time, repeat, status, notified, start_date, end_date)
+            if due is not None and due <= until:
+                self.wheel.schedule(reminder_id, due.timestamp())
+            else:
+                self.wheel.cancel(reminder_id)
+
+        if self.watermark is None:
+            self.watermark = now
+        self.loaded_until = until
+        if self.stager is not None:
+            self.stager.forget(changed)
+            self._plan_staging(now)
+        logger.debug(f"Scheduler refresh read {count} rows, {len(self.wheel)} reminders loaded")
+        return count
+
+    def _plan_staging(self, now: datetime) -> None:
+        # Bursts within the stager's lead time that are not staged yet
+        lead_until = now.timestamp() + self.stager.lead
+        upcoming = [
+            (reminder_id, due_tick * self.wheel.tick) for reminder_id, due_tick in self.wheel.entries.items()
+            if due_tick * self.wheel.tick <= lead_until and reminder_id not in self.stager.staged
+        ]
+        self.to_stage = burst_minutes(upcoming, self.stager.threshold)
+
+    def stage_next(self, limit: int = STAGE_CHUNK_SIZE) -> int:
+        """
+        Stage the next ``limit`` planned reminders and move them to their release time.
+
+        Returns:
+            int: Number of reminders staged
+        """
+        chunk = [reminder_id for reminder_id in self.to_stage[:limit] if reminder_id in self.wheel.entries]
+        del self.to_stage[:limit]
+        staged = self.stager.stage(chunk)
+        for reminder_id in staged:
+            self.wheel.schedule(reminder_id, self.stager.release_time(reminder_id))
+        return len(staged)
+
+    def fire_due(self, now: Optional[float] = None) -> List[int]:
+        """
+        Fire every reminder whose tick has passed; staged ones are released instead.
+        """
+        fired = self.wheel.advance(now if now is not None else time.time())
+        due = fired
+        if fired and self.stager is not None:
+            staged = {reminder_id for reminder_id in fired if reminder_id in self.stager.staged}
+            if staged:
+                self.stager.release(list(staged))
+                due = [reminder_id for reminder_id in fired if reminder_id not in staged]
+        if due:
+            self.fire_callback(due)
+        return fired
+
+    def run(self, should_stop: Callable[[], bool] = lambda: False) -> None:
+        """
+        Main loop: fire due reminders every tick and refresh every ``refresh_interval`` seconds.
+
+        With a coordinator, leases are renewed every third of the lease
+        period and released when the loop stops.
+        """
+        next_refresh = next_rebalance = 0.0
+        try:
+            while not should_stop():
+                current = time.time()
+                if self.coordinator is not None and current >= next_rebalance:
+                    try:
+                        if self.rebalance():
+                            next_refresh = 0.0
+                    except Exception as e:
+                        logger.error(f"Scheduler rebalance failed: {e}", exc_info=True)
+                    next_rebalance = current + self.coordinator.lease_seconds / 3
+
+                if current >= next_refresh:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logger.error(f"Scheduler refresh failed: {e}", exc_info=True)
+                    next_refresh = current + self.refresh_interval
+
+                try:
+                    self.fire_due()
+                except Exception as e:
+                    logger.error(f"Scheduler failed to fire reminders: {e}", exc_info=True)
+
+                if self.to_stage:
+                    try:
+                        self.stage_next()
+                    except Exception as e:
+                        logger.error(f"Scheduler failed to stage reminders: {e}", exc_info=True)
+                        self.to_stage = []
+
+                # Sleep to the start of the next tick
+                tick = self.wheel.tick
+                time.sleep(max(0.0, tick - (time.time() % tick)))
+        finally:
+            if self.stager is not None:
+                self.stager.close()
+            if self.coordinator is not None:
+                self.coordinator.close()
@@ -34,3 +34,49 @@ class ReminderSerializer(serializers.ModelSerializer):
         """
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class ReminderFilterSerializer(serializers.Serializer):
+    """
+    Selection of the current user's reminders for bulk operations.
+    """
+    medication = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Reminder._meta.get_field('status').choices, required=False)
+    repeat = serializers.ChoiceField(choices=Reminder._meta.get_field('repeat').choices, required=False)
+    scheduled_after = serializers.DateTimeField(required=False)
+    scheduled_before = serializers.DateTimeField(required=False)
+    
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('At least one filter is required.')
+        return attrs
+    
+    @staticmethod
+    def to_lookups(validated_data):
+        """
+        Translate a validated filter into queryset lookups.
+        """
+        names = {
+            'medication': 'medication_id',
+            'status': 'status',
+            'repeat': 'repeat',
+            'scheduled_after': 'scheduled_time__gte',
+            'scheduled_before': 'scheduled_time__lte',
+        }
+        return {names[key]: value for key, value in validated_data.items()}
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """
+    Request body for changing the status of many reminders at once.
+    
+    Reminders are selected either by ``ids`` or by ``filter``.
+    """
+    status = serializers.ChoiceField(choices=Reminder._meta.get_field('status').choices)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=1000)
+    filter = ReminderFilterSerializer(required=False)
+    
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('Provide either ids or filter.')
+        return attrs
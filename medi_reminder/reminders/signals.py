@@ -0,0 +1,97 @@
+"""
+Signals and signal handlers for the reminders app.
+
+Invalidate a user's cached reminder responses whenever one of their
+reminders or medications is saved or deleted. Invalidation runs after the
+transaction commits, so no node can rebuild the cache from the old rows
+under the new version.
+
+``reminders_transitioned`` is sent once per batch of status changes made
+with set-based updates (see ``reminders.transitions``), which bypass
+``post_save``.
+
+Reminders saved or deleted one at a time (API create/update, admin) update
+the adherence rollups and log status changes to the dose event log here;
+set-based writers do both themselves.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from medi_reminder import metrics
+from medications.models import Medication
+from . import adherence, events
+from .cache import invalidate_users
+from .models import Reminder
+
+# Sent after commit with status, reminders=[(reminder id, user id), ...] and changed_at
+reminders_transitioned = Signal()
+
+
+@receiver(post_save, sender=Reminder)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def invalidate_reminder_cache(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_users([user_id]))
+
+
+# Fields that decide which adherence count a reminder falls in
+ADHERENCE_FIELDS = ('user_id', 'medication_id', 'scheduled_time', 'status')
+
+
+@receiver(pre_save, sender=Reminder)
+def remember_adherence_counts(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._adherence_before = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'user', 'medication', 'scheduled_time', 'status'} & set(update_fields):
+        return
+    instance._adherence_before = (
+        Reminder.objects.filter(pk=instance.pk).values_list(*ADHERENCE_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Reminder)
+def update_adherence_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_adherence_before', None)
+    if created or before is None:
+        if created:
+            adherence.record_created([instance])
+        return
+    after = tuple(getattr(instance, field) for field in ADHERENCE_FIELDS)
+    if after != before:
+        adherence.record_changed(before, after)
+    if after[3] != before[3]:
+        events.log_transitions(
+            [(instance.pk, instance.user_id, instance.medication_id, instance.scheduled_time)],
+            instance.status, timezone.now()
+        )
+
+
+@receiver(pre_delete, sender=Reminder)
+def remember_deleted_counts(sender, instance, **kwargs):
+    # The instance may be stale; count what is actually stored
+    instance._adherence_before = (
+        Reminder.objects.filter(pk=instance.pk).values_list(*ADHERENCE_FIELDS).first()
+    )
+
+
+@receiver(post_delete, sender=Reminder)
+def remove_from_adherence_rollups(sender, instance, **kwargs):
+    before = getattr(instance, '_adherence_before', None)
+    if before is not None:
+        adherence.record_changed(before, None)
+
+
+@receiver(reminders_transitioned)
+def count_adherence(sender, status, reminders, **kwargs):
+    """
+    Keep per-status adherence counters, one increment per batch.
+    """
+    metrics.increment(f'reminders.adherence.{status}', len(reminders))
@@ -0,0 +1,222 @@
+"""
+Reminder load simulation for capacity planning.
+
+``seed_population`` creates synthetic patients, medications and one day of
+reminders. Dose times follow the usual shape of real schedules: most
+patients keep the standard round times for their frequency (08:00, 14:00,
+20:00, ...), the rest shift their whole day by up to an hour and a few
+minutes either way.
+
+``simulate`` then runs the real dispatch path (claim, render, outbox,
+relay) over that day in virtual time. The clock jumps straight to the next
+due reminder when idle and otherwise advances ``step`` seconds per tick, or
+by however long the tick's work took divided by ``workers`` when that is
+longer, so a dispatcher that cannot keep up falls behind just as it would
+in production. Notification channels should be local stand-ins such as
+``notifications.testing.NullChannel``.
+"""
+
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import List, Optional
+
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from medications.models import Medication
+from notifications.models import OutboxMessage
+from notifications.outbox import pending_count, relay
+from users.models import CustomUser
+from .delivery import DOSE_LANES
+from .dispatch import dispatch_due_reminders, due_reminders
+from .models import Reminder
+from .schedule import FIRST_DOSE, parse_frequency
+
+# Share of medications per frequency, and of patients per number of medications
+FREQUENCY_MIX = [('OD', 45), ('BD', 30), ('TDS', 15), ('QDS', 5), ('every 8 hours', 5)]
+MEDICATIONS_PER_PATIENT = [(1, 30), (2, 25), (3, 20), (4, 12), (5, 8), (6, 5)]
+
+# Share of patients keeping the standard dose times; the others shift their day
+ROUND_TIME_SHARE = 0.7
+HABIT_SHIFT_MINUTES = [-60, -30, 30, 60]
+OFFSET_MINUTES = [-15, -10, -5, 0, 0, 5, 10, 15]
+
+
+@dataclass
+class Population:
+    """
+    What ``seed_population`` created.
+    """
+    patients: int = 0
+    medications: int = 0
+    reminders: int = 0
+    peak_minute: int = 0  # most reminders due in a single minute
+
+
+@dataclass
+class SimulationReport:
+    """
+    Outcome of a simulated day.
+    """
+    dispatched: int = 0
+    sends: int = 0
+    queries: int = 0
+    ticks: int = 0
+    peak_backlog: int = 0
+    peak_outbox: int = 0
+    busy_seconds: float = 0.0
+    virtual_seconds: float = 0.0
+    real_seconds: float = 0.0
+    lags: List[float] = field(default_factory=list)
+
+    def percentile(self, p: float) -> float:
+        """
+        Send lag in seconds at percentile ``p`` (0-100).
+        """
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(math.ceil(p / 100 * len(ordered))) - 1)]
+
+    @property
+    def queries_per_reminder(self) -> float:
+        return self.queries / self.dispatched if self.dispatched else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Reminders dispatched and sent per second of work, for one worker."""
+        return self.dispatched / self.busy_seconds if self.busy_seconds else 0.0
+
+    def workers_needed(self, peak: int, target_lag: float) -> int:
+        """
+        Workers needed to get ``peak`` reminders due at once out within ``target_lag`` seconds.
+        """
+        if not self.throughput:
+            return 0
+        return max(1, math.ceil(peak / (self.throughput * target_lag)))
+
+
+def _choose(rng: random.Random, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _daily_times(frequency: str) -> List[dt_time]:
+    times, interval = parse_frequency(frequency)
+    if interval is None:
+        return list(times)
+    start = datetime.combine(date.min, FIRST_DOSE)
+    return [(start + i * interval).time() for i in range(int(timedelta(days=1) / interval))]
+
+
+def seed_population(patients: int, day: date, seed: Optional[int] = None, prefix: str = 'sim') -> Population:
+    """
+    Create ``patients`` synthetic users with medications and their reminders for ``day``.
+    """
+    rng = random.Random(seed)
+    tz = timezone.get_current_timezone()
+    run = f"{prefix}-{int(time.time())}"
+
+    users = CustomUser.objects.bulk_create(
+        [CustomUser(username=f'{run}-{i}', email=f'{run}-{i}@example.com') for i in range(patients)],
+        batch_size=1000,
+    )
+
+    medications, shifts = [], {}
+    for user in users:
+        keeps_round_times = rng.random() < ROUND_TIME_SHARE
+        shifts[user.id] = 0 if keeps_round_times else rng.choice(HABIT_SHIFT_MINUTES) + rng.choice(OFFSET_MINUTES)
+        for n in range(_choose(rng, MEDICATIONS_PER_PATIENT)):
+            medications.append(Medication(
+                user=user, name=f'Synthetic {n + 1}', dosage='1 tablet',
+                frequency=_choose(rng, FREQUENCY_MIX), start_date=day, end_date=day,
+            ))
+    medications = Medication.objects.bulk_create(medications, batch_size=1000)
+
+    midnight = timezone.make_aware(datetime.combine(day, dt_time.min), tz)
+    reminders = []
+    for medication in medications:
+        for dose in _daily_times(medication.frequency):
+            # Shifted doses wrap around midnight so every reminder falls on ``day``
+            minute = (dose.hour * 60 + dose.minute + shifts[medication.user_id]) % (24 * 60)
+            scheduled = midnight + timedelta(minutes=minute)
+            reminders.append(Reminder(user_id=medication.user_id, medication=medication, scheduled_time=scheduled))
+    Reminder.objects.bulk_create(reminders, batch_size=1000)
+
+    per_minute = Counter(reminder.scheduled_time.replace(second=0, microsecond=0) for reminder in reminders)
+    return Population(
+        patients=len(users),
+        medications=len(medications),
+        reminders=len(reminders),
+        peak_minute=max(per_minute.values(), default=0),
+    )
+
+
+def _next_due(after: datetime) -> Optional[datetime]:
+    return Reminder.objects.filter(
+        status='pending', notified=False, scheduled_time__gt=after
+    ).aggregate(next=Min('scheduled_time'))['next']
+
+
+def simulate(
+    start: datetime,
+    end: datetime,
+    step: float = 10.0,
+    workers: int = 1,
+    batch_size: int = 200
+) -> SimulationReport:
+    """
+    Dispatch every reminder due in ``[start, end)`` in virtual time and measure the run.
+
+    Each tick dispatches everything due, then relays until the outbox is
+    empty; every reminder in the tick counts as sent when the tick's work
+    (scaled by ``workers``) is done. Queries are counted for dispatch and
+    relay only, not for the simulation's own bookkeeping.
+    """
+    report = SimulationReport()
+    started, created_after = time.perf_counter(), timezone.now()
+    virtual = start
+
+    def counter(execute, sql, params, many, context):
+        report.queries += 1
+        return execute(sql, params, many, context)
+
+    while virtual < end:
+        due_times = list(due_reminders(virtual).values_list('scheduled_time', flat=True))
+        if not due_times:
+            upcoming = _next_due(virtual)
+            if upcoming is None or upcoming >= end:
+                break
+            # Jump to the first tick at or after the next due reminder
+            virtual += timedelta(seconds=math.ceil((upcoming - virtual).total_seconds() / step) * step)
+            continue
+
+        report.ticks += 1
+        report.peak_backlog = max(report.peak_backlog, len(due_times))
+        with connection.execute_wrapper(counter):
+            tick_started = time.perf_counter()
+            stats = dispatch_due_reminders(
+                now=virtual, batch_size=batch_size, max_batches=len(due_times) // batch_size + 1,
+                relay_now=False
+            )
+            # Sampled before relaying, when the tick's notifications are all queued
+            report.peak_outbox = max(report.peak_outbox, pending_count())
+            while relay(lanes=DOSE_LANES).claimed:
+                pass
+            busy = time.perf_counter() - tick_started
+        report.busy_seconds += busy
+        report.dispatched += stats.claimed
+
+        finished = virtual + timedelta(seconds=busy / workers)
+        report.lags.extend((finished - scheduled).total_seconds() for scheduled in due_times)
+        virtual = max(virtual + timedelta(seconds=step), finished)
+
+    report.virtual_seconds = (virtual - start).total_seconds()
+    report.real_seconds = time.perf_counter() - started
+    report.sends = OutboxMessage.objects.filter(status='sent', created_at__gte=created_after).count()
+    return report
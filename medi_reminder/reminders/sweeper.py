@@ -0,0 +1,113 @@
+"""
+Missed-reminder sweeper.
+
+Marks pending reminders that are overdue by more than a grace window as
+missed. Rows are walked in primary-key order and updated in bounded chunks,
+each a single set-based ``UPDATE`` in its own short transaction, so no lock
+is held for longer than one chunk and concurrent dispatch keeps running.
+Each chunk sends one ``reminders_transitioned`` signal.
+"""
+
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from medi_reminder import metrics
+from . import adherence, events
+from .models import Reminder
+from .transitions import send_transitioned
+
+logger = logging.getLogger(__name__)
+
+GRACE_MINUTES = getattr(settings, 'REMINDER_MISSED_GRACE_MINUTES', 60)
+CHUNK_SIZE = getattr(settings, 'REMINDER_SWEEP_CHUNK_SIZE', 1000)
+MAX_CHUNKS = getattr(settings, 'REMINDER_SWEEP_MAX_CHUNKS', 100)
+CHUNK_PAUSE = getattr(settings, 'REMINDER_SWEEP_CHUNK_PAUSE', 0.0)
+
+
+@dataclass
+class SweepStats:
+    """
+    Outcome of one sweep.
+    """
+    swept: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+
+
+def overdue_reminders(cutoff: datetime):
+    """
+    Pending reminders scheduled before ``cutoff``.
+    """
+    return Reminder.objects.filter(status='pending', scheduled_time__lt=cutoff)
+
+
+def sweep_missed_reminders(
+    now: Optional[datetime] = None,
+    grace: timedelta = timedelta(minutes=GRACE_MINUTES),
+    chunk_size: int = CHUNK_SIZE,
+    max_chunks: int = MAX_CHUNKS,
+    pause: float = CHUNK_PAUSE
+) -> SweepStats:
+    """
+    Mark reminders still pending ``grace`` after their time as missed.
+
+    Each chunk selects up to ``chunk_size`` ids past the last one seen and
+    updates them with one statement that re-checks the pending condition,
+    so a reminder completed in the meantime is left alone.
+
+    Returns:
+        SweepStats: Rows marked missed, chunks run and time taken
+    """
+    now = now or timezone.now()
+    cutoff = now - grace
+    candidates = overdue_reminders(cutoff).order_by('id').values_list('id', flat=True)
+
+    stats = SweepStats()
+    started = time.perf_counter()
+    last_id = 0
+    while stats.chunks < max_chunks:
+        ids = list(candidates.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+
+        with transaction.atomic():
+            # Lock the chunk so the rows reported below are exactly the ones changed
+            rows = list(
+                overdue_reminders(cutoff).filter(id__in=ids).select_for_update().values_list(
+                    'id', 'user_id', 'medication_id', 'scheduled_time'
+                )
+            )
+            swept = [(reminder_id, user_id) for reminder_id, user_id, _, _ in rows]
+            # update() bypasses auto_now, so updated_at is set explicitly
+            Reminder.objects.filter(id__in=[reminder_id for reminder_id, _ in swept]).update(
+                status='missed', updated_at=now
+            )
+            adherence.record_transitions(
+                [(user_id, medication_id, scheduled, 'pending') for _, user_id, medication_id, scheduled in rows],
+                'missed'
+            )
+            events.log_transitions(rows, 'missed', now)
+            send_transitioned('missed', swept, now)
+        stats.swept += len(swept)
+        stats.chunks += 1
+        last_id = ids[-1]
+
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    stats.elapsed = time.perf_counter() - started
+    if stats.swept:
+        metrics.increment('reminders.sweep.missed', stats.swept)
+        logger.info(
+            f"Marked {stats.swept} reminders missed in {stats.chunks} chunks ({stats.elapsed:.2f}s)"
+        )
+    return stats
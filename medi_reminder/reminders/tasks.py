@@ -0,0 +1,48 @@
+"""
+Celery tasks for the reminders app.
+"""
+
+from celery import shared_task
+from django.db import DatabaseError
+
+from .catchup import catch_up, needs_catch_up
+from .dispatch import dispatch_due_reminders
+from .events import write_events
+from .sweeper import sweep_missed_reminders
+
+
+@shared_task
+def dispatch_reminders():
+    """
+    Periodic task: send notifications for reminders that are due.
+
+    Switches to catch-up mode while the dispatcher is behind, e.g. after an outage.
+    """
+    if needs_catch_up():
+        stats = catch_up()
+        return {
+            'mode': 'catch-up', 'dispatched': stats.dispatched, 'expired': stats.expired,
+            'backlog': stats.backlog[-1] if stats.backlog else 0,
+        }
+    stats = dispatch_due_reminders()
+    return {'claimed': stats.claimed, 'delivered': stats.delivered, 'rate': round(stats.rate, 2)}
+
+
+@shared_task
+def sweep_missed_reminders_task():
+    """
+    Periodic task: mark reminders left pending past the grace window as missed.
+    """
+    stats = sweep_missed_reminders()
+    return {'swept': stats.swept, 'chunks': stats.chunks, 'elapsed': round(stats.elapsed, 3)}
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, retry_backoff_max=600, max_retries=8)
+def write_dose_events(event_type, occurred_at, events):
+    """
+    Append a batch of dose events queued after a status change committed.
+
+    The batch is inserted in one transaction, so a retry after a database
+    error cannot write any event twice.
+    """
+    return {'written': write_events(event_type, occurred_at, events)}
@@ -1,3 +1,1195 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medi_reminder.testing import QueryBudgetTestCase
+from medications.models import Medication, Prescription
+from users.models import CustomUser
+from notifications.models import OutboxMessage
+from notifications.testing import NullChannel
+from . import adherence, cache as reminder_cache, catchup, delivery, dispatch, events, ics, recurrence, simulation
+from .dispatch import dispatch_due_reminders, due_reminders
+from .models import AdherenceRollup, CalendarFeed, DoseEvent, PartitionLease, Reminder
+from .partitions import DatabaseLeaseStore, LocalLeaseStore, PartitionCoordinator
+from .prestage import BurstStager, burst_minutes
+from .recurrence import roll_forward
+from .scheduler import ReminderScheduler, TimingWheel
+from .schedule import OPEN_ENDED_DAYS, UnrecognizedFrequencyError, generate_reminders, parse_frequency
+from .sweeper import overdue_reminders, sweep_missed_reminders
+from .tasks import write_dose_events
+from .transitions import transition_reminders
+from .viewsets import ReminderViewSet
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class HotQueryPlanTests(TestCase):
+    """
+    The hot read paths must be served by the index built for them.
+
+    Plans come from ``EXPLAIN`` on SQLite and PostgreSQL. Every user-scoped
+    query could also use the plain ``user_id`` foreign key index, so the
+    plan must name the expected index, and list orderings must come from
+    the index rather than a separate sort. The tables are tiny here, so on
+    PostgreSQL sequential scans are discouraged for the test; the planner
+    still picks one when no index fits.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='plans', email='plans@example.com', password='x')
+        medication = Medication.objects.create(
+            user=cls.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        for repeat in ('once', 'daily'):
+            Reminder.objects.create(
+                user=cls.user, medication=medication, repeat=repeat, scheduled_time=timezone.now() + timedelta(hours=1)
+            )
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'No plan checks for {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def view_plans(self, action, table='reminders_reminder'):
+        """
+        Plans of the queries a ReminderViewSet action runs against ``table``.
+        """
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = ReminderViewSet.as_view({'get': action})(request)
+        self.assertEqual(response.status_code, 200)
+        return [
+            self.explain(query['sql']) for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+        ]
+
+    def assertNoSequentialScan(self, plan, table):
+        if connection.vendor == 'sqlite':
+            # "SCAN <table>" without "USING ... INDEX" reads every row
+            scans = [
+                line for line in plan.splitlines()
+                if f'SCAN {table}' in line and 'INDEX' not in line
+            ]
+        else:
+            scans = [line for line in plan.splitlines() if f'Seq Scan on {table}' in line]
+        self.assertFalse(scans, f'Sequential scan on {table}:\n{plan}')
+
+    def assertUsesIndex(self, plan, table, *indexes):
+        """
+        Assert the plan reads ``table`` only through one of ``indexes``.
+        """
+        self.assertNoSequentialScan(plan, table)
+        self.assertTrue(any(index in plan for index in indexes), f'Expected one of {indexes}:\n{plan}')
+
+    def assertNoSort(self, plan):
+        sort = 'USE TEMP B-TREE' if connection.vendor == 'sqlite' else 'Sort Key'
+        self.assertNotIn(sort, plan, f'Ordering needs a sort step:\n{plan}')
+
+    def test_reminder_list(self):
+        plan = Reminder.objects.filter(user=self.user).order_by('-created_at').explain()
+        self.assertUsesIndex(plan, 'reminders_reminder', 'reminder_user_created_idx')
+        self.assertNoSort(plan)
+
+    def test_upcoming_reminders(self):
+        upcoming, repeating = self.view_plans('upcoming')
+        self.assertUsesIndex(upcoming, 'reminders_reminder', 'reminder_user_status_time_idx')
+        self.assertNoSort(upcoming)
+        # Repeating series of the user, minus the ones already upcoming
+        self.assertUsesIndex(
+            repeating, 'reminders_reminder', 'reminder_user_created_idx', 'reminder_user_status_time_idx'
+        )
+        self.assertNoSort(repeating)
+
+    def test_agenda_series_in_range(self):
+        (plan,) = self.view_plans('agenda')
+        self.assertUsesIndex(plan, 'reminders_reminder', 'reminder_user_created_idx', 'reminder_user_status_time_idx')
+
+    def test_pending_reminders(self):
+        (plan,) = self.view_plans('pending')
+        self.assertUsesIndex(plan, 'reminders_reminder', 'reminder_user_created_idx', 'reminder_user_status_time_idx')
+
+    def test_due_reminders(self):
+        self.assertUsesIndex(due_reminders(timezone.now()).explain(), 'reminders_reminder', 'reminder_pending_time_idx')
+
+    def test_overdue_reminders(self):
+        self.assertUsesIndex(
+            overdue_reminders(timezone.now()).explain(), 'reminders_reminder', 'reminder_pending_time_idx'
+        )
+
+    def test_medication_list(self):
+        plan = Medication.objects.filter(user=self.user).order_by('-created_at').explain()
+        self.assertUsesIndex(plan, 'medications_medication', 'medication_user_created_idx')
+        self.assertNoSort(plan)
+
+    def test_active_medications(self):
+        # The null-or-later end date is a per-row filter; the list order comes from the index
+        plan = Medication.objects.filter(user=self.user).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=date.today())
+        ).order_by('-created_at').explain()
+        self.assertUsesIndex(plan, 'medications_medication', 'medication_user_created_idx')
+        self.assertNoSort(plan)
+
+    def test_prescription_list(self):
+        plan = Prescription.objects.filter(user=self.user).order_by('-created_at').explain()
+        self.assertUsesIndex(plan, 'medications_prescription', 'prescription_user_created_idx')
+        self.assertNoSort(plan)
+
+
+class ReminderQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='x')
+
+    def grow(self, rows):
+        # A medication per reminder, half of them repeating daily
+        for _ in range(rows):
+            medication = Medication.objects.create(
+                user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+            )
+            for repeat in ('once', 'daily'):
+                Reminder.objects.create(
+                    user=self.user, medication=medication, repeat=repeat,
+                    scheduled_time=timezone.now() + timedelta(hours=1)
+                )
+
+    def test_list(self):
+        # Page count and page
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+    def test_retrieve(self):
+        self.grow(1)
+        reminder = Reminder.objects.filter(user=self.user).first()
+        self.assertQueryBudget(
+            ReminderViewSet.as_view({'get': 'retrieve'}), 1, lambda rows: None, self.user, pk=reminder.pk
+        )
+
+    def test_upcoming(self):
+        # Due in the next 24 hours, and repeating series
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'upcoming'}), 2, self.grow, self.user)
+
+    def test_pending(self):
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'pending'}), 1, self.grow, self.user)
+
+    def test_agenda(self):
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'agenda'}), 1, self.grow, self.user)
+
+    def test_adherence(self):
+        # Rollups for the last week
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'adherence'}), 3, self.grow, self.user)
+
+    def test_history(self):
+        def grow(rows):
+            self.grow(rows)
+            with mock.patch.object(events, 'ASYNC', False), self.captureOnCommitCallbacks(execute=True):
+                transition_reminders(self.user, 'done', queryset=Reminder.objects.filter(status='pending'))
+
+        self.assertQueryBudget(ReminderViewSet.as_view({'get': 'history'}), 1, grow, self.user)
+
+
+class AdherenceRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='adherence', email='adherence@example.com', password='x')
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today() - timedelta(days=3)
+        )
+        now = timezone.now()
+        self.reminders = [
+            Reminder.objects.create(user=self.user, medication=self.medication, scheduled_time=now - timedelta(hours=hours))
+            for hours in (1, 26, 50, 74)
+        ]
+
+    def rollups(self):
+        # Rows emptied by moves are left in place; rebuild doesn't write them
+        return sorted(
+            AdherenceRollup.objects.exclude(done=0, missed=0, pending=0)
+            .values_list('medication_id', 'day', 'done', 'missed', 'pending')
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        adherence.rebuild()
+        self.assertEqual(incremental, self.rollups())
+
+    def test_transitions_match_rebuild(self):
+        transition_reminders(self.user, 'done', ids=[self.reminders[0].id, self.reminders[1].id])
+        transition_reminders(self.user, 'missed', ids=[self.reminders[1].id])
+        sweep_missed_reminders()
+        reminder = self.reminders[0]
+        reminder.refresh_from_db()
+        reminder.scheduled_time -= timedelta(days=1)
+        reminder.save()
+        self.reminders[3].delete()
+        self.assertMatchesRebuild()
+
+        totals = adherence.summary(self.user, date.today() - timedelta(days=7), date.today())
+        self.assertEqual((totals['done'], totals['missed'], totals['pending']), (1, 2, 0))
+
+    def test_rolled_occurrence_is_kept(self):
+        reminder = self.reminders[3]
+        Reminder.objects.filter(id=reminder.id).update(repeat='daily')
+        transition_reminders(self.user, 'done', ids=[reminder.id])
+        roll_forward(ids=[reminder.id])
+
+        totals = adherence.summary(self.user, date.today() - timedelta(days=7), date.today())
+        # The done occurrence three days ago plus the current pending one
+        self.assertEqual((totals['done'], totals['pending']), (1, 4))
+
+    def test_rebuild_keeps_past_occurrences_of_repeating_series(self):
+        reminder = self.reminders[3]
+        Reminder.objects.filter(id=reminder.id).update(repeat='daily')
+        transition_reminders(self.user, 'done', ids=[reminder.id])
+        roll_forward(ids=[reminder.id])
+        # Added behind the rollups' back, after the series' current occurrence
+        later = timezone.now() + timedelta(days=2)
+        Reminder.objects.bulk_create([Reminder(user=self.user, medication=self.medication, scheduled_time=later)])
+
+        past = [row for row in self.rollups() if row[1] < date.today() - timedelta(days=1)]
+        adherence.rebuild()
+        self.assertEqual(past, [row for row in self.rollups() if row[1] < date.today() - timedelta(days=1)])
+
+        totals = adherence.summary(self.user, date.today() - timedelta(days=7), date.today() + timedelta(days=7))
+        self.assertEqual((totals['done'], totals['pending']), (1, 5))
+
+
+@mock.patch.object(events, 'ASYNC', False)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class DoseEventTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='events', email='events@example.com', password='x')
+        medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        self.scheduled = timezone.now() - timedelta(minutes=30)
+        self.reminder = Reminder.objects.create(user=self.user, medication=medication, scheduled_time=self.scheduled)
+
+    def test_status_changes_are_appended(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_reminders(self.user, 'done', ids=[self.reminder.id], now=self.scheduled + timedelta(minutes=12))
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_reminders(self.user, 'pending', ids=[self.reminder.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_reminders(self.user, 'done', ids=[self.reminder.id])
+
+        history = events.history(self.user, self.scheduled, timezone.now() + timedelta(minutes=1))
+        self.assertEqual(
+            [event.event_type for event in history], [DoseEvent.TAKEN, DoseEvent.REOPENED, DoseEvent.TAKEN]
+        )
+        self.assertEqual(history[0].latency, 12 * 60)
+
+    def test_event_log_outlives_reminder(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_reminders(self.user, 'missed', ids=[self.reminder.id])
+        self.reminder.delete()
+
+        summary = events.latency_summary(self.scheduled, timezone.now() + timedelta(minutes=1), self.user)
+        self.assertEqual([(row['event_type'], row['count']) for row in summary], [('Missed', 1)])
+
+    def test_rolled_pending_occurrence_is_logged_missed(self):
+        Reminder.objects.filter(id=self.reminder.id).update(repeat='daily')
+        now = self.scheduled + timedelta(days=1, minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            roll_forward(now, ids=[self.reminder.id])
+        # Rolled again from a done occurrence: nothing more to log
+        transition_reminders(self.user, 'done', ids=[self.reminder.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            roll_forward(now + timedelta(days=1), ids=[self.reminder.id])
+
+        missed = DoseEvent.objects.filter(event_type=DoseEvent.MISSED)
+        self.assertEqual([(event.reminder_id, event.latency) for event in missed], [(self.reminder.id, 24 * 3600 + 300)])
+
+    def test_write_is_retried_after_database_error(self):
+        event = [self.reminder.id, self.user.id, self.reminder.medication_id, 60]
+        with mock.patch('reminders.tasks.write_events', side_effect=[DatabaseError('locked'), 1]) as write:
+            result = write_dose_events.apply((DoseEvent.TAKEN, timezone.now().isoformat(), [event])).get()
+        self.assertEqual(result, {'written': 1})
+        self.assertEqual(write.call_count, 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class DispatchTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        # One user per reminder, so nothing is coalesced
+        self.reminders = []
+        for i in range(5):
+            user = CustomUser.objects.create_user(username=f'dispatch{i}', email=f'dispatch{i}@example.com', password='x')
+            medication = Medication.objects.create(
+                user=user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+            )
+            self.reminders.append(Reminder.objects.create(
+                user=user, medication=medication, scheduled_time=self.now - timedelta(minutes=i)
+            ))
+        self.ids = [reminder.id for reminder in self.reminders]
+
+    def dispatch(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return dispatch.dispatch_due_reminders(self.now, relay_now=False, **kwargs)
+
+    def test_dispatches_in_batches(self):
+        stats = self.dispatch(batch_size=2)
+        self.assertEqual((stats.batches, stats.claimed, stats.delivered, stats.failed), (3, 5, 5, 0))
+        self.assertEqual(Reminder.objects.filter(notified=True).count(), 5)
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_max_batches_leaves_the_rest_for_the_next_run(self):
+        self.assertEqual(self.dispatch(batch_size=2, max_batches=1).claimed, 2)
+        self.assertEqual(self.dispatch(batch_size=2).claimed, 3)
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_two_dispatchers_never_claim_the_same_row(self):
+        # Both read the same candidates; the second runs after the first committed
+        candidates = Reminder.objects.filter(id__in=self.ids)
+        self.assertEqual(dispatch._dispatch_batch_sqlite(candidates, 10), (5, 5))
+        self.assertEqual(dispatch._dispatch_batch_sqlite(candidates, 10), (0, 0))
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_failed_enqueue_leaves_reminders_dispatchable(self):
+        with mock.patch.object(dispatch, 'enqueue_reminders', side_effect=RuntimeError('outbox unavailable')):
+            with self.assertRaises(RuntimeError):
+                self.dispatch()
+        self.assertFalse(Reminder.objects.filter(notified=True).exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        self.assertEqual(self.dispatch().delivered, 5)
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+
+class TimingWheelTests(SimpleTestCase):
+
+    def setUp(self):
+        # Ticks of 1s over 10s: 11 slots, starting at tick 100
+        self.wheel = TimingWheel(1.0, 10.0, 100.0)
+
+    def test_schedule_and_cancel(self):
+        self.assertTrue(self.wheel.schedule(1, 103.0))
+        self.assertFalse(self.wheel.schedule(2, 150.0))
+        self.assertEqual(len(self.wheel), 1)
+        self.wheel.cancel(1)
+        self.wheel.cancel(1)
+        self.assertEqual(len(self.wheel), 0)
+        self.assertEqual(self.wheel.advance(110.0), [])
+
+    def test_reschedule_moves_the_reminder(self):
+        self.wheel.schedule(1, 103.0)
+        self.wheel.schedule(1, 106.0)
+        self.assertEqual(self.wheel.advance(105.0), [])
+        self.assertEqual(self.wheel.advance(106.0), [1])
+
+    def test_advance_across_slots(self):
+        self.wheel.schedule(1, 101.5)  # rounds up to tick 102
+        self.wheel.schedule(2, 105.0)
+        self.wheel.schedule(3, 90.0)  # overdue: the current tick
+        self.assertEqual(self.wheel.advance(100.0), [3])
+        self.assertEqual(self.wheel.advance(101.9), [])
+        self.assertEqual(self.wheel.advance(102.0), [1])
+        self.assertEqual(self.wheel.advance(106.0), [2])
+
+    def test_wrap_around(self):
+        self.wheel.advance(108.0)
+        # Tick 115 shares slot 5 with tick 104, which has already passed
+        self.assertTrue(self.wheel.schedule(1, 115.0))
+        self.assertEqual(self.wheel.advance(114.0), [])
+        self.assertEqual(self.wheel.advance(115.0), [1])
+
+    def test_stall_past_the_horizon_fires_everything_once(self):
+        for reminder_id, due in enumerate((101.0, 105.0, 110.0)):
+            self.wheel.schedule(reminder_id, due)
+        self.assertEqual(sorted(self.wheel.advance(1000.0)), [0, 1, 2])
+        self.assertEqual(self.wheel.advance(1001.0), [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class ReminderSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='wheel', email='wheel@example.com', password='x')
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        self.now = timezone.now()
+        self.fired = []
+        self.scheduler = ReminderScheduler(horizon_minutes=10, tick=1.0, fire=self.fired.extend)
+
+    def add(self, minutes):
+        return Reminder.objects.create(
+            user=self.user, medication=self.medication, scheduled_time=self.now + timedelta(minutes=minutes)
+        )
+
+    def due_tick(self, reminder):
+        return self.scheduler.wheel.entries.get(reminder.id)
+
+    def test_loads_the_horizon_and_fires_on_time(self):
+        soon, later = self.add(2), self.add(60)
+        self.scheduler.refresh(self.now)
+        self.assertEqual(set(self.scheduler.wheel.entries), {soon.id})
+
+        self.assertEqual(self.scheduler.fire_due(self.now.timestamp()), [])
+        self.scheduler.fire_due((self.now + timedelta(minutes=2, seconds=1)).timestamp())
+        self.assertEqual(self.fired, [soon.id])
+
+    def test_refresh_loads_reminders_entering_the_horizon(self):
+        reminder = self.add(15)
+        self.scheduler.refresh(self.now)
+        self.assertIsNone(self.due_tick(reminder))
+        later = self.now + timedelta(minutes=6)
+        self.scheduler.fire_due(later.timestamp())
+        self.scheduler.refresh(later)
+        self.assertIsNotNone(self.due_tick(reminder))
+
+    def test_refresh_picks_up_edits(self):
+        moved, done, pushed_out = self.add(2), self.add(3), self.add(4)
+        self.scheduler.refresh(self.now)
+        before = self.due_tick(moved)
+
+        moved.scheduled_time += timedelta(minutes=3)
+        moved.save()
+        Reminder.objects.filter(id=done.id).update(status='done', updated_at=timezone.now())
+        Reminder.objects.filter(id=pushed_out.id).update(
+            scheduled_time=self.now + timedelta(hours=2), updated_at=timezone.now()
+        )
+        self.scheduler.refresh(self.now)
+
+        self.assertEqual(self.due_tick(moved), before + 180)
+        self.assertIsNone(self.due_tick(done))
+        self.assertIsNone(self.due_tick(pushed_out))
+
+    def test_watermark_overlap_rereads_late_commits(self):
+        reminder = self.add(2)
+        self.scheduler.refresh(self.now)
+        # Committed after the last refresh, but stamped just before its watermark
+        Reminder.objects.filter(id=reminder.id).update(
+            status='done', updated_at=self.scheduler.watermark - timedelta(seconds=1)
+        )
+        self.scheduler.refresh(self.now)
+        self.assertIsNone(self.due_tick(reminder))
+
+    def test_deleted_reminder_is_not_sent(self):
+        # Deletes leave no row for the watermark to see; firing re-checks the database
+        reminder = self.add(0)
+        scheduler = ReminderScheduler(horizon_minutes=10, tick=1.0)
+        scheduler.refresh(self.now)
+        reminder_id = reminder.id
+        reminder.delete()
+        with mock.patch('reminders.dispatch.relay'):
+            self.assertEqual(scheduler.fire_due((self.now + timedelta(seconds=1)).timestamp()), [reminder_id])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+@mock.patch.object(events, 'ASYNC', False)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class BulkStatusTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='bulk', email='bulk@example.com', password='x')
+        self.other = CustomUser.objects.create_user(username='bulk2', email='bulk2@example.com', password='x')
+        self.now = timezone.now()
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        self.view = ReminderViewSet.as_view({'post': 'bulk_status'})
+
+    def add(self, user=None, hours=-1, status='pending'):
+        user = user or self.user
+        medication = self.medication if user == self.user else Medication.objects.create(
+            user=user, name='Ibuprofen', dosage='200mg', frequency='OD', start_date=date.today()
+        )
+        return Reminder.objects.create(
+            user=user, medication=medication, status=status, scheduled_time=self.now + timedelta(hours=hours)
+        )
+
+    def post(self, data):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.view(request)
+
+    def test_ids_report_an_outcome_each(self):
+        pending, done, foreign = self.add(), self.add(status='done'), self.add(user=self.other)
+        missing = foreign.id + 100
+
+        response = self.post({'status': 'done', 'ids': [pending.id, done.id, foreign.id, missing]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'], {
+            str(pending.id): 'updated', str(done.id): 'unchanged',
+            str(foreign.id): 'not_found', str(missing): 'not_found',
+        })
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'pending')
+
+    def test_filter_selects_own_reminders(self):
+        past, future, foreign = self.add(hours=-2), self.add(hours=2), self.add(user=self.other, hours=-2)
+
+        response = self.post({'status': 'missed', 'filter': {'status': 'pending', 'scheduled_before': self.now.isoformat()}})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], {str(past.id): 'updated'})
+        statuses = dict(Reminder.objects.values_list('id', 'status'))
+        self.assertEqual(
+            (statuses[past.id], statuses[future.id], statuses[foreign.id]), ('missed', 'pending', 'pending')
+        )
+
+    def test_needs_exactly_one_of_ids_and_filter(self):
+        reminder = self.add()
+        for data in (
+            {'status': 'done'},
+            {'status': 'done', 'ids': [reminder.id], 'filter': {'status': 'pending'}},
+            {'status': 'done', 'filter': {}},
+            {'status': 'done', 'ids': []},
+            {'status': 'later', 'ids': [reminder.id]},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.post(data).status_code, 400)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'pending')
+
+    def test_one_update_whatever_the_batch_size(self):
+        counts = []
+        for size in (2, 10):
+            ids = [self.add().id for _ in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post({'status': 'done', 'ids': ids})
+            self.assertEqual(response.data['updated'], size)
+            updates = [query for query in queries if query['sql'].startswith('UPDATE "reminders_reminder"')]
+            self.assertEqual(len(updates), 1)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1], f'Query count grows with the batch: {counts}')
+
+
+@mock.patch.object(events, 'ASYNC', False)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReminderCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='cached', email='cached@example.com', password='x')
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        self.reminder = Reminder.objects.create(
+            user=self.user, medication=self.medication, scheduled_time=timezone.now() + timedelta(hours=1)
+        )
+
+    def get(self, name):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        return ReminderViewSet.as_view({'get': name})(request).data
+
+    def version(self):
+        return cache.get(reminder_cache._version_key(self.user.id))
+
+    def assertBumps(self, change):
+        self.get('pending')
+        before = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertIsNotNone(before)
+        self.assertNotEqual(self.version(), before)
+
+    def test_transition_rebuilds_pending(self):
+        self.assertEqual([item['id'] for item in self.get('pending')], [self.reminder.id])
+        self.assertBumps(lambda: transition_reminders(self.user, 'done', ids=[self.reminder.id]))
+        self.assertEqual(self.get('pending'), [])
+
+    def test_medication_edit_rebuilds_pending(self):
+        def rename():
+            self.medication.name = 'Aspirin EC'
+            self.medication.save()
+
+        self.assertBumps(rename)
+        self.assertEqual(self.get('pending')[0]['medication_details']['name'], 'Aspirin EC')
+
+    def test_reminder_save_rebuilds_upcoming(self):
+        self.get('upcoming')
+        later = timezone.now() + timedelta(hours=2)
+
+        def reschedule():
+            self.reminder.scheduled_time = later
+            self.reminder.save()
+
+        self.assertBumps(reschedule)
+        self.assertEqual(self.get('upcoming')[0]['scheduled_time'], later.isoformat().replace('+00:00', 'Z'))
+
+    def test_upcoming_follows_the_clock_without_writes(self):
+        start = reminder_cache.time_bucket()
+        entering = Reminder.objects.create(
+            user=self.user, medication=self.medication,
+            scheduled_time=start + timedelta(hours=24, seconds=reminder_cache.CACHE_TTL // 2)
+        )
+        with mock.patch('django.utils.timezone.now', return_value=start):
+            self.assertNotIn(entering.id, [item['id'] for item in self.get('upcoming')])
+        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(seconds=reminder_cache.CACHE_TTL)):
+            self.assertIn(entering.id, [item['id'] for item in self.get('upcoming')])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DeliveryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='digest', email='digest@example.com', password='x')
+        self.other = CustomUser.objects.create_user(username='digest2', email='digest2@example.com', password='x')
+        self.start = timezone.now().replace(second=0, microsecond=0)
+
+    def add(self, minutes=0, user=None, time_critical=False, name='Aspirin'):
+        user = user or self.user
+        medication = Medication.objects.create(
+            user=user, name=name, dosage='75mg', frequency='OD', start_date=date.today(), time_critical=time_critical
+        )
+        return Reminder.objects.create(
+            user=user, medication=medication, scheduled_time=self.start + timedelta(minutes=minutes)
+        )
+
+    def test_groups_span_the_window_from_their_first_dose(self):
+        window = timedelta(minutes=15)
+        first, edge, past_edge = self.add(0), self.add(15), self.add(16)
+        chained = self.add(29)
+
+        groups = delivery.coalesce([chained, past_edge, edge, first], window)
+
+        self.assertEqual(groups, [[first, edge], [past_edge, chained]])
+
+    def test_groups_are_per_user(self):
+        mine, theirs = self.add(0), self.add(0, user=self.other)
+        groups = delivery.coalesce([mine, theirs], timedelta(minutes=15))
+        self.assertEqual(sorted(groups, key=lambda group: group[0].user_id), [[mine], [theirs]])
+
+    def test_zero_window_turns_coalescing_off(self):
+        doses = [self.add(0), self.add(0), self.add(1)]
+        self.assertEqual(delivery.coalesce(doses, timedelta(0)), [[dose] for dose in doses])
+
+    def test_digest_lists_every_dose(self):
+        doses = [self.add(0, name='Aspirin'), self.add(5, name='Metformin')]
+
+        digest = delivery.render_digest(doses, 'email')
+
+        self.assertEqual(digest.subject, 'Medication reminder: 2 doses')
+        self.assertIn('Aspirin (75mg)', digest.body)
+        self.assertIn('Metformin (75mg)', digest.body)
+        self.assertEqual([item['reminder'] for item in digest.data['reminders']], [dose.id for dose in doses])
+        self.assertEqual(digest.lane, 'standard')
+
+        single = delivery.render_digest(doses[:1], 'email')
+        self.assertEqual(single.data, {'reminder': doses[0].id, 'medication': doses[0].medication_id})
+
+    def test_digest_takes_the_critical_lane_if_any_dose_is_time_critical(self):
+        doses = [self.add(0), self.add(1, time_critical=True), self.add(2)]
+        self.assertEqual(delivery.render_digest(doses, 'email').lane, 'critical')
+        self.assertEqual(delivery.render_digest(doses[::2], 'email').lane, 'standard')
+
+    def test_stats_report_the_drop_in_sends_per_dose(self):
+        doses = [self.add(0, name=f'Medication {index}') for index in range(6)]
+
+        delivery.render_reminders(doses, ['email'], timedelta(0))
+        self.assertEqual(delivery.delivery_stats(), {'doses': 6, 'messages': 6, 'sends_per_dose': 1.0})
+
+        cache.clear()
+        rendered = delivery.render_reminders(doses, ['email'], timedelta(minutes=15))
+        self.assertEqual(len(rendered), 1)
+        self.assertEqual(delivery.delivery_stats(), {'doses': 6, 'messages': 1, 'sends_per_dose': 0.167})
+
+
+class CalendarFeedTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='feed', email='feed@example.com', password='x')
+        self.feed = CalendarFeed.objects.create(user=self.user)
+        self.now = timezone.now()
+
+    def add(self, days=1, repeat='once', end_date=None):
+        medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD',
+            start_date=date.today() - timedelta(days=60), end_date=end_date
+        )
+        return Reminder.objects.create(
+            user=self.user, medication=medication, repeat=repeat, scheduled_time=self.now + timedelta(days=days)
+        )
+
+    def get(self, token=None, **headers):
+        return self.client.get(reverse('reminder_calendar_feed', args=[token or self.feed.token]), **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_matching_validators_get_304(self):
+        self.add()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('BEGIN:VCALENDAR', self.body(response))
+
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        stale = http_date((self.now - timedelta(days=1)).timestamp())
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=stale).status_code, 200)
+
+    def test_etag_changes_when_a_reminder_is_deleted(self):
+        self.add()
+        reminder = self.add(days=2)
+        etag = self.get()['ETag']
+
+        reminder.delete()
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_the_token_rotates(self):
+        self.add()
+        old_token, etag = self.feed.token, self.get()['ETag']
+
+        self.feed.rotate()
+
+        self.assertEqual(self.get(old_token).status_code, 404)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_repeating_reminders_carry_an_rrule(self):
+        end_date = date.today() + timedelta(days=14)
+        daily = self.add(repeat='daily', end_date=end_date)
+        weekly = self.add(repeat='weekly')
+
+        body = self.body(self.get()).replace('\r\n ', '')
+        events = {block.split('\r\n')[1]: block for block in body.split('BEGIN:VEVENT')[1:]}
+
+        until = timezone.make_aware(datetime.combine(end_date, time.max), timezone.get_current_timezone())
+        daily_event, weekly_event = (events[f'UID:reminder-{r.id}@medi-reminder'] for r in (daily, weekly))
+        self.assertIn(f"RRULE:FREQ=DAILY;UNTIL={ics._format_datetime(until)}\r\n", daily_event)
+        self.assertIn('RRULE:FREQ=WEEKLY\r\n', weekly_event)
+
+    def test_window_leaves_out_old_one_off_reminders(self):
+        before = -(ics.PAST_DAYS + 10)
+        old = self.add(days=before)
+        recent = self.add(days=-10)
+        series = self.add(days=before, repeat='daily')
+        ended = self.add(days=before, repeat='daily', end_date=date.today() - timedelta(days=ics.PAST_DAYS + 5))
+
+        body = b''.join(ics.iter_calendar(self.user)).decode()
+
+        for reminder, included in ((old, False), (recent, True), (series, True), (ended, False)):
+            with self.subTest(reminder=reminder.id):
+                self.assertEqual(f'UID:reminder-{reminder.id}@medi-reminder' in body, included)
+
+
+class FoldTests(SimpleTestCase):
+
+    def test_line_of_exactly_75_octets_is_not_folded(self):
+        line = 'SUMMARY:' + 'a' * 67
+        self.assertEqual(ics._fold(line), line + '\r\n')
+
+    def test_long_multibyte_lines_fold_on_character_boundaries(self):
+        for line in ('SUMMARY:' + 'a' * 68, 'SUMMARY:' + 'é' * 80, 'DESCRIPTION:' + 'x' + '💊' * 40):
+            with self.subTest(line=line):
+                folded = ics._fold(line)
+                physical = folded[:-2].split('\r\n')
+                self.assertGreater(len(physical), 1)
+                for part in physical:
+                    self.assertLessEqual(len(part.encode('utf-8')), 75)
+                self.assertTrue(all(part.startswith(' ') for part in physical[1:]))
+                self.assertEqual(folded[:-2].replace('\r\n ', ''), line)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class RollForwardTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='roll', email='roll@example.com', password='x')
+        self.now = timezone.now()
+
+    def series(self, end_date):
+        medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency='OD',
+            start_date=date.today() - timedelta(days=10), end_date=end_date
+        )
+        return Reminder.objects.create(
+            user=self.user, medication=medication, repeat='daily', scheduled_time=self.now - timedelta(days=10)
+        )
+
+    def test_ended_series_is_not_selected_again(self):
+        ended = self.series(date.today() - timedelta(days=3))
+        running = self.series(None)
+
+        self.assertEqual(recurrence.roll_forward(self.now), 1)
+        self.assertEqual(list(recurrence.due_series(self.now + timedelta(days=1))), [running])
+        ended.refresh_from_db()
+        self.assertEqual(ended.scheduled_time, self.now - timedelta(days=10))
+
+    def test_series_ending_today_still_rolls(self):
+        reminder = self.series(date.today())
+        self.assertEqual(recurrence.roll_forward(self.now), 1)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.scheduled_time, self.now)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class AgendaTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='agenda', email='agenda@example.com', password='x')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        for name, dosage, offset in (('Aspirin', '75mg', 0), ('Metformin', '500mg', 30)):
+            medication = Medication.objects.create(
+                user=self.user, name=name, dosage=dosage, frequency='OD', start_date=date.today()
+            )
+            Reminder.objects.create(
+                user=self.user, medication=medication, repeat='daily',
+                scheduled_time=self.start + timedelta(minutes=offset)
+            )
+
+    def agenda(self, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        return ReminderViewSet.as_view({'get': 'agenda'})(request).data
+
+    def test_occurrences_keep_their_series(self):
+        data = self.agenda(start=self.start.isoformat(), end=(self.start + timedelta(days=2, hours=1)).isoformat())
+        labels = [(item['medication_name'], item['dosage'], item['scheduled_time']) for item in data['occurrences']]
+        self.assertEqual(labels, [
+            (name, dosage, self.start + timedelta(days=day, minutes=offset))
+            for day in range(3) for name, dosage, offset in (('Aspirin', '75mg', 0), ('Metformin', '500mg', 30))
+        ])
+
+    def test_expansions_are_shared_within_a_day(self):
+        recurrence._cached_expansion.cache_clear()
+        reminder = Reminder.objects.select_related('medication').filter(user=self.user).first()
+        noon = timezone.localtime(self.start).replace(hour=12, minute=0, second=0) + timedelta(days=1)
+        for minutes in (0, 1):
+            start = noon + timedelta(minutes=minutes)
+            occurrences = recurrence.expand_occurrences(reminder, start, start + timedelta(days=7))
+            self.assertTrue(all(start <= occurrence <= start + timedelta(days=7) for occurrence in occurrences))
+        self.assertEqual(recurrence._cached_expansion.cache_info().hits, 1)
+
+
+class ParseFrequencyTests(SimpleTestCase):
+
+    def test_daily_patterns(self):
+        cases = {
+            'OD': (time(8, 0),),
+            '1-0-1 BD': (time(8, 0), time(20, 0)),
+            '3 times/day': (time(8, 0), time(14, 0), time(20, 0)),
+            'twice a day': (time(8, 0), time(20, 0)),
+            'morning and night': (time(8, 0), time(21, 0)),
+            'after breakfast': (time(8, 30),),
+            'before meals': (time(7, 30), time(12, 30), time(18, 30)),
+        }
+        for frequency, times in cases.items():
+            with self.subTest(frequency=frequency):
+                self.assertEqual(parse_frequency(frequency), (times, None))
+
+    def test_interval(self):
+        self.assertEqual(parse_frequency('every 6 hours'), ((), timedelta(hours=6)))
+
+    def test_unrecognized(self):
+        for frequency in ('as needed', 'every 0 hours', ''):
+            with self.subTest(frequency=frequency), self.assertRaises(UnrecognizedFrequencyError):
+                parse_frequency(frequency)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class GenerateRemindersTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='schedule', email='schedule@example.com', password='x')
+
+    def medication(self, frequency='BD', start_date=None, end_date=None):
+        return Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='75mg', frequency=frequency,
+            start_date=start_date or date.today(), end_date=end_date,
+        )
+
+    def test_generation_is_idempotent(self):
+        medication = self.medication(end_date=date.today() + timedelta(days=4))
+        created, existing = generate_reminders(medication)
+        self.assertGreater(created, 0)
+        self.assertEqual(generate_reminders(medication), (0, created))
+        self.assertEqual(Reminder.objects.filter(medication=medication).count(), created)
+
+    def test_old_open_ended_medication_keeps_getting_reminders(self):
+        medication = self.medication(frequency='OD', start_date=date.today() - timedelta(days=OPEN_ENDED_DAYS * 3))
+        created, _ = generate_reminders(medication)
+        self.assertIn(created, (OPEN_ENDED_DAYS - 1, OPEN_ENDED_DAYS))
+        self.assertFalse(Reminder.objects.filter(medication=medication, scheduled_time__lt=timezone.now()).exists())
+
+    def test_interval_schedule_starts_from_now(self):
+        medication = self.medication(frequency='every 8 hours', start_date=date.today() - timedelta(days=60))
+        created, _ = generate_reminders(medication)
+        self.assertIn(created, range(OPEN_ENDED_DAYS * 3 - 3, OPEN_ENDED_DAYS * 3 + 1))
+
+
+class PartitionCoordinatorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.store = LocalLeaseStore(clock=lambda: self.now)
+
+    def node(self, name):
+        return PartitionCoordinator(node_id=name, store=self.store, partitions=8, lease_seconds=30)
+
+    def test_survivor_takes_over_after_dead_node_lease_expires(self):
+        a, b = self.node('a'), self.node('b')
+        for node in (a, b, a, b):
+            node.rebalance()
+        self.assertEqual((a.owned, b.owned), ({0, 2, 4, 6}, {1, 3, 5, 7}))
+
+        # b stops heartbeating; its leases hold until they expire
+        self.now += 20
+        self.assertEqual(a.rebalance(), {0, 2, 4, 6})
+        self.now += 15
+        self.assertEqual(a.rebalance(), set(range(8)))
+        self.assertEqual(set(self.store.owners().values()), {'a'})
+
+    def test_joining_node_gets_its_share(self):
+        a = self.node('a')
+        self.assertEqual(a.rebalance(), set(range(8)))
+
+        b = self.node('b')
+        # a still holds b's share until it rebalances and releases it
+        self.assertEqual(b.rebalance(), set())
+        self.assertEqual(a.rebalance(), {0, 2, 4, 6})
+        self.assertEqual(b.rebalance(), {1, 3, 5, 7})
+        self.assertEqual(len(self.store.owners()), 8)
+
+    def test_close_hands_partitions_over_immediately(self):
+        a, b = self.node('a'), self.node('b')
+        for node in (a, b, a, b):
+            node.rebalance()
+        b.close()
+        self.assertEqual(a.rebalance(), set(range(8)))
+
+
+class DatabaseLeaseStoreTests(TestCase):
+
+    def setUp(self):
+        self.store = DatabaseLeaseStore()
+
+    def test_live_foreign_lease_is_refused(self):
+        self.assertTrue(self.store.acquire(3, 'a', 30))
+        self.assertFalse(self.store.acquire(3, 'b', 30))
+        # Renewing its own lease succeeds
+        self.assertTrue(self.store.acquire(3, 'a', 30))
+        self.assertEqual(self.store.owners(), {3: 'a'})
+
+    def test_expired_lease_can_be_taken(self):
+        PartitionLease.objects.create(partition=3, owner='a', expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(self.store.acquire(3, 'b', 30))
+        self.assertEqual(self.store.owners(), {3: 'b'})
+
+    def test_release_only_drops_own_lease(self):
+        self.store.acquire(3, 'a', 30)
+        self.store.release(3, 'b')
+        self.assertEqual(self.store.owners(), {3: 'a'})
+        self.store.release(3, 'a')
+        self.assertEqual(self.store.owners(), {})
+
+
+@mock.patch.object(events, 'ASYNC', False)
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catchup'}},
+    NOTIFICATION_CHANNELS={'email': {'BACKEND': 'notifications.testing.NullChannel'}},
+)
+class CatchUpTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.users = [
+            CustomUser.objects.create_user(username=f'catchup{i}', email=f'catchup{i}@example.com', password='x')
+            for i in range(2)
+        ]
+        channel = NullChannel('email')
+        patcher = mock.patch('notifications.outbox.get_channel', lambda name: channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, user, minutes_ago, count=1):
+        medication = Medication.objects.create(
+            user=user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today() - timedelta(days=1)
+        )
+        Reminder.objects.bulk_create(
+            Reminder(user=user, medication=medication, scheduled_time=self.now - timedelta(minutes=minutes_ago, seconds=i % 30))
+            for i in range(count)
+        )
+
+    def test_fresh_burst_is_left_to_normal_dispatch(self):
+        self.add(self.users[0], 1, count=1500)
+        self.assertFalse(catchup.needs_catch_up(self.now))
+        self.add(self.users[1], catchup.LAG_MINUTES + 1)
+        self.assertTrue(catchup.needs_catch_up(self.now))
+
+    def test_stale_reminders_expire_into_one_summary_per_user(self):
+        self.add(self.users[0], catchup.STALE_MINUTES + 5, count=3)
+        self.add(self.users[1], catchup.STALE_MINUTES + 60)
+        self.add(self.users[1], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = catchup.catch_up(self.now)
+
+        self.assertEqual((stats.dispatched, stats.expired, stats.summaries), (1, 4, 2))
+        self.assertEqual(stats.backlog[-1], 0)
+        self.assertEqual(Reminder.objects.filter(status='missed', notified=True).count(), 4)
+        summaries = OutboxMessage.objects.filter(lane='digest')
+        self.assertEqual(sorted(summaries.values_list('recipient', flat=True)), [user.email for user in self.users])
+        self.assertEqual(DoseEvent.objects.filter(event_type=DoseEvent.MISSED).count(), 4)
+        totals = adherence.summary(self.users[0], date.today() - timedelta(days=1), date.today())
+        self.assertEqual((totals['missed'], totals['pending']), (3, 0))
+
+    def test_overlapping_runs_do_not_stack(self):
+        self.add(self.users[0], catchup.STALE_MINUTES + 5)
+        cache.add(catchup._lock_key(None), True)
+        self.assertEqual(catchup.catch_up(self.now).batches, 0)
+        cache.delete(catchup._lock_key(None))
+        self.assertEqual(catchup.catch_up(self.now).expired, 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    NOTIFICATION_CHANNELS={'email': {'BACKEND': 'notifications.testing.NullChannel'}},
+)
+class BurstStagerTests(TestCase):
+
+    def setUp(self):
+        self.at = (timezone.now() - timedelta(minutes=1)).replace(second=0, microsecond=0)
+        self.users = [
+            CustomUser.objects.create_user(username=f'burst{i}', email=f'burst{i}@example.com', password='x')
+            for i in range(2)
+        ]
+        # Two doses for the first user, coalesced into one digest, one for the second
+        self.reminders = [self.add(self.users[0]), self.add(self.users[0]), self.add(self.users[1])]
+        self.ids = [reminder.id for reminder in self.reminders]
+        self.stager = BurstStager(channels=['email'])
+        channel = NullChannel('email')
+        patcher = mock.patch('notifications.outbox.get_channel', lambda name: channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, user):
+        medication = Medication.objects.create(
+            user=user, name='Aspirin', dosage='75mg', frequency='OD', start_date=date.today()
+        )
+        return Reminder.objects.create(user=user, medication=medication, scheduled_time=self.at)
+
+    def statuses(self):
+        return sorted(OutboxMessage.objects.values_list('status', flat=True))
+
+    def test_burst_minutes(self):
+        start = self.at.timestamp()
+        due_times = [(1, start), (2, start + 30), (3, start + 59), (4, start + 60)]
+        self.assertEqual(burst_minutes(due_times, threshold=3), [1, 2, 3])
+
+    def test_stage(self):
+        self.assertEqual(sorted(self.stager.stage(self.ids)), sorted(self.ids))
+        self.assertEqual(self.statuses(), ['staged', 'staged'])
+        self.assertEqual(self.stager.staged[self.ids[0]].keys, self.stager.staged[self.ids[1]].keys)
+        self.assertFalse(Reminder.objects.filter(notified=True).exists())
+
+    def test_release(self):
+        self.stager.stage(self.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.stager.release(self.ids, relay=False), (3, 2))
+        self.assertEqual(self.statuses(), ['pending', 'pending'])
+        self.assertEqual(Reminder.objects.filter(notified=True).count(), 3)
+        self.assertEqual(len(self.stager), 0)
+
+    def test_changed_reminder_unstages_its_digest(self):
+        self.stager.stage(self.ids)
+        changed = self.reminders[0]
+        changed.scheduled_time += timedelta(minutes=30)
+        changed.save()
+        changed.refresh_from_db()
+
+        self.assertFalse(self.stager.is_current(changed.id, changed.updated_at))
+        self.stager.forget([changed.id])
+        self.assertEqual(set(self.stager.staged), {self.ids[2]})
+        self.assertEqual(self.statuses(), ['staged'])
+
+    def test_partially_claimed_digest_is_rendered_again(self):
+        self.stager.stage(self.ids)
+        Reminder.objects.filter(id=self.ids[0]).update(status='done')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.stager.release(self.ids, relay=False), (2, 1))
+        messages = OutboxMessage.objects.order_by('recipient')
+        self.assertEqual([(m.recipient, m.status) for m in messages], [
+            ('burst0@example.com', 'pending'), ('burst1@example.com', 'pending')
+        ])
+        self.assertEqual(messages[0].data, {'reminder': self.ids[1], 'medication': self.reminders[1].medication_id})
+
+    def test_normal_dispatch_releases_staged_message(self):
+        self.stager.stage(self.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = dispatch_due_reminders(self.at + timedelta(minutes=1))
+        self.assertEqual(stats.delivered, 3)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertFalse(OutboxMessage.objects.filter(status='staged').exists())
+
+        # The stager finds them claimed and discards nothing that was sent
+        self.assertEqual(self.stager.release(self.ids, relay=False), (0, 0))
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+
+class SimulationReportTests(SimpleTestCase):
+
+    def test_percentile(self):
+        report = simulation.SimulationReport(lags=[float(lag) for lag in range(1, 101)])
+        self.assertEqual((report.percentile(50), report.percentile(99), report.percentile(100)), (50.0, 99.0, 100.0))
+        self.assertEqual(simulation.SimulationReport().percentile(99), 0.0)
+
+    def test_workers_needed(self):
+        report = simulation.SimulationReport(dispatched=500, busy_seconds=5.0)
+        # 100 reminders/sec per worker: 1000 due at once within 2s needs 5
+        self.assertEqual(report.workers_needed(1000, 2.0), 5)
+        self.assertEqual(report.workers_needed(10, 60.0), 1)
+        self.assertEqual(simulation.SimulationReport().workers_needed(1000, 2.0), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class SimulationTests(TestCase):
+
+    def setUp(self):
+        channel = NullChannel('email')
+        patcher = mock.patch('notifications.outbox.get_channel', lambda name: channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_seeded_day(self):
+        day = date.today() + timedelta(days=1)
+        population = simulation.seed_population(20, day, seed=7)
+        self.assertEqual(population.patients, 20)
+        self.assertEqual(population.reminders, Reminder.objects.count())
+        self.assertEqual(population.medications, Medication.objects.count())
+
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        report = simulation.simulate(start, start + timedelta(days=1), step=60)
+
+        self.assertEqual(report.dispatched, population.reminders)
+        self.assertEqual(len(report.lags), population.reminders)
+        self.assertFalse(Reminder.objects.filter(scheduled_time__lt=start + timedelta(days=1), notified=False).exists())
+        # Coalescing means no more sends than doses, and the outbox was sampled before relaying
+        self.assertGreater(report.sends, 0)
+        self.assertLessEqual(report.sends, report.dispatched)
+        self.assertGreater(report.peak_outbox, 0)
+        self.assertLessEqual(report.percentile(50), report.percentile(99))
+        self.assertGreaterEqual(report.percentile(50), 0)
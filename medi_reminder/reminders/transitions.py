@@ -0,0 +1,93 @@
+"""
+Set-based reminder status transitions.
+
+All status changes made on behalf of users go through
+``transition_reminders``: ownership is checked with one query, the change
+is applied with one UPDATE, and ``reminders_transitioned`` is sent once per
+batch after commit so downstream hooks (adherence counters, caches) work on
+the whole batch instead of row by row. Adherence rollups are updated in the
+same transaction as the change, and the change is appended to the dose
+event log once it commits.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import adherence, events
+from .cache import invalidate_users
+from .models import Reminder
+from .signals import reminders_transitioned
+
+STATUSES = [choice for choice, _ in Reminder._meta.get_field('status').choices]
+
+# Per-id outcomes
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+
+
+def send_transitioned(status: str, rows: Iterable[Tuple[int, int]], changed_at: datetime) -> None:
+    """
+    Invalidate caches and send ``reminders_transitioned`` for ``(reminder id, user id)`` rows after commit.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    def notify():
+        invalidate_users({user_id for _, user_id in rows})
+        reminders_transitioned.send(sender=Reminder, status=status, reminders=rows, changed_at=changed_at)
+
+    transaction.on_commit(notify)
+
+
+def transition_reminders(
+    user,
+    status: str,
+    ids: Optional[List[int]] = None,
+    queryset=None,
+    now: Optional[datetime] = None
+) -> Dict[int, str]:
+    """
+    Move the user's reminders to ``status``.
+
+    Exactly one of ``ids`` or ``queryset`` selects the reminders; either way
+    only the user's own rows are touched.
+
+    Returns:
+        dict: Outcome per reminder id: ``updated``, ``unchanged`` (already
+        in ``status``) or ``not_found`` (missing or owned by someone else)
+    """
+    if status not in STATUSES:
+        raise ValueError(f"Invalid status: {status!r}")
+
+    now = now or timezone.now()
+    selected = Reminder.objects.filter(user=user)
+    selected = selected.filter(id__in=ids) if ids is not None else selected & queryset
+
+    with transaction.atomic():
+        rows = {
+            reminder_id: (user.id, medication_id, scheduled_time, old)
+            for reminder_id, medication_id, scheduled_time, old in selected.select_for_update().values_list(
+                'id', 'medication_id', 'scheduled_time', 'status'
+            )
+        }
+        current = {reminder_id: row[3] for reminder_id, row in rows.items()}
+        to_update = [reminder_id for reminder_id, old in current.items() if old != status]
+        if to_update:
+            # update() bypasses auto_now, so updated_at is set explicitly
+            Reminder.objects.filter(id__in=to_update).update(status=status, updated_at=now)
+            adherence.record_transitions([rows[reminder_id] for reminder_id in to_update], status)
+            events.log_transitions(
+                [(reminder_id, user.id, rows[reminder_id][1], rows[reminder_id][2]) for reminder_id in to_update],
+                status, now
+            )
+            send_transitioned(status, [(reminder_id, user.id) for reminder_id in to_update], now)
+
+    outcomes = {reminder_id: NOT_FOUND for reminder_id in ids or []}
+    outcomes.update((reminder_id, UNCHANGED) for reminder_id in current)
+    outcomes.update((reminder_id, UPDATED) for reminder_id in to_update)
+    return outcomes
@@ -24,4 +24,5 @@ urlpatterns = [
     path('reminder/<int:reminder_id>/', views.ReminderDetailView.as_view(), name='reminder_detail'),
     path('schedule/<int:schedule_id>/', views.ReminderScheduleView.as_view(), name='reminder_schedule'),
     path('notifications/', views.reminder_notifications, name='reminder_notifications'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='reminder_calendar_feed'),
 ]
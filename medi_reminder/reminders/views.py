@@ -6,13 +6,17 @@ including reminder creation, scheduling, and notification management.
 """
 
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from .models import Reminder
+from .ics import feed_validators, iter_calendar
+from .models import CalendarFeed, Reminder
 import json
 
 
@@ -102,4 +106,29 @@ def reminder_notifications(request):
     Returns notification history for the current user.
     """
     # Implementation for reminder notifications
-    return JsonResponse({'notifications': []})
\ No newline at end of file
+    return JsonResponse({'notifications': []})
+
+
+@require_GET
+def calendar_feed(request, token):
+    """
+    View for a user's iCalendar reminder feed.
+    
+    Authenticated by the secret token in the URL, since calendar apps cannot
+    log in. Polls that send a matching If-None-Match / If-Modified-Since get
+    304 without any event being rendered; otherwise the feed is streamed.
+    """
+    feed = get_object_or_404(CalendarFeed.objects.select_related('user'), token=token)
+    etag, last_modified = feed_validators(feed.user, feed.token)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = StreamingHttpResponse(iter_calendar(feed.user), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="reminders.ics"'
+    
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(response, private=True, max_age=300)
+    return response
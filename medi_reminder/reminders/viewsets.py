@@ -11,9 +11,38 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
-from .models import Reminder
-from .serializers import ReminderSerializer
+from itertools import islice
+import heapq
+from . import adherence, events
+from .cache import get_or_build, time_bucket
+from .models import CalendarFeed, DoseEvent, Reminder
+from .recurrence import PERIODS, expand_occurrences, next_occurrence, series_in_range
+from .serializers import BulkStatusSerializer, ReminderFilterSerializer, ReminderSerializer
+from .transitions import NOT_FOUND, UPDATED, transition_reminders
+
+# Agenda range and size limits
+AGENDA_DEFAULT_DAYS = 7
+AGENDA_MAX_DAYS = 366
+AGENDA_DEFAULT_LIMIT = 500
+AGENDA_MAX_LIMIT = 5000
+
+# Adherence range limits, in days
+ADHERENCE_DEFAULT_DAYS = 7
+ADHERENCE_MAX_DAYS = 366
+
+# Dose history range and size limits
+HISTORY_DEFAULT_DAYS = 7
+HISTORY_MAX_EVENTS = 1000
+
+# Columns the agenda reads; expand_occurrences keys its cache on both updated_at
+AGENDA_FIELDS = [
+    'id', 'medication_id', 'scheduled_time', 'repeat', 'status', 'updated_at',
+    'medication__name', 'medication__dosage', 'medication__start_date',
+    'medication__end_date', 'medication__updated_at',
+]
 
 
 class ReminderViewSet(viewsets.ModelViewSet):
@@ -34,8 +63,11 @@ class ReminderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         Filter reminders by current user.
+        
+        Joins the user and the medication (with its user) that
+        ReminderSerializer reads, so lists run a fixed number of queries.
         """
-        return Reminder.objects.filter(user=self.request.user)
+        return Reminder.objects.filter(user=self.request.user).select_related('user', 'medication__user')
     
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
@@ -43,19 +75,197 @@ class ReminderViewSet(viewsets.ModelViewSet):
         Get upcoming reminders for the next 24 hours.
         
         GET /api/reminders/upcoming/
+        
+        Cached per user and time bucket; see reminders.cache.
         """
-        now = timezone.now()
+        now = time_bucket()
+        name = f"upcoming:{int(now.timestamp())}"
+        return Response(get_or_build(request.user.id, name, lambda: self._upcoming_data(request, now)))
+    
+    def _upcoming_data(self, request, now):
         next_24h = now + timedelta(hours=24)
         
+        # Both lists are merged and sorted below; ordering by time lets the
+        # (user, status, scheduled_time) index return rows already in order
         upcoming_reminders = Reminder.objects.filter(
             user=request.user,
             status='pending',
             scheduled_time__gte=now,
             scheduled_time__lte=next_24h
-        ).select_related('medication')
+        ).select_related('user', 'medication__user').order_by('scheduled_time')
+        
+        # Repeating reminders are due again at their next occurrence,
+        # whatever the status of the current one
+        repeating = Reminder.objects.filter(
+            user=request.user,
+            repeat__in=list(PERIODS)
+        ).exclude(id__in=upcoming_reminders.values('id')).select_related('user', 'medication__user').order_by()
+        
+        due = [(reminder.scheduled_time, reminder) for reminder in upcoming_reminders]
+        for reminder in repeating:
+            occurrence = next_occurrence(reminder, now)
+            if occurrence is not None and occurrence <= next_24h:
+                due.append((occurrence, reminder))
+        due.sort(key=lambda item: item[0])
+        
+        data = list(self.get_serializer([reminder for _, reminder in due], many=True).data)
+        for item, (occurrence, _) in zip(data, due):
+            item['next_occurrence'] = occurrence
+        return data
+    
+    @staticmethod
+    def _occurrence_stream(reminder, start, end):
+        # A function scope binds each stream to its own reminder
+        return ((occurrence, reminder.id, reminder) for occurrence in expand_occurrences(reminder, start, end))
+    
+    @action(detail=False, methods=['get'])
+    def agenda(self, request):
+        """
+        Get every reminder occurrence in a date range, repeating ones expanded.
+        
+        GET /api/reminders/agenda/?start=<iso datetime>&end=<iso datetime>&limit=<n>
+        
+        Defaults to the next 7 days; the range is capped at a year. Occurrences
+        are merged lazily in time order, so only ``limit`` of them are built.
+        """
+        try:
+            start = self._parse_agenda_time(request.query_params.get('start'), timezone.now())
+            end = self._parse_agenda_time(
+                request.query_params.get('end'), start + timedelta(days=AGENDA_DEFAULT_DAYS)
+            )
+            limit = min(int(request.query_params.get('limit', AGENDA_DEFAULT_LIMIT)), AGENDA_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'start and end must be ISO 8601 datetimes and limit an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end < start or limit < 1:
+            return Response({'error': 'Invalid agenda range'}, status=status.HTTP_400_BAD_REQUEST)
+        if end - start > timedelta(days=AGENDA_MAX_DAYS):
+            return Response(
+                {'error': f'Agenda range cannot exceed {AGENDA_MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        reminders = series_in_range(
+            Reminder.objects.filter(user=request.user), start, end
+        ).select_related('medication').only(*AGENDA_FIELDS)
         
-        serializer = self.get_serializer(upcoming_reminders, many=True)
-        return Response(serializer.data)
+        streams = [self._occurrence_stream(reminder, start, end) for reminder in reminders]
+        merged = list(islice(heapq.merge(*streams, key=lambda item: item[:2]), limit + 1))
+        truncated = len(merged) > limit
+        
+        occurrences = [
+            {
+                'reminder': reminder.id,
+                'medication': reminder.medication_id,
+                'medication_name': reminder.medication.name,
+                'dosage': reminder.medication.dosage,
+                'scheduled_time': occurrence,
+                'repeat': reminder.repeat,
+                'status': reminder.status if occurrence == reminder.scheduled_time else None,
+            }
+            for occurrence, _, reminder in merged[:limit]
+        ]
+        return Response({
+            'start': start,
+            'end': end,
+            'count': len(occurrences),
+            'truncated': truncated,
+            'occurrences': occurrences,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def adherence(self, request):
+        """
+        Get the share of doses taken over the last ``days`` days, overall, per day and per medication.
+        
+        GET /api/reminders/adherence/?days=<n>
+        
+        Read from the daily adherence rollups; ``rate`` is done / (done + missed).
+        """
+        try:
+            days = int(request.query_params.get('days', ADHERENCE_DEFAULT_DAYS))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= ADHERENCE_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {ADHERENCE_MAX_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+        return Response({
+            **adherence.summary(request.user, start, end),
+            'days': adherence.by_day(request.user, start, end),
+            'medications': adherence.by_medication(request.user, start, end),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Get the user's dose events (taken, missed, reopened) in a time range, oldest first.
+        
+        GET /api/reminders/history/?start=<iso datetime>&end=<iso datetime>&reminder=<id>
+        
+        Defaults to the last 7 days; at most 1000 events are returned.
+        """
+        try:
+            end = self._parse_agenda_time(request.query_params.get('end'), timezone.now())
+            start = self._parse_agenda_time(
+                request.query_params.get('start'), end - timedelta(days=HISTORY_DEFAULT_DAYS)
+            )
+            reminder_id = request.query_params.get('reminder')
+            reminder_id = int(reminder_id) if reminder_id else None
+        except ValueError:
+            return Response(
+                {'error': 'start and end must be ISO 8601 datetimes and reminder an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end < start:
+            return Response({'error': 'Invalid history range'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = list(
+            events.history(request.user, start, end, reminder_id)
+            .values('reminder_id', 'medication_id', 'event_type', 'occurred_at', 'latency')[:HISTORY_MAX_EVENTS + 1]
+        )
+        labels = dict(DoseEvent.EVENT_TYPES)
+        return Response({
+            'start': start,
+            'end': end,
+            'truncated': len(rows) > HISTORY_MAX_EVENTS,
+            'events': [
+                {**row, 'event_type': labels[row['event_type']].lower()} for row in rows[:HISTORY_MAX_EVENTS]
+            ],
+        })
+    
+    @action(detail=False, methods=['get', 'post'])
+    def calendar(self, request):
+        """
+        Get the user's iCalendar feed URL, creating it on first use.
+        
+        GET /api/reminders/calendar/
+        POST /api/reminders/calendar/ rotates the token, revoking the old URL.
+        """
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if request.method == 'POST' and not created:
+            feed.rotate()
+        
+        url = request.build_absolute_uri(reverse('reminder_calendar_feed', args=[feed.token]))
+        return Response({'url': url, 'webcal_url': url.replace('https://', 'webcal://').replace('http://', 'webcal://')})
+    
+    @staticmethod
+    def _parse_agenda_time(value, default):
+        if not value:
+            return default
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
     
     @action(detail=True, methods=['post'])
     def mark_done(self, request, pk=None):
@@ -64,10 +274,7 @@ class ReminderViewSet(viewsets.ModelViewSet):
         
         POST /api/reminders/{id}/mark_done/
         """
-        reminder = self.get_object()
-        reminder.status = 'done'
-        reminder.save()
-        return Response({'message': 'Reminder marked as done'})
+        return self._transition_one(request, pk, 'done', 'Reminder marked as done')
     
     @action(detail=True, methods=['post'])
     def mark_missed(self, request, pk=None):
@@ -76,10 +283,47 @@ class ReminderViewSet(viewsets.ModelViewSet):
         
         POST /api/reminders/{id}/mark_missed/
         """
-        reminder = self.get_object()
-        reminder.status = 'missed'
-        reminder.save()
-        return Response({'message': 'Reminder marked as missed'})
+        return self._transition_one(request, pk, 'missed', 'Reminder marked as missed')
+    
+    def _transition_one(self, request, pk, new_status, message):
+        try:
+            reminder_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        outcome = transition_reminders(request.user, new_status, ids=[reminder_id])[reminder_id]
+        if outcome == NOT_FOUND:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'message': message})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """
+        Set the status of many reminders in one request.
+        
+        POST /api/reminders/bulk_status/
+        {"status": "done", "ids": [1, 2, 3]}
+        {"status": "done", "filter": {"status": "pending", "scheduled_after": "...", "scheduled_before": "..."}}
+        
+        Ownership is checked and the change applied with one query each; the
+        response reports ``updated``, ``unchanged`` or ``not_found`` per id.
+        """
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        if 'ids' in data:
+            outcomes = transition_reminders(request.user, data['status'], ids=data['ids'])
+        else:
+            lookups = ReminderFilterSerializer.to_lookups(data['filter'])
+            outcomes = transition_reminders(
+                request.user, data['status'], queryset=Reminder.objects.filter(**lookups)
+            )
+        
+        return Response({
+            'status': data['status'],
+            'updated': sum(1 for outcome in outcomes.values() if outcome == UPDATED),
+            'results': {str(reminder_id): outcome for reminder_id, outcome in outcomes.items()},
+        })
     
     @action(detail=False, methods=['get'])
     def pending(self, request):
@@ -87,11 +331,14 @@ class ReminderViewSet(viewsets.ModelViewSet):
         Get all pending reminders for the current user.
         
         GET /api/reminders/pending/
+        
+        Cached per user; see reminders.cache.
         """
-        pending_reminders = Reminder.objects.filter(
-            user=request.user,
-            status='pending'
-        ).select_related('medication')
+        def build():
+            pending_reminders = Reminder.objects.filter(
+                user=request.user,
+                status='pending'
+            ).select_related('user', 'medication__user')
+            return list(self.get_serializer(pending_reminders, many=True).data)
         
-        serializer = self.get_serializer(pending_reminders, many=True)
-        return Response(serializer.data)
+        return Response(get_or_build(request.user.id, 'pending', build))
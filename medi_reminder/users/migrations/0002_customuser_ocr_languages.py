@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='ocr_languages',
+            field=models.CharField(blank=True, help_text="Tesseract languages for this user's prescriptions, e.g. 'eng' or 'hin+eng'. Blank detects the script per image.", max_length=50),
+        ),
+    ]
@@ -17,6 +17,12 @@ class CustomUser(AbstractUser):
     """
     phone_number = models.CharField(max_length=15, blank=True, help_text="User's phone number")
     age = models.PositiveIntegerField(null=True, blank=True, help_text="User's age")
+    ocr_languages = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Tesseract languages for this user's prescriptions, e.g. 'eng' or 'hin+eng'. "
+                  "Blank detects the script per image."
+    )
     
     class Meta:
         verbose_name = 'User'
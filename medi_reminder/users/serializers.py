@@ -5,6 +5,8 @@ This module contains DRF serializers for user-related data serialization
 and validation. Serializers convert model instances to JSON and vice versa.
 """
 
+import re
+
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import CustomUser
@@ -18,8 +20,19 @@ class UserSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'age', 'date_joined']
+        fields = [
+            'id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'age',
+            'ocr_languages', 'date_joined'
+        ]
         read_only_fields = ['id', 'date_joined']
+    
+    def validate_ocr_languages(self, value):
+        """
+        Validate a '+'-separated list of tesseract language codes.
+        """
+        if value and not re.fullmatch(r'[a-z_]{3,}(\+[a-z_]{3,})*', value):
+            raise serializers.ValidationError("Use tesseract language codes joined by '+', e.g. 'hin+eng'.")
+        return value
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
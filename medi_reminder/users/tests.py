@@ -1,3 +1,20 @@
-from django.test import TestCase
+from medi_reminder.testing import QueryBudgetTestCase
+from .models import CustomUser
+from .viewsets import UserViewSet
 
-# Create your tests here.
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='x')
+
+    def grow(self, rows):
+        for _ in range(rows):
+            count = CustomUser.objects.count()
+            CustomUser.objects.create_user(username=f'user{count}', email=f'user{count}@example.com', password='x')
+
+    def test_list(self):
+        self.assertQueryBudget(UserViewSet.as_view({'get': 'list'}), 2, self.grow, self.user)
+
+    def test_profile(self):
+        self.assertQueryBudget(UserViewSet.as_view({'get': 'profile'}), 0, self.grow, self.user)
@@ -21,7 +21,7 @@ class UserViewSet(viewsets.ModelViewSet):
     
     Provides CRUD operations for user management.
     """
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.only(*UserSerializer.Meta.fields).order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     